@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""문서 작성 파이프라인 HTTP API 서버 (FastAPI)
+
+그룹웨어 등 다른 시스템이 Streamlit 화면 없이 초안 생성과 내보내기를 호출할 수 있도록 합니다.
+프롬프트 구성, 템플릿, DOCX 생성은 app.py와 같은 doc_pipeline/docx_export 구현을 사용합니다.
+
+- LLM 호출처럼 대기 시간이 긴 작업은 스레드 풀에서,
+- PDF/DOCX 생성처럼 CPU를 많이 쓰는 작업은 프로세스 풀에서 실행해 이벤트 루프를 막지 않습니다.
+
+실행 예:
+    python api_server.py --port 8000            # OPENAI_API_KEY(또는 OPENAI_API_KEYS) 환경 변수 사용
+    LLM_BACKEND=openai_compatible LLM_BASE_URL=http://127.0.0.1:8001/v1 LLM_MODEL=qwen2.5-7b-instruct python api_server.py
+    python api_server.py --port 8000 --stub     # 네트워크 없이 가짜 LLM 사용
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Dict, List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+
+import completeness
+import doc_pipeline as pipeline
+from docx_export import generate_docx
+import llm_backends
+
+DocType = Literal['품의서', '공지문', '공문', '비즈니스 이메일']
+
+class AnalyzeRequest(BaseModel):
+    doc_type: DocType
+    keywords: str = Field(min_length=10, max_length=1000)
+    model: Optional[str] = None
+
+class DraftRequest(AnalyzeRequest):
+    file_context: str = Field(default="", max_length=200_000)
+    mode: Literal["draft", "clarify_or_draft"] = "draft"
+
+class ContinueRequest(BaseModel):
+    doc_type: DocType
+    conversation: List[Dict[str, str]]
+    answers: Dict[str, str]
+    model: Optional[str] = None
+
+class RegenerateRequest(BaseModel):
+    doc_type: DocType
+    draft: dict
+    field: str
+    instruction: str = ""
+    model: Optional[str] = None
+
+class RenderRequest(BaseModel):
+    doc_type: DocType
+    draft: dict
+    signature: Dict[str, str] = Field(default_factory=dict)
+    table_headers: Optional[List[str]] = None
+
+def _render_pdf(doc_type, draft, signature, table_headers):
+    """프로세스 풀에서 실행되는 PDF 생성 작업"""
+    context = pipeline.build_template_context(doc_type, draft, signature, table_headers)
+    return pipeline.generate_pdf(pipeline.render_html(doc_type, context))
+
+def create_llm_client(use_stub=False):
+    """환경 변수 설정(LLM_BACKEND, OPENAI_API_KEYS 등, llm_backends 참고)에 맞는 LLM 클라이언트를 만듭니다. API 키가 없으면 None"""
+    config = llm_backends.load_config()
+    if use_stub:
+        config["backend"] = "stub"
+    return llm_backends.create_client(config)
+
+def create_app(llm_client=None, corpus_path=pipeline.LEARNED_DOCUMENTS_PATH, default_model="gpt-4o-mini",
+               io_workers=32, cpu_workers=None):
+    """API 앱을 만듭니다. 테스트에서는 llm_client에 stub_llm.StubLLMClient()를 넘깁니다."""
+    io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="api-io")
+    # WeasyPrint/python-docx는 fork 이후 상태 공유가 불안정할 수 있어 spawn을 사용
+    cpu_pool = ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        io_pool.shutdown(wait=False, cancel_futures=True)
+        cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+    app = FastAPI(title="문서 작성 도우미 API", lifespan=lifespan)
+
+    async def run_io(func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(io_pool, partial(func, *args, **kwargs))
+
+    async def run_cpu(func, *args):
+        return await asyncio.get_running_loop().run_in_executor(cpu_pool, partial(func, *args))
+
+    async def current_corpus():
+        # 요청마다 읽어 감시 스레드, 학습 작업, 다른 인스턴스가 게시한 코퍼스를 재시작 없이 반영 (바뀌지 않았으면 캐시 사용)
+        return await run_io(pipeline.read_learned_documents, corpus_path)
+
+    async def call_llm(system_prompt, user_prompt, model, task, doc_type, max_tokens=3000, history=None, response_schema=None):
+        if llm_client is None:
+            raise HTTPException(status_code=503, detail="LLM이 설정되지 않았습니다. OPENAI_API_KEY를 설정하거나 --stub으로 실행하세요.")
+        try:
+            return await run_io(pipeline.call_llm_json, llm_client, system_prompt, user_prompt, model or default_model,
+                                max_tokens=max_tokens, task=task, history=history, doc_type=doc_type, response_schema=response_schema)
+        except pipeline.AIResponseError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    @app.get("/health")
+    async def health():
+        health = {"status": "ok", "llm": llm_client is not None, "corpus_loaded": bool(await current_corpus())}
+        if isinstance(llm_client, llm_backends.PooledClient):
+            health["llm_keys"] = llm_client.stats()
+        return health
+
+    @app.post("/analyze")
+    async def analyze(req: AnalyzeRequest):
+        # 로컬 6W3H 점검으로 충분/부족이 분명하면 LLM을 호출하지 않음
+        local = completeness.assess(req.keywords, req.doc_type)
+        if local["status"] != "ambiguous":
+            return local
+        system_prompt, user_prompt = pipeline.build_analysis_prompts(req.keywords, req.doc_type, await current_corpus())
+        return await call_llm(system_prompt, user_prompt, req.model, task="analyze", doc_type=req.doc_type, response_schema=pipeline.ANALYSIS_SCHEMA)
+
+    @app.post("/draft")
+    async def draft(req: DraftRequest):
+        system_prompt = pipeline.build_draft_system_prompt(req.doc_type, await current_corpus())
+        if req.mode == "draft":
+            user_prompt = pipeline.build_draft_user_prompt(req.doc_type, req.keywords, req.file_context)
+            draft = await call_llm(system_prompt, user_prompt, req.model, task="draft", doc_type=req.doc_type, response_schema=pipeline.draft_schema(req.doc_type))
+            return {"status": "complete", "draft": pipeline.decode_draft(draft)}
+        user_prompt = pipeline.build_clarify_or_draft_user_prompt(req.doc_type, req.keywords, req.file_context)
+        result = await call_llm(system_prompt, user_prompt, req.model, task="draft", doc_type=req.doc_type, response_schema=pipeline.clarify_or_draft_schema(req.doc_type))
+        if result.get("status") == "incomplete" and result.get("questions"):
+            # 답변 후 /draft/continue에 그대로 돌려보내면 같은 접두부로 이어서 초안을 요청합니다.
+            conversation = [
+                {"role": "user", "content": user_prompt},
+                {"role": "assistant", "content": json.dumps(result, ensure_ascii=False)},
+            ]
+            return {"status": "incomplete", "questions": result["questions"], "conversation": conversation}
+        return {"status": "complete", "draft": pipeline.extract_draft(result)}
+
+    @app.post("/draft/continue")
+    async def draft_continue(req: ContinueRequest):
+        system_prompt = pipeline.build_draft_system_prompt(req.doc_type, await current_corpus())
+        user_prompt = pipeline.build_continuation_user_prompt(req.answers)
+        result = await call_llm(system_prompt, user_prompt, req.model, task="draft", doc_type=req.doc_type, history=req.conversation, response_schema=pipeline.clarify_or_draft_schema(req.doc_type))
+        return {"status": "complete", "draft": pipeline.extract_draft(result)}
+
+    @app.post("/regenerate")
+    async def regenerate(req: RegenerateRequest):
+        if req.field not in pipeline.REGENERATABLE_FIELDS[req.doc_type]:
+            raise HTTPException(status_code=422, detail=f"'{req.doc_type}'에서 다시 생성할 수 없는 필드입니다: {req.field}")
+        system_prompt, user_prompt, max_tokens = pipeline.build_regenerate_prompts(req.doc_type, req.draft, req.field, req.instruction)
+        result = await call_llm(system_prompt, user_prompt, req.model, task="regenerate", doc_type=req.doc_type, max_tokens=max_tokens, response_schema=pipeline.regenerate_schema(req.doc_type, req.field))
+        value = pipeline.parse_regenerated_field(result, req.field)
+        if value is None:
+            raise HTTPException(status_code=502, detail="AI 응답 형식이 올바르지 않습니다.")
+        return {req.field: value}
+
+    @app.post("/render/html")
+    async def render_html(req: RenderRequest):
+        context = pipeline.build_template_context(req.doc_type, req.draft, req.signature, req.table_headers)
+        html = await run_io(pipeline.render_html, req.doc_type, context)
+        return {"html": html}
+
+    @app.post("/export/pdf")
+    async def export_pdf(req: RenderRequest):
+        pdf_bytes = await run_cpu(_render_pdf, req.doc_type, req.draft, req.signature, req.table_headers)
+        return Response(content=pdf_bytes, media_type="application/pdf")
+
+    @app.post("/export/docx")
+    async def export_docx(req: RenderRequest):
+        docx_bytes = await run_cpu(generate_docx, req.draft, req.doc_type, req.signature)
+        return Response(content=docx_bytes, media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="문서 작성 도우미 HTTP API 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stub", action="store_true", help="네트워크 없이 가짜 LLM(stub_llm)을 사용")
+    parser.add_argument("--model", default="gpt-4o-mini", help="요청에 모델이 없을 때 사용할 기본 모델")
+    parser.add_argument("--cpu-workers", type=int, default=None, help="PDF/DOCX 생성 프로세스 수 (기본: CPU 수)")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(create_llm_client(args.stub), default_model=args.model, cpu_workers=args.cpu_workers)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,58 @@
 import streamlit as st
 import pandas as pd
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML, CSS
-from datetime import datetime
 import streamlit.components.v1 as components
-from openai import OpenAI
 import json
 import os
 from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 import io
-import re
-import PyPDF2
 from pptx import Presentation
 import openpyxl
+import time
+import uuid
+from functools import partial
+from docx_export import generate_docx
+from model_router import router
+from speculative import input_hash, speculative_cache
+import doc_pipeline as pipeline
+from doc_pipeline import AIResponseError, generate_pdf
+from artifact_store import artifact_store
+from pdf_text import extract_pdf_text
+import draft_history
+import draft_model
+import corpus_watcher
+import job_queue
+import llm_backends
+import cache_backend
+from cache_backend import cache
+import profiling
+import usage_ledger
+import completeness
+
+# --- 성능 프로파일링 (관리자 전용, profiling.py 참고) ---
+# secrets의 PROFILE_TOKEN(없으면 환경 변수)과 같은 ?profile= 값으로 접속하거나 PROFILING=1이면 사이드바에 메뉴 표시
+profile_token = None
+try:
+    if "PROFILE_TOKEN" in st.secrets:
+        profile_token = st.secrets["PROFILE_TOKEN"]
+except Exception:
+    pass
+profiling_allowed = profiling.is_allowed(st.query_params.get("profile"), profile_token)
+
+def save_profile_result(result):
+    """프로파일 결과 정보를 사이드바 목록(최근 5개)에 추가합니다."""
+    results = st.session_state.setdefault("profile_results", [])
+    results.insert(0, result)
+    del results[5:]
+
+def profile_stage(stage):
+    """'학습·내보내기 단계 프로파일링'을 켰으면 with 블록을 프로파일링합니다."""
+    return profiling.profile(stage, enabled=profiling_allowed and st.session_state.get("profile_stages", False), on_finish=save_profile_result)
+
+# 이전 화면 갱신의 프로파일이 st.rerun()/st.stop()으로 스크립트 끝까지 가지 못했으면 여기서 저장
+if "rerun_profiler" in st.session_state:
+    save_profile_result(profiling.finish(st.session_state.pop("rerun_profiler"), note="st.rerun() 또는 st.stop()으로 스크립트가 중간에 끝났습니다."))
+if profiling_allowed and st.session_state.pop("profile_next_rerun", False):
+    st.session_state.rerun_profiler = profiling.Profiler("rerun").start()
 
 # --- 학습된 문서 관리 ---
 learned_documents = {}
@@ -24,118 +62,23 @@ def load_learned_documents():
     """학습된 문서 내용을 로드합니다."""
     global learned_documents, learning_status
     try:
-        if os.path.exists('learned_documents.json'):
-            with open('learned_documents.json', 'r', encoding='utf-8') as f:
-                learned_documents = json.load(f)
-                
-                # 기존 방식과 새로운 방식 모두 지원
-                learning_status = {
-                    "manual": learned_documents.get('manual', {}).get('content', '') != '',
-                    "samples": learned_documents.get('samples', {}).get('content', '') != ''
-                }
-                
-                # 새로운 files 구조가 있으면 추가로 확인
-                if learned_documents.get('files'):
-                    files_data = learned_documents.get('files', {})
-                    successful_files = [f for f, data in files_data.items() if data.get('success')]
-                    if successful_files:
-                        learning_status["files_learned"] = True
-                    else:
-                        learning_status["files_learned"] = False
-                
-                return True
+        # 로컬 파일이 없어도 다른 인스턴스가 공유 캐시에 게시한 코퍼스를 사용
+        learned_documents = pipeline.read_learned_documents()
+        learning_status = pipeline.compute_learning_status(learned_documents)
+        return bool(learned_documents)
     except Exception as e:
         st.error(f"학습된 문서를 로드하는 중 오류가 발생했습니다: {str(e)}")
     return False
 
 def get_learning_enhanced_prompt(base_prompt, doc_type):
     """학습된 내용이 포함된 강화된 프롬프트를 생성합니다."""
-    if not learned_documents:
-        return base_prompt
-    
-    enhancement = "\n\n[학습된 문서 가이드라인]:\n"
-    total_content = ""
-    
-    # 기존 manual, samples 키 지원
-    if learning_status.get("manual") and learned_documents.get('manual', {}).get('content'):
-        enhancement += "\n📋 문서작성 가이드라인:\n"
-        enhancement += learned_documents['manual']['content'][:2000]  # 2000자로 확장
-    
-    if learning_status.get("samples") and learned_documents.get('samples', {}).get('content'):
-        enhancement += "\n📝 품의서 작성 패턴:\n"
-        enhancement += learned_documents['samples']['content'][:2000]  # 2000자로 확장
-    
-    # 새로운 files 구조 지원 - 문서 유형별로 관련성 높은 파일 우선 포함
-    if learned_documents.get('files'):
-        relevant_files = []
-        other_files = []
-        
-        for filename, file_data in learned_documents['files'].items():
-            if file_data.get('success') and file_data.get('content'):
-                # 현재 작성 중인 문서 유형과 관련성 체크
-                is_relevant = False
-                if doc_type == '품의서' and ('품의서' in filename or '모음' in filename or '메뉴얼' in filename):
-                    is_relevant = True
-                elif doc_type == '공지문' and ('공지' in filename or '메뉴얼' in filename):
-                    is_relevant = True
-                elif doc_type == '공문' and ('공문' in filename or '메뉴얼' in filename):
-                    is_relevant = True
-                elif doc_type == '비즈니스 이메일' and ('이메일' in filename or 'email' in filename.lower() or '메뉴얼' in filename):
-                    is_relevant = True
-                
-                if is_relevant:
-                    relevant_files.append((filename, file_data))
-                else:
-                    other_files.append((filename, file_data))
-        
-        # 관련 파일을 먼저 포함
-        all_files = relevant_files + other_files
-        
-        if all_files:
-            enhancement += "\n📚 학습된 전문 문서 가이드라인:\n"
-            
-            for filename, file_data in all_files[:5]:  # 최대 5개 파일만 포함
-                # 파일명에서 카테고리 추론
-                if '메뉴얼' in filename or 'manual' in filename.lower():
-                    category = "📋 작성 가이드라인"
-                elif '품의서' in filename or '모음' in filename:
-                    category = "📝 품의서 실제 사례"
-                elif '공지' in filename:
-                    category = "📢 공지문 템플릿"
-                elif '공문' in filename:
-                    category = "📄 공문 양식"
-                elif '이메일' in filename or 'email' in filename.lower():
-                    category = "📧 이메일 양식"
-                else:
-                    category = "📖 참고 문서"
-                
-                enhancement += f"\n{category}:\n"
-                
-                # 내용을 더 길게 포함 (문서 유형 관련성에 따라 조정)
-                content = file_data['content']
-                if filename in [f[0] for f in relevant_files]:
-                    max_length = 3000  # 관련성 높은 파일은 더 길게
-                else:
-                    max_length = 1500  # 일반 파일은 중간 길이
-                
-                if len(content) > max_length:
-                    # 중요한 부분을 보존하기 위해 앞부분과 뒷부분을 포함
-                    front_part = content[:max_length//2]
-                    back_part = content[-(max_length//2):]
-                    content = front_part + "\n...(중간 내용 생략)...\n" + back_part
-                
-                enhancement += content + "\n"
-    
-    enhancement += f"\n\n위의 모든 학습된 가이드라인과 실제 사례를 바탕으로 '{doc_type}' 문서의 전문성과 완성도를 최대한 높여 작성해주세요. 특히 학습된 문서의 구조, 문체, 표현 방식을 참고하여 한국 비즈니스 문서 표준에 맞춰 작성하세요."
-    
-    return base_prompt + enhancement
+    return pipeline.enhance_prompt(base_prompt, doc_type, learned_documents)
 
 def reset_learning_data():
     """학습 데이터를 초기화합니다."""
     global learned_documents, learning_status
     try:
-        if os.path.exists('learned_documents.json'):
-            os.remove('learned_documents.json')
+        pipeline.clear_learned_documents()
         learned_documents = {}
         learning_status = {"manual": False, "samples": False}
         return True
@@ -143,7 +86,28 @@ def reset_learning_data():
         st.sidebar.error(f"❌ 초기화 중 오류: {str(e)}")
         return False
 
-# 앱 시작 시 학습된 문서 로드
+# 공유 캐시 백엔드 (secrets의 CACHE_BACKEND_URL, 없으면 환경 변수 또는 프로세스 내 메모리)
+# 여러 인스턴스가 같은 백엔드를 쓰면 코퍼스, 첨부 파일 추출 결과, AI 응답, 내보내기 파일을 함께 사용합니다.
+try:
+    if "CACHE_BACKEND_URL" in st.secrets:
+        cache_backend.configure(st.secrets["CACHE_BACKEND_URL"])
+except Exception as e:
+    st.warning(f"공유 캐시 설정을 불러오지 못해 기본값을 사용합니다: {str(e)}")
+
+# 문서 폴더 감시 (CORPUS_WATCH=1): 추가·변경·삭제된 PDF만 백그라운드에서 다시 학습해 새 코퍼스를 게시
+corpus_watch_enabled = os.environ.get("CORPUS_WATCH", "").lower() in ("1", "true", "yes")
+try:
+    if "CORPUS_WATCH" in st.secrets:
+        corpus_watch_enabled = str(st.secrets["CORPUS_WATCH"]).lower() in ("1", "true", "yes")
+except Exception:
+    pass
+if corpus_watch_enabled:
+    corpus_watcher.start()
+
+# 백그라운드 작업자 시작 (이전 프로세스가 끝내지 못한 작업도 이어서 실행)
+job_queue.queue.start()
+
+# 학습된 문서 로드 (화면 갱신마다 확인하므로 감시 스레드나 다른 세션이 게시한 새 코퍼스를 바로 사용)
 load_learned_documents()
 
 # --- 모델 설정 관리 ---
@@ -158,138 +122,379 @@ client = None
 openai_available = False
 
 try:
-    if "OPENAI_API_KEY" in st.secrets:
-        client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    # LLM_BACKEND(openai/openai_compatible/stub), 여러 API 키(OPENAI_API_KEYS) 등은 llm_backends 참고
+    client = llm_backends.get_client(llm_backends.load_config(st.secrets))
+    if client is not None:
         openai_available = True
     else:
         st.warning("⚠️ OpenAI API 키가 설정되지 않았습니다. AI 기능이 비활성화됩니다.")
 except Exception as e:
-    st.error(f"OpenAI 클라이언트 초기화 중 오류가 발생했습니다: {str(e)}")
+    st.error(f"LLM 클라이언트 초기화 중 오류가 발생했습니다: {str(e)}")
     st.warning("AI 기능이 비활성화됩니다.")
 
-def get_ai_response(system_prompt, user_prompt):
-    """OpenAI API를 호출하는 범용 함수"""
-    if not openai_available or client is None:
-        st.error("⚠️ OpenAI API가 설정되지 않아 AI 기능을 사용할 수 없습니다.")
-        return None
-        
-    if not system_prompt or not user_prompt:
-        st.error("프롬프트가 비어있습니다.")
-        return None
-        
+# 작업별 모델 라우팅 설정 (secrets의 [MODEL_ROUTING] 섹션, 선택 사항)
+try:
+    if "MODEL_ROUTING" in st.secrets:
+        router.configure(st.secrets["MODEL_ROUTING"])
+except Exception as e:
+    st.warning(f"모델 라우팅 설정을 불러오지 못해 기본값을 사용합니다: {str(e)}")
+
+# PDF 텍스트 추출 백엔드 (secrets의 PDF_TEXT_BACKEND, 없으면 환경 변수 또는 pypdfium2)
+pdf_text_backend = None
+try:
+    if "PDF_TEXT_BACKEND" in st.secrets:
+        pdf_text_backend = st.secrets["PDF_TEXT_BACKEND"]
+except Exception:
+    pass
+
+def request_ai_json(system_prompt, user_prompt, selected_model, max_tokens=3000, task="draft", history=None, doc_type=None, response_schema=None):
+    """OpenAI API를 호출해 JSON 응답을 반환합니다. 실패하면 AIResponseError를 발생시킵니다.
+
+    Streamlit 화면 요소나 세션 상태를 사용하지 않으므로 백그라운드 스레드에서도 호출할 수 있습니다.
+    """
+    return pipeline.call_llm_json(client if openai_available else None, system_prompt, user_prompt, selected_model, max_tokens=max_tokens, task=task, history=history, doc_type=doc_type, response_schema=response_schema)
+
+def get_ai_response(system_prompt, user_prompt, max_tokens=3000, task="draft", history=None, doc_type=None, response_schema=None):
+    """OpenAI API를 호출하는 범용 함수 (오류는 화면에 표시하고 None을 반환)"""
     try:
-        response = client.chat.completions.create(
-            model=st.session_state.selected_model,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=3000,
-            timeout=30
-        )
-        
-        if not response.choices or not response.choices[0].message.content:
-            st.error("AI로부터 응답을 받지 못했습니다.")
-            return None
-            
-        content = response.choices[0].message.content.strip()
-        if not content:
-            st.error("AI 응답이 비어있습니다.")
-            return None
-            
-        return json.loads(content)
-        
-    except json.JSONDecodeError as e:
-        st.error(f"AI 응답 형식이 올바르지 않습니다: {str(e)}")
-        return None
-    except Exception as e:
-        error_msg = str(e)
-        if "rate limit" in error_msg.lower():
-            st.error("⚠️ API 요청 한도를 초과했습니다. 잠시 후 다시 시도해주세요.")
-        elif "timeout" in error_msg.lower():
-            st.error("⚠️ AI 응답 시간이 초과되었습니다. 다시 시도해주세요.")
-        elif "insufficient_quota" in error_msg.lower():
-            st.error("⚠️ OpenAI API 할당량이 부족합니다. 계정을 확인해주세요.")
-        else:
-            st.error(f"AI 생성 중 오류가 발생했습니다: {error_msg}")
+        return request_ai_json(system_prompt, user_prompt, st.session_state.selected_model, max_tokens=max_tokens, task=task, history=history, doc_type=doc_type, response_schema=response_schema)
+    except AIResponseError as e:
+        st.error(str(e))
         return None
 
+def build_analysis_prompts(keywords, doc_type):
+    """추가 질문 분석용 (시스템 프롬프트, 사용자 프롬프트)를 만듭니다."""
+    return pipeline.build_analysis_prompts(keywords, doc_type, learned_documents)
+
 def analyze_keywords(keywords, doc_type):
-    """키워드를 분석하여 추가 질문을 생성하는 함수"""
-    analysis_prompt = f"사용자가 '{doc_type}' 작성을 위해 다음 키워드를 입력했습니다: '{keywords}'. 6W3H 원칙에 따라 완성도 높은 문서를 작성하기에 정보가 부족하다면, 가장 중요한 질문 2-3개를 `{{\"status\": \"incomplete\", \"questions\": [\"질문1\", \"질문2\"]}}` 형식으로 반환하고, 충분하다면 `{{\"status\": \"complete\"}}` 를 반환하세요."
-    base_system_prompt = "당신은 사용자의 입력을 분석하여 문서 작성에 필요한 추가 정보를 질문하는 시스템입니다. 반드시 지정된 JSON 형식으로만 응답해야 합니다."
-    
-    # 학습된 내용으로 시스템 프롬프트 강화
-    enhanced_system_prompt = get_learning_enhanced_prompt(base_system_prompt, doc_type)
-    
-    return get_ai_response(enhanced_system_prompt, analysis_prompt)
+    """키워드를 분석하여 추가 질문을 생성하는 함수 (로컬 6W3H 점검으로 판단이 애매할 때만 AI 호출)"""
+    local = completeness.assess(keywords, doc_type)
+    if local["status"] != "ambiguous":
+        return local
+    system_prompt, analysis_prompt = build_analysis_prompts(keywords, doc_type)
+    return get_ai_response(system_prompt, analysis_prompt, task="analyze", doc_type=doc_type, response_schema=pipeline.ANALYSIS_SCHEMA)
+
+def build_draft_system_prompt(doc_type):
+    """학습된 내용으로 강화된 초안 작성용 시스템 프롬프트를 만듭니다."""
+    return pipeline.build_draft_system_prompt(doc_type, learned_documents)
 
 def generate_ai_draft(doc_type, context_keywords, file_context=""):
     """최종 키워드와 파일 내용을 바탕으로 AI 초안을 생성하는 함수"""
-    user_prompt = f"다음 정보를 바탕으로 '{doc_type}' 초안을 JSON 형식으로 생성해주세요:\n\n[핵심 키워드]: {context_keywords}\n\n[첨부 파일 내용]:\n{file_context}"
-    # 기본 프롬프트를 학습된 내용으로 강화
-    base_prompts = {
-        "품의서": "당신은 한국의 '주식회사 몬쉘코리아' 소속의 유능한 사원입니다. 품의서 초안을 생성합니다. **절대 규칙**: 'body' 필드는 반드시 다음 형식으로 작성하세요:\n\n1. 첫 번째 주요 항목\n  1) 세부 사항\n    (1) 구체적 내용\n  2) 추가 세부 사항\n2. 두 번째 주요 항목\n  1) 세부 사항\n\n이런 식으로 `1.`, `  1)`, `    (1)` 구분기호를 의무적으로 사용하여 체계적으로 작성하세요. 절대로 구분기호 없이 단순 문장 나열하지 마세요. 문장 종결어미는 `...함.`, `...요청함.` 형태로 하고, 각 문장 마침표 후 줄바꿈하세요. \n\n**표 생성 규칙**: 사용자가 제공한 키워드를 꼼꼼히 분석하여 표로 정리하면 효과적인 데이터가 있는지 판단하세요. 다음과 같은 경우에 표를 생성하세요:\n\n1. **수치나 금액이 포함된 여러 항목이 있는 경우**: 키워드에서 항목별로 구체적인 수치, 금액, 기간 등이 언급되면 해당 내용을 표로 구성\n2. **비교 가능한 여러 옵션이나 조건이 있는 경우**: 서로 다른 조건, 대상, 방법 등이 나열되어 있으면 비교표로 구성\n3. **일정이나 단계별 계획이 있는 경우**: 시기별, 단계별로 구분되는 내용이 있으면 일정표로 구성\n4. **카테고리별 분류가 가능한 경우**: 부서별, 직급별, 유형별 등으로 분류 가능한 내용이 있으면 분류표로 구성\n\n**중요: 표 생성 예시**\n- 키워드에 '사무용품 구매, 프린터 3대, 복사기 2대, 컴퓨터 10대'라고 하면:\n```json\n\"items\": [\n  {\"품목\": \"프린터\", \"수량\": \"3\", \"단가\": \"별도 협의\", \"비고\": \"사무용\"},\n  {\"품목\": \"복사기\", \"수량\": \"2\", \"단가\": \"별도 협의\", \"비고\": \"사무용\"},\n  {\"품목\": \"컴퓨터\", \"수량\": \"10\", \"단가\": \"별도 협의\", \"비고\": \"사무용\"}\n]\n```\n\n**표 구성 방법**:\n- 키워드에서 추출한 실제 내용만 사용하고, 절대로 가상의 예시 데이터를 만들지 마세요\n- 표의 컬럼명은 키워드 내용에 가장 적합한 한국어로 설정하세요 (예: 품목, 수량, 단가, 비고)\n- 각 행은 키워드에서 언급된 실제 항목들로만 구성하세요\n- 정보가 부족한 컬럼이 있으면 해당 셀은 비워두거나 '별도 협의' 등으로 표시하세요\n\n**주의**: 키워드에 표로 만들 수 있는 구체적인 항목들이 있으면 반드시 items 배열에 포함하세요. 표로 만들 적절한 구조화된 데이터가 없을 때만 items 필드를 빈 배열 []로 설정하세요. 응답은 `title`, `purpose`, `body`, `items`, `remarks` JSON 형식입니다.",
-        "공지문": "당신은 한국 기업의 사내 커뮤니케이션 담당자입니다. 키워드와 첨부파일 내용을 바탕으로 '사내 공지문' 초안을 생성합니다. 'details' 필드에는 `1.`, `  1)`, `    (1)` 의 위계질서를 준수하는 번호 매기기를 사용하고, 각 문장의 마침표 후에는 반드시 줄바꿈을 해주세요. \n\n**표 생성 규칙**: 사용자가 제공한 키워드를 분석하여 표로 정리하면 효과적인 데이터가 있는지 판단하세요. 다음의 경우에 표를 생성하세요:\n\n1. **일정이나 스케줄 정보**: 날짜, 시간, 장소, 내용이 여러 개 나열된 경우\n2. **교육이나 프로그램 정보**: 과정별로 대상, 기간, 방법 등이 구분되는 경우\n3. **제도나 혜택 정보**: 대상별로 지원내용, 조건, 신청방법 등이 다른 경우\n4. **변경사항 비교**: 기존과 변경된 내용을 비교할 수 있는 정보가 있는 경우\n5. **연락처나 담당자 정보**: 부서별, 업무별로 담당자가 구분되는 경우\n\n**표 구성 방법**:\n- 키워드에서 추출한 실제 내용만 사용하고, 가상의 데이터를 만들지 마세요\n- 표의 컬럼명은 키워드 내용에 맞게 적절한 한국어로 설정하세요\n- 정보가 불완전한 항목은 '추후 안내' 또는 '별도 공지' 등으로 표시하세요\n\n표로 만들 구조화된 데이터가 없다면 items 필드는 생략하세요. 응답은 'title', 'target', 'summary', 'details', 'contact' key와 필요시 'items' key를 포함하는 JSON 형식이어야 합니다.",
-        "공문": "당신은 대외 문서를 담당하는 총무팀 직원입니다. 키워드와 첨부파일 내용을 바탕으로 격식에 맞는 '공문' 초안을 생성합니다. 본문 작성 시 `1.`, `  1)`, `    (1)` 의 위계질서를 준수하고, 각 문장의 마침표 후에는 줄바꿈을 해주세요. \n\n**표 생성 규칙**: 사용자가 제공한 키워드를 분석하여 표로 정리하면 효과적인 데이터가 있는지 판단하세요. 다음과 같은 경우에 표를 생성하세요:\n\n1. **행사나 회의 일정**: 여러 일정이 있을 때 날짜, 시간, 장소, 내용별로 정리\n2. **제출 요구사항**: 여러 서류나 절차가 있을 때 항목별로 기한, 방법, 담당처 정리\n3. **협력이나 지원 요청**: 여러 항목에 대해 요청사항, 기한, 담당부서 등을 정리\n4. **비용이나 예산 관련**: 항목별 금액, 용도, 지급방법 등이 구분되는 경우\n5. **참석자나 대상자 정보**: 기관별, 부서별로 참석자나 담당자가 구분되는 경우\n\n**표 구성 방법**:\n- 키워드에서 언급된 실제 내용만 사용하고, 가상의 정보를 추가하지 마세요\n- 표의 컬럼명은 공문의 격식에 맞는 적절한 한국어로 설정하세요\n- 확정되지 않은 정보는 '추후 협의' 또는 '별도 안내' 등으로 표시하세요\n\n표로 만들 구조화된 데이터가 없다면 items 필드는 생략하세요. 응답은 'sender_org', 'receiver', 'cc', 'title', 'body', 'sender_name' key와 필요시 'items' key를 포함하는 JSON 형식이어야 합니다.",
-        "비즈니스 이메일": "당신은 비즈니스 커뮤니케이션 전문가입니다. 키워드와 첨부파일 내용을 바탕으로 전문적인 '비즈니스 이메일' 초안을 생성합니다. 본문 작성 시 `1.`, `  1)`, `    (1)` 의 위계질서를 준수하고, 각 문장의 마침표 후에는 줄바꿈을 해주세요. \n\n**표 생성 규칙**: 사용자가 제공한 키워드를 분석하여 표로 정리하면 효과적인 데이터가 있는지 판단하세요. 다음과 같은 경우에 표를 생성하세요:\n\n1. **미팅이나 일정 관련**: 여러 일정이 있을 때 날짜, 시간, 안건, 참석자별로 정리\n2. **견적이나 주문 관련**: 여러 항목에 대해 수량, 단가, 금액 등이 구분되는 경우\n3. **업무 진행상황**: 여러 업무에 대해 담당자, 기한, 진행상태 등이 구분되는 경우\n4. **제품이나 서비스 정보**: 여러 제품에 대해 사양, 가격, 배송일 등이 구분되는 경우\n5. **연락처나 담당자 정보**: 부서별, 업무별로 담당자나 연락처가 구분되는 경우\n\n**표 구성 방법**:\n- 키워드에서 언급된 실제 내용만 사용하고, 임의의 정보를 추가하지 마세요\n- 표의 컬럼명은 비즈니스 이메일에 적합한 간결한 한국어로 설정하세요\n- 미확정 정보는 'TBD' 또는 '협의 후 결정' 등으로 표시하세요\n\n표로 만들 구조화된 데이터가 없다면 items 필드는 생략하세요. 응답은 `subject`, `body`, `closing` key와 필요시 'items' key를 포함하는 JSON 형식이어야 합니다. `closing`에는 회사명, 연락처, 이메일 주소 등의 서명 정보를 포함하지 마세요. 단순히 인사말이나 마무리 문구만 포함하세요."
-    }
-    
-    # 학습된 내용으로 프롬프트 강화
-    enhanced_system_prompt = get_learning_enhanced_prompt(base_prompts[doc_type], doc_type)
-    
-    prompts = {
-        "품의서": {"system": enhanced_system_prompt, "user": user_prompt},
-        "공지문": {"system": enhanced_system_prompt, "user": user_prompt},
-        "공문": {"system": enhanced_system_prompt, "user": user_prompt},
-        "비즈니스 이메일": {"system": enhanced_system_prompt, "user": user_prompt}
-    }
-    return get_ai_response(prompts[doc_type]["system"], prompts[doc_type]["user"])
+    user_prompt = pipeline.build_draft_user_prompt(doc_type, context_keywords, file_context)
+    return pipeline.decode_draft(get_ai_response(build_draft_system_prompt(doc_type), user_prompt, task="draft", doc_type=doc_type, response_schema=pipeline.draft_schema(doc_type)))
+
+# --- 질문 또는 초안을 한 번에 받는 모드 ---
+# 시스템 프롬프트는 일반 초안 생성과 동일하게 두고 지시문은 사용자 메시지에 붙여
+# 답변 후 이어지는 호출에서도 같은 접두부(prefix)가 재사용(프롬프트 캐시)되도록 합니다.
+def clarify_or_draft(doc_type, context_keywords, file_context=""):
+    """한 번의 호출로 추가 질문 또는 완성된 초안을 받습니다.
+
+    (결과, 대화 기록)을 반환합니다. 결과의 status가 'incomplete'이면 questions가,
+    'complete'이면 draft가 담겨 있으며, 대화 기록은 답변 후 이어서 초안을 요청할 때 사용합니다.
+    """
+    user_prompt = pipeline.build_clarify_or_draft_user_prompt(doc_type, context_keywords, file_context)
+    result = get_ai_response(build_draft_system_prompt(doc_type), user_prompt, task="draft", doc_type=doc_type, response_schema=pipeline.clarify_or_draft_schema(doc_type))
+    if not result:
+        return None, None
+    if result.get("status") == "incomplete" and result.get("questions"):
+        conversation = [
+            {"role": "user", "content": user_prompt},
+            {"role": "assistant", "content": json.dumps(result, ensure_ascii=False)},
+        ]
+        return result, conversation
+    return {"status": "complete", "draft": pipeline.extract_draft(result)}, None
+
+def continue_draft_with_answers(doc_type, conversation, answers):
+    """clarify_or_draft의 대화에 이어 답변을 보내고 최종 초안을 받습니다."""
+    user_prompt = pipeline.build_continuation_user_prompt(answers)
+    result = get_ai_response(build_draft_system_prompt(doc_type), user_prompt, task="draft", history=conversation, doc_type=doc_type, response_schema=pipeline.clarify_or_draft_schema(doc_type))
+    if not result:
+        return None
+    return pipeline.extract_draft(result)
+
+# --- 필드 단위 재생성 ---
+def regenerate_field(doc_type, draft, field, instruction=""):
+    """초안의 한 필드만 다시 생성합니다. 성공하면 새 값, 실패하면 None을 반환합니다."""
+    system_prompt, user_prompt, max_tokens = pipeline.build_regenerate_prompts(doc_type, draft.snapshot(), field, instruction)
+    result = get_ai_response(system_prompt, user_prompt, max_tokens=max_tokens, task="regenerate", doc_type=doc_type, response_schema=pipeline.regenerate_schema(doc_type, field))
+    return pipeline.parse_regenerated_field(result, field)
+
+def render_regenerate_button(doc_type, draft, field):
+    """필드 아래에 '다시 생성' 버튼을 그리고, 누르면 해당 필드만 재생성한 뒤 화면을 갱신합니다."""
+    label = pipeline.REGENERATABLE_FIELDS[doc_type][field][0]
+    if st.button(f"🔄 {label} 다시 생성", key=f"regen_{field}", disabled=not openai_available):
+        with st.spinner(f"🤖 {label}을(를) 다시 작성하고 있습니다..."):
+            instruction = st.session_state.get("regen_instruction", "")
+            value = regenerate_field(doc_type, draft, field, instruction)
+        if value is None:
+            st.error(f"{label} 재생성에 실패했습니다. 다시 시도해주세요.")
+            return
+        # 편집 중이던 표를 초안에 반영한 뒤 해당 필드만 교체
+        draft.set_field(field, value)
+        st.session_state[html_key] = ""
+        st.rerun()
+
+# --- 세션 산출물 저장소 ---
+def artifact_session_id():
+    """산출물 저장소에서 이 브라우저 세션을 구분하는 ID"""
+    if "artifact_session" not in st.session_state:
+        st.session_state.artifact_session = uuid.uuid4().hex
+    return st.session_state.artifact_session
+
+def put_artifact(name, data):
+    """큰 내용(HTML, 대화, 내보내기 파일)을 저장소에 넣고 세션 상태에 보관할 참조를 반환합니다."""
+    return artifact_store.put(artifact_session_id(), name, data)
+
+def get_artifact(ref):
+    """참조의 내용을 반환합니다. 예산 초과로 제거되었으면 None"""
+    return artifact_store.get(ref)
+
+EXPORT_CACHE_TTL = 24 * 3600
+
+def export_artifact(name, source_key, build):
+    """source_key가 이전과 같으면 저장소에 보관된 내보내기 결과를 재사용하고, 아니면 build()로 새로 만듭니다.
+
+    세션 저장소에 없으면 공유 캐시에서 다른 세션/인스턴스가 같은 내용으로 만든 파일을 찾습니다.
+    공유 캐시가 프로세스 메모리(memory://)면 같은 파일을 세션 저장소에 한 번 더 두지 않고 공유 캐시 키만 기억합니다.
+    """
+    refs = st.session_state.setdefault("export_refs", {})
+    shared_key = f"export:{name}:{source_key}"
+    cached = refs.get(name)
+    if cached and cached[0] == source_key:
+        data = get_artifact(cached[1]) if cached[1] else cache.get_bytes(shared_key)
+        if data is not None:
+            return data
+    data = cache.get_bytes(shared_key)
+    if data is None:
+        with profile_stage(f"export-{name}"):
+            data = build()
+        cache.set_bytes(shared_key, data, ttl=EXPORT_CACHE_TTL)
+    if cached and cached[1]:
+        artifact_store.discard(cached[1])
+    refs[name] = (source_key, None if cache.in_process else put_artifact(name, data))
+    return data
+
+# --- 작성 이력 (SQLite) ---
+def start_draft_history(keywords):
+    """새로 생성한 초안에 작성 이력 ID를 붙입니다. 미리보기를 만들 때마다 같은 ID로 저장(갱신)됩니다."""
+    st.session_state.draft_history_meta = {"id": uuid.uuid4().hex, "keywords": keywords, "model": st.session_state.selected_model}
+    return st.session_state.draft_history_meta
+
+def save_draft_history(doc_type, preview_draft):
+    meta = st.session_state.get("draft_history_meta") or start_draft_history("")
+    try:
+        draft_history.save_draft(meta["id"], doc_type, preview_draft, model=meta["model"], keywords=meta["keywords"])
+    except Exception as e:
+        st.warning(f"⚠️ 작성 이력을 저장하지 못했습니다: {str(e)}")
+
+# --- 미리보기 (바뀐 필드가 있을 때만 다시 렌더링) ---
+PREVIEW_DEBOUNCE_SECONDS = 1.5  # 자동 미리보기: 편집이 이 시간 동안 멈추면 갱신
+
+def refresh_preview(doc_type, draft, signature_data):
+    """미리보기를 갱신하고 바뀐 필드 목록을 반환합니다.
+
+    직전 미리보기와 입력이 같으면 템플릿을 렌더링하지 않고 기존 HTML(같은 참조)을 그대로 사용하므로
+    화면에 보내는 내용도 바이트 단위로 같아집니다. 필드별 HTML 조각은 doc_pipeline에서 캐시됩니다.
+    """
+    preview_draft, table_headers, max_rows = draft.snapshot(), draft.table_headers(), preview_max_rows()
+    fingerprint = pipeline.preview_fingerprint(doc_type, preview_draft, signature_data, table_headers, max_rows)
+    changed = pipeline.changed_fields(st.session_state.get("preview_fingerprint"), fingerprint)
+    st.session_state.auto_preview_pending = None
+    if not changed and get_artifact(st.session_state.get(html_key)) is not None:
+        return []
+    # 편집 중인 표를 초안에 반영 (내보내기에서도 같은 내용을 사용)
+    draft.apply_edits()
+    context = pipeline.build_template_context(doc_type, preview_draft, signature_data, table_headers, max_rows)
+    st.session_state[html_key] = put_artifact(html_key, pipeline.render_html(doc_type, context))
+    # 표 앞부분만 미리보기에 넣었으면 내보내기(PDF, 이메일 HTML)용 전체 HTML을 따로 보관
+    full_html = None
+    if context.get("table_note"):
+        full_context = pipeline.build_template_context(doc_type, preview_draft, signature_data, table_headers)
+        full_html = put_artifact(f"{html_key}_full", pipeline.render_html(doc_type, full_context))
+    st.session_state[f"{html_key}_full"] = full_html
+    st.session_state.preview_max_rows = max_rows
+    st.session_state.preview_fingerprint = fingerprint
+    save_draft_history(doc_type, preview_draft)
+    return changed
+
+def preview_max_rows():
+    """화면 미리보기에 넣을 상세 내역 행 수. '전체 보기'를 켰으면 None(모든 행)"""
+    return None if st.session_state.get("show_full_table") else pipeline.PREVIEW_TABLE_ROWS
+
+def auto_preview_due(doc_type, draft, signature_data):
+    """자동 미리보기: 미리보기 이후 바뀐 편집 내용이 PREVIEW_DEBOUNCE_SECONDS 동안 그대로이면 True"""
+    fingerprint = pipeline.preview_fingerprint(doc_type, draft.snapshot(), signature_data, draft.table_headers(), preview_max_rows())
+    if fingerprint == st.session_state.get("preview_fingerprint"):
+        st.session_state.auto_preview_pending = None
+        return False
+    now = time.time()
+    pending = st.session_state.get("auto_preview_pending")
+    if not pending or pending["fingerprint"] != fingerprint:
+        st.session_state.auto_preview_pending = {"fingerprint": fingerprint, "since": now}
+        return False
+    return now - pending["since"] >= PREVIEW_DEBOUNCE_SECONDS
+
+@st.fragment(run_every=1)
+def auto_preview_timer():
+    """편집이 멈춘 뒤 다른 입력이 없어도 자동 미리보기가 갱신되도록 앱을 다시 실행합니다."""
+    pending = st.session_state.get("auto_preview_pending")
+    if pending and time.time() - pending["since"] >= PREVIEW_DEBOUNCE_SECONDS:
+        st.rerun()
+
+# --- 백그라운드 작업 표시 ---
+JOB_STATUS_LABELS = {"queued": "⏳ 대기 중", "running": "🔄 실행 중", "done": "✅ 완료", "failed": "❌ 실패", "cancelled": "🚫 취소됨"}
+SESSION_JOB_LIMIT = 5  # 세션별로 표시할 최근 작업 수
+
+def submit_job(kind, params, unique=False):
+    """작업을 제출하고 이 세션의 작업 목록에 추가합니다. (작업 큐는 프로세스 공용이므로 다른 사용자의 작업은 표시하지 않음)"""
+    job_id = job_queue.queue.submit(kind, params, unique=unique)
+    job_ids = [job_id] + [i for i in st.session_state.get("job_ids", []) if i != job_id]
+    st.session_state.job_ids = job_ids[:SESSION_JOB_LIMIT]
+    return job_id
+
+def session_jobs():
+    """이 세션에서 제출한 작업 목록 (최신순)"""
+    return job_queue.queue.get_many(st.session_state.get("job_ids", []))
+
+def read_job_file(path):
+    """결과 파일 내용 (다운로드 버튼을 누를 때만 읽음)"""
+    with open(path, "rb") as f:
+        return f.read()
+
+def render_job_result(job):
+    result = job["result"] or {}
+    if job["kind"] == "learn":
+        summary = result["summary"]
+        st.caption(f"총 {summary['total_files']}개 파일 중 {summary['successful_files']}개 학습 ({summary['total_content_length']:,}자)")
+        for name, message in result.get("failures", []):
+            st.caption(f"📄 {name}: {message[:100]}")
+        profile = result.get("profile")
+        if profile and os.path.exists(profile["path"]):
+            st.download_button("📥 학습 프로파일 다운로드", data=partial(read_job_file, profile["path"]), file_name=os.path.basename(profile["path"]), mime="application/zip", key=f"job_profile_{job['id']}", use_container_width=True)
+    elif job["kind"] == "export":
+        st.caption(f"{result['count']}건 내보냄" + (f", 실패 {len(result['failures'])}건" if result["failures"] else ""))
+    elif job["kind"] == "ocr":
+        st.caption(f"{result['pages']}페이지, {result['chars']:,}자 (OCR {result['ocr_pages']}페이지)")
+    if result.get("file") and os.path.exists(result["file"]):
+        st.download_button("📥 결과 다운로드", data=partial(read_job_file, result["file"]), file_name=result["file_name"], mime=result["mime"], key=f"job_download_{job['id']}", use_container_width=True)
+
+def render_jobs(jobs):
+    """최근 작업 목록 (진행률, 결과, 취소 버튼)"""
+    if not jobs:
+        st.caption("최근 작업이 없습니다. PDF 학습, 작성 이력 일괄 내보내기, OCR은 여기서 진행 상황을 확인합니다.")
+    for job in jobs:
+        label = job_queue.HANDLERS.get(job["kind"], (job["kind"],))[0]
+        st.markdown(f"**{label}** · {JOB_STATUS_LABELS.get(job['status'], job['status'])}")
+        st.caption(job["created_at"])
+        if job["status"] in job_queue.ACTIVE_STATUSES:
+            st.progress(job["progress"], text=job["message"] or None)
+            if st.button("취소", key=f"job_cancel_{job['id']}"):
+                job_queue.queue.cancel(job["id"])
+        elif job["status"] == "failed":
+            st.caption(f"오류: {job['error']}")
+        elif job["status"] == "done":
+            render_job_result(job)
+
+@st.fragment(run_every=2)
+def job_progress_panel():
+    """진행 중인 작업이 있는 동안 2초마다 진행률을 갱신합니다. 작업이 끝나면 화면 전체를 다시 그려 결과(학습 상태 등)를 반영합니다."""
+    jobs = session_jobs()
+    render_jobs(jobs)
+    active = {job["id"] for job in jobs if job["status"] in job_queue.ACTIVE_STATUSES}
+    finished = st.session_state.get("active_job_ids", set()) - active
+    st.session_state.active_job_ids = active
+    if finished:
+        st.rerun()
 
 # --- 파일 읽기 및 텍스트 처리 함수들 ---
-def read_uploaded_file(uploaded_file):
-    if not uploaded_file:
-        return ""
-        
-    # 파일 크기 제한 (10MB)
-    max_file_size = 10 * 1024 * 1024  # 10MB
-    if hasattr(uploaded_file, 'size') and uploaded_file.size > max_file_size:
-        st.error(f"파일 크기가 너무 큽니다. 10MB 이하의 파일을 업로드해주세요.")
-        return ""
-    
+EXCEL_MAX_ROWS_PER_SHEET = 100  # 시트당 최대 행 수
+EXCEL_MAX_CHARS = 20000  # 전체 추출 텍스트 상한 (문자 수)
+
+def read_excel_streaming(file_obj, max_rows_per_sheet=EXCEL_MAX_ROWS_PER_SHEET, max_chars=EXCEL_MAX_CHARS):
+    """openpyxl read_only 모드로 모든 시트를 스트리밍하며 행 단위로 잘라 표 형태의 텍스트를 만듭니다.
+
+    통합 문서 전체를 메모리에 올리지 않으므로 파일 크기와 관계없이 메모리 사용량이 일정합니다.
+    시트당 행 수와 전체 문자 수 예산을 넘으면 즉시 읽기를 중단합니다.
+    """
+    workbook = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+    parts = []
+    used_chars = 0
+    budget_exceeded = False
+    try:
+        for sheet in workbook.worksheets:
+            sheet_lines = []
+            row_count = 0
+            truncated = False
+            for row in sheet.iter_rows(values_only=True):
+                cells = ["" if value is None else str(value).strip() for value in row]
+                # 뒤쪽의 빈 셀 제거
+                while cells and not cells[-1]:
+                    cells.pop()
+                if not cells:
+                    continue
+                if row_count >= max_rows_per_sheet:
+                    truncated = True
+                    break
+                line = " | ".join(cell.replace("\n", " ") for cell in cells)
+                if used_chars + len(line) + 1 > max_chars:
+                    truncated = True
+                    budget_exceeded = True
+                    break
+                sheet_lines.append(line)
+                used_chars += len(line) + 1
+                row_count += 1
+            if sheet_lines:
+                header = f"[시트: {sheet.title}]"
+                if truncated:
+                    sheet_lines.append(f"...(이하 생략, {row_count}행까지 표시)")
+                parts.append(header + "\n" + "\n".join(sheet_lines))
+            if budget_exceeded:
+                parts.append(f"...(추출 한도 {max_chars:,}자에 도달하여 나머지 시트는 생략)")
+                break
+    finally:
+        # read_only 모드는 파일 핸들을 유지하므로 반드시 닫아줍니다.
+        workbook.close()
+    return "\n\n".join(parts)
+
+def extract_file_text(uploaded_file):
+    """업로드 파일에서 텍스트를 추출해 (텍스트, 알림 목록)을 반환합니다.
+
+    Streamlit 화면 요소를 직접 호출하지 않으므로 백그라운드 스레드에서도 사용할 수 있습니다.
+    알림 목록은 ("warning" | "error", 메시지) 튜플이며 read_uploaded_file이 화면에 표시합니다.
+    """
+    notices = []
     try:
         file_extension = uploaded_file.name.split('.')[-1].lower()
         
         if file_extension == "pdf":
             try:
-                pdf_reader = PyPDF2.PdfReader(uploaded_file)
-                if len(pdf_reader.pages) > 50:
-                    st.warning("PDF 파일이 너무 깁니다. 처음 50페이지만 처리합니다.")
-                
-                text = ""
-                for i, page in enumerate(pdf_reader.pages[:50]):
-                    page_text = page.extract_text() or ""
-                    text += page_text
+                # 텍스트가 없는 스캔 페이지만 OCR로 읽음
+                text, pdf_stats = extract_pdf_text(uploaded_file, max_pages=50, separator="", backend=pdf_text_backend)
+                if pdf_stats["total_pages"] > 50:
+                    notices.append(("warning", "PDF 파일이 너무 깁니다. 처음 50페이지만 처리합니다."))
+                if pdf_stats["ocr_pages"]:
+                    notices.append(("info", f"스캔된 페이지 {pdf_stats['ocr_pages']}개를 OCR로 읽었습니다."))
                     
                 if not text.strip():
-                    st.warning("PDF에서 텍스트를 추출할 수 없습니다.")
-                return text
+                    if pdf_stats["scanned_pages"] and not pdf_stats["ocr_available"]:
+                        notices.append(("warning", "PDF에서 텍스트를 추출할 수 없습니다. 스캔 문서는 OCR(Tesseract, 한국어 언어 팩)이 설치되어 있어야 읽을 수 있습니다."))
+                    else:
+                        notices.append(("warning", "PDF에서 텍스트를 추출할 수 없습니다."))
+                return text, notices
             except Exception as e:
-                st.error(f"PDF 파일 처리 중 오류: {str(e)}")
-                return ""
+                notices.append(("error", f"PDF 파일 처리 중 오류: {str(e)}"))
+                return "", notices
                 
         elif file_extension == "docx":
             try:
                 doc = Document(uploaded_file)
                 text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
                 if not text.strip():
-                    st.warning("Word 문서에서 텍스트를 찾을 수 없습니다.")
-                return text
+                    notices.append(("warning", "Word 문서에서 텍스트를 찾을 수 없습니다."))
+                return text, notices
             except Exception as e:
-                st.error(f"Word 파일 처리 중 오류: {str(e)}")
-                return ""
+                notices.append(("error", f"Word 파일 처리 중 오류: {str(e)}"))
+                return "", notices
                 
         elif file_extension == "pptx":
             try:
@@ -300,112 +505,80 @@ def read_uploaded_file(uploaded_file):
                         if hasattr(shape, "text") and shape.text.strip(): 
                             text += shape.text + "\n"
                 if not text.strip():
-                    st.warning("PowerPoint에서 텍스트를 찾을 수 없습니다.")
-                return text
+                    notices.append(("warning", "PowerPoint에서 텍스트를 찾을 수 없습니다."))
+                return text, notices
             except Exception as e:
-                st.error(f"PowerPoint 파일 처리 중 오류: {str(e)}")
-                return ""
+                notices.append(("error", f"PowerPoint 파일 처리 중 오류: {str(e)}"))
+                return "", notices
                 
         elif file_extension in ['xlsx', 'xls']:
             try:
-                df = pd.read_excel(uploaded_file, engine='openpyxl')
-                if df.empty:
-                    st.warning("Excel 파일이 비어있습니다.")
-                    return ""
-                return df.head(100).to_string()  # 첫 100행만 처리
+                text = read_excel_streaming(uploaded_file)
+                if not text.strip():
+                    notices.append(("warning", "Excel 파일이 비어있습니다."))
+                    return "", notices
+                return text, notices
             except Exception as e:
-                st.error(f"Excel 파일 처리 중 오류: {str(e)}")
-                return ""
+                notices.append(("error", f"Excel 파일 처리 중 오류: {str(e)}"))
+                return "", notices
                 
         elif file_extension == "txt":
             try:
                 content = uploaded_file.getvalue()
                 text = content.decode("utf-8")
                 if not text.strip():
-                    st.warning("텍스트 파일이 비어있습니다.")
-                return text
+                    notices.append(("warning", "텍스트 파일이 비어있습니다."))
+                return text, notices
             except UnicodeDecodeError:
                 try:
                     text = content.decode("euc-kr")
-                    return text
+                    return text, notices
                 except UnicodeDecodeError:
-                    st.error("텍스트 파일의 인코딩을 인식할 수 없습니다.")
-                    return ""
+                    notices.append(("error", "텍스트 파일의 인코딩을 인식할 수 없습니다."))
+                    return "", notices
             except Exception as e:
-                st.error(f"텍스트 파일 처리 중 오류: {str(e)}")
-                return ""
+                notices.append(("error", f"텍스트 파일 처리 중 오류: {str(e)}"))
+                return "", notices
         else:
-            st.warning(f"지원하지 않는 파일 형식입니다: .{file_extension}")
-            return ""
+            notices.append(("warning", f"지원하지 않는 파일 형식입니다: .{file_extension}"))
+            return "", notices
             
     except Exception as e:
-        st.error(f"'{uploaded_file.name}' 파일을 읽는 중 예상치 못한 오류가 발생했습니다: {str(e)}")
+        notices.append(("error", f"'{uploaded_file.name}' 파일을 읽는 중 예상치 못한 오류가 발생했습니다: {str(e)}"))
+        return "", notices
+
+def read_uploaded_file(uploaded_file):
+    if not uploaded_file:
+        return ""
+        
+    # 파일 크기 제한 (10MB)
+    max_file_size = 10 * 1024 * 1024  # 10MB
+    if hasattr(uploaded_file, 'size') and uploaded_file.size > max_file_size:
+        st.error(f"파일 크기가 너무 큽니다. 10MB 이하의 파일을 업로드해주세요.")
         return ""
+    
+    text, notices = extract_file_text_shared(uploaded_file)
+    show_notices(notices)
+    return text
 
-def renumber_text(text):
-    lines = text.split('\n')
-    new_lines = []; counters = [0, 0, 0]
-    for line in lines:
-        stripped_line = line.lstrip()
-        indentation = len(line) - len(stripped_line)
-        match = re.match(r'^(\d+\.|\d+\)|\(\d+\)|\-|\*)\s+', stripped_line)
-        if match:
-            level = indentation // 2
-            if level > 2: level = 2
-            for i in range(level + 1, len(counters)): counters[i] = 0
-            counters[level] += 1
-            if level == 0: new_prefix = f"{counters[level]}. "
-            elif level == 1: new_prefix = f"{'  ' * level}{counters[level]}) "
-            else: new_prefix = f"{'  ' * level}({counters[level]}) "
-            content_part = stripped_line[len(match.group(1)):].lstrip()
-            new_lines.append("  " * level + new_prefix + content_part)
-        else:
-            new_lines.append(line)
-    return "\n".join(new_lines)
+EXTRACT_CACHE_TTL = 7 * 24 * 3600
 
-def clean_text(text):
-    if not isinstance(text, str): return ""
-    # 마크다운 헤더 제거
-    processed_text = re.sub(r'^\s*#+\s*', '', text, flags=re.MULTILINE)
-    
-    # 마침표 뒤에 줄바꿈 추가 (번호 매기기 제외)
-    # 제외 조건:
-    # 1. 숫자.공백 패턴 (1. , 2. , 3. 등)
-    # 2. 공백+숫자) 패턴 (  1), (1) 등) 
-    # 3. 이미 줄바꿈이 있는 경우
-    # 4. 문자열 끝인 경우
-    # 문장 마침표만 감지하도록 개선된 패턴
-    processed_text = re.sub(r'(?<!\d)\.(?!\s*\n)(?!\s*$)(?!\s+[0-9])(?!\s*\))(?=\s*[가-힣A-Za-z])', '.\n', processed_text)
-    
-    # 번호 매기기 정리
-    processed_text = renumber_text(processed_text)
-    return processed_text
-
-def text_to_html(text, for_email=False): 
-    """텍스트를 HTML 형식으로 변환"""
-    if isinstance(text, dict):
-        # JSON 객체 형태로 된 경우 텍스트로 변환
-        formatted_text = ""
-        for key, value in text.items():
-            if key.strip() in ['1.', '2.', '3.', '4.', '5.']:
-                formatted_text += f"{key} {value}\n"
-            elif key.strip().endswith(')') and key.strip().replace(')', '').strip().isdigit():
-                formatted_text += f"  {key} {value}\n"
-            elif key.strip().startswith('(') and key.strip().endswith(')'):
-                formatted_text += f"    {key} {value}\n"
-            else:
-                formatted_text += f"{key} {value}\n"
-        text = formatted_text
-    
-    if for_email:
-        # 이메일의 경우 clean_text 처리를 하지 않고 기본 줄바꿈만 처리
-        if not isinstance(text, str): 
-            text = ""
-        # 마크다운 헤더만 제거하고 자동 줄바꿈은 추가하지 않음
-        processed_text = re.sub(r'^\s*#+\s*', '', text, flags=re.MULTILINE)
-        return processed_text.replace('\n', '<br>')
-    else:
-        return clean_text(text).replace('\n', '<br>')
+def extract_file_text_shared(uploaded_file):
+    """같은 파일(이름과 내용)의 추출 결과를 공유 캐시에서 재사용합니다. 오류가 난 결과는 캐시하지 않습니다."""
+    key = "extract:" + input_hash(uploaded_file.name, uploaded_file.getvalue(), pdf_text_backend)
+    cached = cache.get_json(key)
+    if cached is not None:
+        text, notices = cached
+        return text, [tuple(notice) for notice in notices]
+    text, notices = extract_file_text(uploaded_file)
+    if not any(level == "error" for level, _ in notices):
+        cache.set_json(key, [text, notices], ttl=EXTRACT_CACHE_TTL)
+    return text, notices
+
+def show_notices(notices):
+    """extract_file_text 등이 모아 둔 알림을 화면에 표시합니다."""
+    for level, message in notices:
+        getattr(st, level)(message)
 
 def validate_input_length(text, min_length=0, max_length=10000, field_name="입력"):
     """입력 텍스트 길이 유효성 검사"""
@@ -420,12 +593,76 @@ def validate_input_length(text, min_length=0, max_length=10000, field_name="입
     
     return None
 
+def compose_keywords(sub_type, keywords):
+    """품의서 세부 유형을 포함한 최종 키워드 문자열을 만듭니다."""
+    return f"유형: {sub_type} / 내용: {keywords}" if sub_type != "선택 안함" else keywords
+
+# --- 입력 후 미리 분석 (speculative 모드) ---
+# st.text_area는 입력 중에는 값을 서버로 보내지 않고 포커스를 벗어나거나 Ctrl+Enter를 누를 때만 반영하므로,
+# 글자를 입력하는 동안이 아니라 값이 반영된 직후(보통 버튼을 누르기 직전)에 미리 분석을 시작합니다.
+# 첨부 파일은 올리는 즉시 반영되므로 파일 추출은 키워드를 입력하는 동안 진행됩니다.
+SPECULATIVE_WAIT_SECONDS = 30  # 버튼을 눌렀을 때 진행 중인 작업을 기다리는 최대 시간
+
+def _file_cache_key(uploaded_file):
+    return input_hash("file", uploaded_file.name, uploaded_file.getvalue())
+
+def _analysis_cache_key(full_keywords, doc_type):
+    return input_hash("analyze", doc_type, full_keywords, st.session_state.selected_model, learned_documents.get('learned_at', ''))
+
+def _extract_in_background(file_name, data):
+    """백그라운드 스레드용 파일 추출 (업로드 객체 대신 복사한 바이트를 사용)"""
+    buffer = io.BytesIO(data)
+    buffer.name = file_name
+    return extract_file_text_shared(buffer)
+
+def start_speculative_work(full_keywords, doc_type, uploaded_files, include_analysis):
+    """첨부 파일 추출과 (필요하면) 추가 질문 분석을 백그라운드에서 시작합니다."""
+    for uploaded_file in uploaded_files or []:
+        if getattr(uploaded_file, 'size', 0) <= 10 * 1024 * 1024:
+            speculative_cache.submit(_file_cache_key(uploaded_file), _extract_in_background, uploaded_file.name, uploaded_file.getvalue())
+    # 로컬 6W3H 점검으로 결정되는 입력은 미리 AI 분석을 요청하지 않음
+    if include_analysis and openai_available and completeness.assess(full_keywords, doc_type)["status"] == "ambiguous":
+        system_prompt, analysis_prompt = build_analysis_prompts(full_keywords, doc_type)
+        speculative_cache.submit(_analysis_cache_key(full_keywords, doc_type), request_ai_json, system_prompt, analysis_prompt, st.session_state.selected_model, task="analyze", doc_type=doc_type, response_schema=pipeline.ANALYSIS_SCHEMA)
+
+@st.fragment(run_every=1)
+def speculative_prefetch(doc_type, sub_type, uploaded_files, include_analysis):
+    """반영된 키워드로 미리 분석을 시작하고 진행 상태를 1초마다 표시합니다. (같은 입력의 작업은 한 번만 실행)"""
+    keywords_now = st.session_state.get("keyword_input", "")
+    if validate_input_length(keywords_now, min_length=10, max_length=1000, field_name="핵심 키워드"):
+        return
+    full_keywords = compose_keywords(sub_type, keywords_now)
+    start_speculative_work(full_keywords, doc_type, uploaded_files, include_analysis)
+    if include_analysis and completeness.assess(full_keywords, doc_type)["status"] != "ambiguous":
+        st.caption("🔮 입력 내용 점검 완료")
+    elif include_analysis:
+        status = speculative_cache.status(_analysis_cache_key(full_keywords, doc_type))
+        st.caption({"running": "🔮 입력 내용을 미리 분석하는 중...", "done": "🔮 미리 분석 완료"}.get(status, "🔮 미리 분석 대기 중"))
+    elif uploaded_files:
+        st.caption("🔮 첨부 파일을 미리 읽고 있습니다.")
+
+def read_uploaded_file_speculative(uploaded_file):
+    """미리 추출한 결과가 있으면 사용하고, 없으면 평소처럼 파일을 읽습니다."""
+    found, cached = speculative_cache.result(_file_cache_key(uploaded_file), timeout=SPECULATIVE_WAIT_SECONDS)
+    if not found:
+        return read_uploaded_file(uploaded_file)
+    text, notices = cached
+    show_notices(notices)
+    return text
+
+def analyze_keywords_speculative(full_keywords, doc_type):
+    """미리 분석한 결과가 있으면 사용하고, 없으면 평소처럼 분석합니다."""
+    local = completeness.assess(full_keywords, doc_type)
+    if local["status"] != "ambiguous":
+        return local
+    found, analysis = speculative_cache.result(_analysis_cache_key(full_keywords, doc_type), timeout=SPECULATIVE_WAIT_SECONDS)
+    return analysis if found else analyze_keywords(full_keywords, doc_type)
+
 def show_progress_with_status(steps, delay=0.5):
     """진행률과 상태 메시지를 표시하는 함수"""
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    import time
     for i, step_message in enumerate(steps):
         progress = (i + 1) / len(steps)
         progress_bar.progress(progress)
@@ -461,132 +698,131 @@ def validate_document_fields(doc_type, data):
     
     return errors
 
-def generate_pdf(html_content):
-    font_css = CSS(string="@import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR:wght@400;700&display=swap'); body { font-family: 'Noto Sans KR', sans-serif; }")
-    return HTML(string=html_content).write_pdf(stylesheets=[font_css])
+# --- 초안 편집기 ---
+def title_warning(value):
+    if value and len(value.strip()) < 5:
+        return "제목이 너무 짧습니다. 더 구체적으로 작성해주세요."
+    if value and len(value) > 100:
+        return "제목이 너무 깁니다. 100자 이하로 작성해주세요."
+    return None
 
-def generate_docx(draft_data, doc_type, signature_data={}):
-    doc = Document()
-    style = doc.styles['Normal']; style.font.name = '맑은 고딕'; style.font.size = Pt(11)
-    if doc_type == '품의서':
-        h = doc.add_heading(draft_data.get('title', '제목 없음'), level=1); h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_paragraph(clean_text(draft_data.get('purpose', '')))
-        doc.add_paragraph("- 아                   래 -").alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_heading("1. 상세 내역", level=2)
-        
-        # 텍스트 내용 먼저 추가
-        if "body" in draft_data and draft_data.get("body"):
-            doc.add_paragraph(clean_text(draft_data.get('body', '')))
-            if "items" in draft_data and draft_data["items"]:
-                doc.add_paragraph("")  # 빈 줄 추가
-        
-        # 표 데이터 추가
-        if "items" in draft_data and draft_data["items"]:
-            df = pd.DataFrame(draft_data["items"])
-            if not df.empty:
-                table = doc.add_table(rows=1, cols=len(df.columns), style='Table Grid')
-                hdr_cells = table.rows[0].cells
-                for i, col_name in enumerate(df.columns): 
-                    hdr_cells[i].text = col_name
-                for _, row in df.iterrows():
-                    row_cells = table.add_row().cells
-                    for i, col_name in enumerate(df.columns): 
-                        row_cells[i].text = str(row[col_name])
-        doc.add_heading("2. 비고", level=2)
-        doc.add_paragraph(clean_text(draft_data.get('remarks', '')))
-        p_end = doc.add_paragraph("끝."); p_end.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    elif doc_type == '공지문':
-        h = doc.add_heading(draft_data.get('title', '제목 없음'), level=1); h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_paragraph(f"대상: {draft_data.get('target', '')}")
-        doc.add_paragraph(f"핵심 요약: {draft_data.get('summary', '')}")
-        doc.add_paragraph("-" * 30)
-        doc.add_paragraph(clean_text(draft_data.get('details', '')))
-        
-        # 표 데이터 추가
-        if "items" in draft_data and draft_data["items"]:
-            try:
-                df = pd.DataFrame(draft_data["items"])
-                if not df.empty:
-                    doc.add_paragraph("")  # 빈 줄 추가
-                    table = doc.add_table(rows=1, cols=len(df.columns), style='Table Grid')
-                    hdr_cells = table.rows[0].cells
-                    for i, col_name in enumerate(df.columns): 
-                        hdr_cells[i].text = col_name
-                    for _, row in df.iterrows():
-                        row_cells = table.add_row().cells
-                        for i, col_name in enumerate(df.columns): 
-                            row_cells[i].text = str(row[col_name])
-            except Exception as e:
-                doc.add_paragraph(f"표 생성 중 오류: {str(e)}")
-                
-        doc.add_paragraph(f"\n문의: {draft_data.get('contact', '')}")
-    elif doc_type == '공문':
-        h = doc.add_heading("공 식 문 서", level=1); h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_paragraph(f"발신: {draft_data.get('sender_org', '')}")
-        doc.add_paragraph(f"수신: {draft_data.get('receiver', '')}")
-        doc.add_paragraph(f"참조: {draft_data.get('cc', '')}")
-        doc.add_paragraph("-" * 30)
-        doc.add_paragraph(f"제목: {draft_data.get('title', '')}")
-        doc.add_paragraph(clean_text(draft_data.get('body', '')))
-        
-        # 표 데이터 추가
-        if "items" in draft_data and draft_data["items"]:
-            try:
-                df = pd.DataFrame(draft_data["items"])
-                if not df.empty:
-                    doc.add_paragraph("")  # 빈 줄 추가
-                    table = doc.add_table(rows=1, cols=len(df.columns), style='Table Grid')
-                    hdr_cells = table.rows[0].cells
-                    for i, col_name in enumerate(df.columns): 
-                        hdr_cells[i].text = col_name
-                    for _, row in df.iterrows():
-                        row_cells = table.add_row().cells
-                        for i, col_name in enumerate(df.columns): 
-                            row_cells[i].text = str(row[col_name])
-            except Exception as e:
-                doc.add_paragraph(f"표 생성 중 오류: {str(e)}")
-        
-        p = doc.add_paragraph(f"\n\n{draft_data.get('sender_name', '')}"); p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    elif doc_type == '비즈니스 이메일':
-        doc.add_paragraph(f"받는 사람: {signature_data.get('recipient_name', '')} {signature_data.get('recipient_title', '')}")
-        doc.add_paragraph(f"참조: {draft_data.get('cc', '')}")
-        doc.add_paragraph(f"제목: {draft_data.get('subject', '')}")
-        doc.add_paragraph("-" * 30)
-        doc.add_paragraph(f"안녕하세요, {signature_data.get('recipient_name', '')} {signature_data.get('recipient_title', '')}님.")
-        doc.add_paragraph(f"{signature_data.get('signature_name', '')} {signature_data.get('signature_title', '')}입니다.")
-        doc.add_paragraph() 
-        doc.add_paragraph(clean_text(draft_data.get('body', '')))
-        
-        # 표 데이터 추가
-        if "items" in draft_data and draft_data["items"]:
-            try:
-                df = pd.DataFrame(draft_data["items"])
-                if not df.empty:
-                    doc.add_paragraph("")  # 빈 줄 추가
-                    table = doc.add_table(rows=1, cols=len(df.columns), style='Table Grid')
-                    hdr_cells = table.rows[0].cells
-                    for i, col_name in enumerate(df.columns): 
-                        hdr_cells[i].text = col_name
-                    for _, row in df.iterrows():
-                        row_cells = table.add_row().cells
-                        for i, col_name in enumerate(df.columns): 
-                            row_cells[i].text = str(row[col_name])
-            except Exception as e:
-                doc.add_paragraph(f"표 생성 중 오류: {str(e)}")
-        
-        doc.add_paragraph(clean_text(draft_data.get('closing', '')))
-    bio = io.BytesIO()
-    doc.save(bio)
-    return bio.getvalue()
+def purpose_warning(value):
+    if value and len(value.strip()) < 20:
+        return "목적이 너무 짧습니다. 더 상세하게 설명해주세요."
+    return None
+
+def default_table(*rows):
+    return draft_model.Table.from_records(list(rows))
+
+# 문서 종류별 편집 항목: (종류, 필드, 라벨, 옵션)
+# 종류: input(한 줄 입력), area(여러 줄 입력), table(상세 내역 표), signature(서명 정보 입력), markdown, subheader
+# 옵션: help, height, regen(다시 생성 버튼), warn(값 -> 경고 문구),
+#       표는 caption, default(AI 표가 없을 때 보여줄 표), optional((체크박스 라벨, key): 체크해야 표 추가)
+DRAFT_EDITORS = {
+    "품의서": [
+        ("input", "title", "제목", {"help": "결재자가 제목만 보고도 내용을 파악할 수 있도록 작성합니다.", "warn": title_warning}),
+        ("area", "purpose", "목적 및 개요", {"height": 100, "help": "이 품의를 올리는 이유와 목표를 명확하고 간결하게 기술합니다. (Why)", "warn": purpose_warning, "regen": True}),
+        ("markdown", None, "**상세 설명 (텍스트)**", {}),
+        ("area", "body", "배경 및 설명", {"height": 150, "help": "배경, 필요성, 추진 방법 등을 텍스트로 상세히 설명합니다.", "regen": True}),
+        ("table", "items", "**상세 내역 (표)**", {"caption": "구체적인 항목, 수량, 금액 등을 표로 정리합니다.", "regen": True,
+                                              "default": default_table({"항목": "예시 항목", "수량": "1", "단가": "별도 협의", "비고": "설명"})}),
+        ("area", "remarks", "비고", {"height": 150, "help": "예상 비용(How much), 소요 기간(How long), 기대 효과 등 의사결정에 필요한 추가 정보를 기입합니다.", "regen": True}),
+    ],
+    "공지문": [
+        ("input", "title", "제목", {"help": "공지의 내용을 한눈에 파악할 수 있도록 작성합니다."}),
+        ("input", "target", "대상", {"help": "공지의 적용 범위를 명확히 합니다. (예: 전 직원)"}),
+        ("area", "summary", "핵심 요약", {"height": 100, "help": "본문 상단에 한두 문장으로 공지의 핵심을 요약합니다.", "regen": True}),
+        ("area", "details", "상세 내용", {"height": 200, "help": "5W1H 원칙에 따라 구체적인 정보를 제공합니다. 번호 매기기: 1. → 1) → (1)", "regen": True}),
+        ("table", "items", "**상세 내역 (표) - 선택사항**", {"caption": "일정, 교육과정, 제도 변경사항 등을 표로 정리할 수 있습니다.", "regen": True,
+                                                     "optional": ("표 추가하기 (일정, 교육과정 등)", "add_table_gongji"),
+                                                     "default": default_table({"항목": "교육과정", "날짜": "2025-01-15", "시간": "09:00", "장소": "대회의실"})}),
+        ("input", "contact", "문의처", {"help": "관련 질문에 답변할 담당자 정보입니다."}),
+    ],
+    "공문": [
+        ("input", "sender_org", "발신 기관명", {}),
+        ("input", "receiver", "수신", {}),
+        ("input", "cc", "참조", {}),
+        ("input", "title", "제목", {}),
+        ("area", "body", "내용", {"height": 250, "regen": True}),
+        ("table", "items", "**상세 내역 (표) - 선택사항**", {"caption": "행사일정, 제출서류, 협력요청 등을 표로 정리할 수 있습니다.", "regen": True,
+                                                     "optional": ("표 추가하기 (일정, 서류, 협력요청 등)", "add_table_gongmun"),
+                                                     "default": default_table({"항목": "제출서류", "서류명": "사업자등록증", "제출기한": "2025-01-31", "제출처": "총무팀"})}),
+        ("input", "sender_name", "발신 명의", {}),
+    ],
+    "비즈니스 이메일": [
+        ("subheader", None, "받는 사람 정보", {}),
+        ("signature", "recipient_name", "받는 사람 이름", {}),
+        ("signature", "recipient_title", "받는 사람 직책", {}),
+        ("input", "cc", "참조 (CC)", {}),
+        ("subheader", None, "메일 내용", {}),
+        ("input", "subject", "제목", {}),
+        ("area", "body", "본론", {"height": 200, "regen": True}),
+        ("table", "items", "**상세 내역 (표) - 선택사항**", {"caption": "미팅일정, 견적서, 업무일정 등을 표로 정리할 수 있습니다.", "regen": True,
+                                                     "optional": ("표 추가하기 (일정, 견적, 업무 등)", "add_table_email"),
+                                                     "default": default_table({"항목": "미팅일정", "날짜": "2025-01-15", "시간": "14:00", "안건": "프로젝트 계획 논의"})}),
+        ("area", "closing", "결론", {"height": 100, "regen": True}),
+    ],
+}
+
+# 이메일 서명 기본값: (필드, 라벨, 기본값)
+SIGNATURE_FIELDS = [
+    ("signature_name", "이름", "홍길동"),
+    ("signature_title", "직책", "대리"),
+    ("signature_team", "부서/팀", "총무팀"),
+    ("signature_phone", "연락처", "010-1234-5678"),
+]
+
+def render_items_editor(draft, options):
+    """상세 내역 표 편집기. 편집한 표는 draft.edited_items에 둡니다. (미리보기 때 반영)"""
+    table = draft.items
+    if not table:
+        optional = options.get("optional")
+        if optional and not st.checkbox(optional[0], key=optional[1]):
+            draft.edited_items = None
+            return
+        table = options["default"]
+    try:
+        edited = st.data_editor(table.to_frame(), num_rows="dynamic")
+        draft.edited_items = draft_model.Table.from_frame(edited, previous=table)
+    except Exception as e:
+        st.error(f"⚠️ 표 데이터 처리 중 오류가 발생했습니다: {str(e)}")
+        draft.edited_items = None
+
+def render_draft_editor(doc_type, draft, signature_data):
+    """DRAFT_EDITORS에 따라 편집기를 그리고 입력값을 초안(draft)과 서명 정보(signature_data)에 반영합니다."""
+    for kind, field, label, options in DRAFT_EDITORS[doc_type]:
+        if kind == "subheader":
+            st.subheader(label)
+        elif kind == "markdown":
+            st.markdown(label)
+        elif kind == "signature":
+            signature_data[field] = st.text_input(label, value="")
+        elif kind == "table":
+            st.markdown(label)
+            st.caption(options["caption"])
+            render_items_editor(draft, options)
+        else:
+            widget = st.text_input if kind == "input" else st.text_area
+            value = widget(label, value=getattr(draft, field), **{k: options[k] for k in ("height", "help") if k in options})
+            warning = options.get("warn") and options["warn"](value)
+            if warning:
+                st.warning(f"⚠️ {warning}")
+            setattr(draft, field, value)
+        if options.get("regen"):
+            render_regenerate_button(doc_type, draft, field)
+    if doc_type == "비즈니스 이메일":
+        with st.expander("내 서명 정보 입력/수정"):
+            for field, label, default in SIGNATURE_FIELDS:
+                signature_data[field] = st.text_input(label, value=default)
 
 st.set_page_config(page_title="문서 작성 도우미", layout="wide")
-env = Environment(loader=FileSystemLoader('.'))
-def load_template(template_name): return env.get_template(template_name)
-def generate_html(template, context): return template.render(context)
 
 def clear_all_state():
     """문서 유형 변경 시 관련 상태만 초기화"""
-    keys_to_keep = ['doc_type_selector']
+    keys_to_keep = ['doc_type_selector', 'artifact_session', 'history_query', 'history_only_current',
+                    'rerun_profiler', 'profile_results', 'profile_stages', 'job_ids']
+    if 'artifact_session' in st.session_state:
+        artifact_store.drop_session(st.session_state.artifact_session)
     keys_to_remove = [key for key in st.session_state.keys() if key not in keys_to_keep]
     for key in keys_to_remove:
         del st.session_state[key]
@@ -596,6 +832,13 @@ st.sidebar.title("📑 문서 종류 선택")
 if 'previous_doc_type' not in st.session_state:
     st.session_state.previous_doc_type = None
 
+# 작성 이력에서 불러올 초안 (문서 종류가 다르면 먼저 전환)
+history_record = None
+if st.session_state.get("history_load_id"):
+    history_record = draft_history.get_draft(st.session_state.pop("history_load_id"))
+    if history_record:
+        st.session_state.doc_type_selector = history_record["doc_type"]
+
 doc_type = st.sidebar.radio("작성할 문서의 종류를 선택하세요.", ('품의서', '공지문', '공문', '비즈니스 이메일'), key="doc_type_selector")
 
 # --- 설정 섹션 ---
@@ -616,6 +859,35 @@ model_costs = {
 }
 st.sidebar.caption(f"비용: {model_costs.get(current_model, '알 수 없음')}")
 
+# 작업별 라우팅 및 모델 상태 (최근 5분)
+with st.sidebar.expander("📈 작업별 모델 라우팅"):
+    for task, task_label in (("analyze", "추가 질문 분석"), ("draft", "전체 초안"), ("regenerate", "필드 재생성")):
+        st.caption(f"{task_label}: {' → '.join(router.candidates(task, current_model))}")
+    for model_name, stats in router.all_stats().items():
+        p95_text = f"{stats['p95']:.1f}초" if stats['p95'] is not None else "-"
+        st.caption(f"{model_name}: 호출 {stats['calls']}회, p95 {p95_text}, 오류율 {stats['error_rate']:.0%}")
+    if isinstance(client, llm_backends.PooledClient) and len(client.slots) > 1:
+        st.caption("API 키별 사용량")
+        for key_stats in client.stats():
+            cooling = f", {key_stats['cooldown']:.0f}초 대기" if key_stats["cooldown"] else ""
+            st.caption(f"{key_stats['key']}: 호출 {key_stats['calls']}회, 최근 1분 {key_stats['last_minute']}회, "
+                       f"한도 초과 {key_stats['rate_limited']}회{cooling}")
+
+with st.sidebar.expander("💰 토큰 사용량 (최근 7일)"):
+    try:
+        usage_rows = usage_ledger.summary(days=7)
+        usage_sections = usage_ledger.section_report(days=7)
+    except Exception as e:
+        usage_rows, usage_sections = [], []
+        st.caption(f"사용량 기록을 불러오지 못했습니다: {str(e)}")
+    if usage_rows:
+        st.caption(f"호출 {sum(r['calls'] for r in usage_rows)}회 (캐시 {sum(r['cached'] for r in usage_rows)}회), 예상 비용 ${sum(r['cost'] for r in usage_rows):.4f}")
+        st.dataframe(pd.DataFrame([{"문서": r["doc_type"], "작업": r["task"], "모델": r["model"], "호출": r["calls"], "비용($)": round(r["cost"], 4)} for r in usage_rows]), hide_index=True, use_container_width=True)
+        st.caption("프롬프트 구성 요소별 비중")
+        st.dataframe(pd.DataFrame([{"구성 요소": e["section"], "토큰": e["tokens"], "비용 비중": f"{e['cost_share']:.0%}", "지연(초)": round(e["latency"], 1)} for e in usage_sections]), hide_index=True, use_container_width=True)
+    else:
+        st.caption("아직 기록된 AI 호출이 없습니다.")
+
 # 모델 변경 요청 처리
 if st.sidebar.button("🔧 모델 변경하기", use_container_width=True):
     if not st.session_state.model_password_verified:
@@ -681,6 +953,10 @@ if learning_status["manual"] or learning_status["samples"] or learned_documents.
         if summary:
             total_length = summary.get('total_content_length', 0)
             st.sidebar.caption(f"학습된 내용: {total_length:,}자")
+        style_profiles = learned_documents.get('style_profiles')
+        if style_profiles:
+            profiled = ", ".join(style_profiles.get('doc_types', {})) or "없음"
+            st.sidebar.caption(f"문체 프로필: {profiled} (반복 문구 {style_profiles.get('boilerplate_lines', 0)}종 제외)")
     else:
         # 기존 방식
         st.sidebar.success("📚 학습 완료!")
@@ -693,158 +969,24 @@ if learning_status["manual"] or learning_status["samples"] or learned_documents.
     st.sidebar.caption(f"학습 일시: {learned_at}")
 else:
     st.sidebar.warning("📖 아직 학습되지 않음")
+watcher = corpus_watcher.current()
+if watcher:
+    watch_status = f"👀 폴더 자동 학습 중 ({watcher.interval:g}초마다 확인"
+    if watcher.last_checked:
+        watch_status += f", 마지막 확인 {watcher.last_checked:%H:%M:%S}"
+    st.sidebar.caption(watch_status + ")")
+    if watcher.last_change:
+        change = watcher.last_change
+        st.sidebar.caption(f"최근 반영 {change['published_at']}: 추가 {len(change['added'])}, 변경 {len(change['changed'])}, 삭제 {len(change['removed'])}")
+    if watcher.last_error:
+        st.sidebar.warning(f"⚠️ 폴더 자동 학습 오류: {watcher.last_error}")
 
-# 학습 실행 버튼
+# 학습 실행 버튼 (백그라운드 작업으로 실행하므로 새로고침이나 재접속과 관계없이 계속 진행)
 if st.sidebar.button("📚 PDF 문서 학습하기", use_container_width=True):
     try:
-        with st.spinner("PDF 문서를 학습 중입니다..."):
-            # 실제 PDF 파일 읽기
-            from datetime import datetime
-            
-            def read_pdf_file(filename):
-                """PDF 파일을 읽어서 텍스트를 추출합니다."""
-                try:
-                    if not os.path.exists(filename):
-                        return f"파일 '{filename}'을 찾을 수 없습니다.", False
-                    
-                    # PyPDF2 import 확인
-                    try:
-                        import PyPDF2
-                    except ImportError:
-                        return f"PyPDF2 모듈을 찾을 수 없습니다. PDF 읽기 기능이 비활성화됩니다.", False
-                    
-                    with open(filename, 'rb') as file:
-                        pdf_reader = PyPDF2.PdfReader(file)
-                        text = ""
-                        page_count = len(pdf_reader.pages)
-                        
-                        for i, page in enumerate(pdf_reader.pages):
-                            try:
-                                page_text = page.extract_text()
-                                if page_text:
-                                    text += page_text + "\n"
-                            except Exception as page_error:
-                                st.warning(f"⚠️ {filename} 페이지 {i+1} 읽기 실패: {str(page_error)}")
-                        
-                        if not text.strip():
-                            return f"PDF '{filename}'에서 텍스트를 추출할 수 없습니다. (총 {page_count}페이지)", False
-                        
-                        return text.strip(), True
-                        
-                except Exception as e:
-                    return f"PDF '{filename}' 읽기 중 오류: {str(e)}", False
-            
-            # 폴더에서 모든 PDF 파일 자동 검색
-            import glob
-            pdf_files = glob.glob('*.pdf') + glob.glob('*.PDF')
-            
-            st.info(f"폴더에서 {len(pdf_files)}개의 PDF 파일을 발견했습니다.")
-            
-            learned_content = {
-                'learned_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'status': 'learned',
-                'files': {},
-                'summary': {
-                    'total_files': len(pdf_files),
-                    'successful_files': 0,
-                    'failed_files': 0,
-                    'total_content_length': 0
-                }
-            }
-            
-            # 각 PDF 파일을 순차적으로 학습
-            for i, pdf_file in enumerate(pdf_files):
-                st.info(f"📖 {pdf_file} 읽는 중... ({i+1}/{len(pdf_files)})")
-                
-                try:
-                    content, success = read_pdf_file(pdf_file)
-                    
-                    if success:
-                        learned_content['files'][pdf_file] = {
-                            'filename': pdf_file,
-                            'content': content,
-                            'source': 'pdf_extracted',
-                            'length': len(content),
-                            'success': True
-                        }
-                        learned_content['summary']['successful_files'] += 1
-                        learned_content['summary']['total_content_length'] += len(content)
-                        st.success(f"✅ {pdf_file} 학습 완료 ({len(content):,}자)")
-                    else:
-                        learned_content['files'][pdf_file] = {
-                            'filename': pdf_file,
-                            'content': content,
-                            'source': 'error',
-                            'length': 0,
-                            'success': False
-                        }
-                        learned_content['summary']['failed_files'] += 1
-                        st.error(f"❌ {pdf_file}: {content[:100]}...")
-                        
-                except Exception as e:
-                    learned_content['files'][pdf_file] = {
-                        'filename': pdf_file,
-                        'content': f"처리 중 오류 발생: {str(e)}",
-                        'source': 'error',
-                        'length': 0,
-                        'success': False
-                    }
-                    learned_content['summary']['failed_files'] += 1
-                    st.error(f"❌ {pdf_file} 처리 실패: {str(e)}")
-            
-            # 기존 파일들 호환성 유지 (manual, samples 키 생성)
-            manual_files = [f for f in pdf_files if '메뉴얼' in f or 'manual' in f.lower()]
-            samples_files = [f for f in pdf_files if '품의서' in f or '모음' in f or 'sample' in f.lower()]
-            
-            if manual_files:
-                learned_content['manual'] = learned_content['files'][manual_files[0]]
-            else:
-                learned_content['manual'] = {
-                    'content': "기본 가이드라인을 사용합니다.",
-                    'source': 'fallback_guidelines',
-                    'success': False
-                }
-            
-            if samples_files:
-                learned_content['samples'] = learned_content['files'][samples_files[0]]
-            else:
-                learned_content['samples'] = {
-                    'content': "기본 샘플 패턴을 사용합니다.",
-                    'source': 'fallback_patterns', 
-                    'success': False
-                }
-            
-            # 학습 결과 확인 및 저장
-            successful_files = learned_content['summary']['successful_files']
-            total_files = learned_content['summary']['total_files']
-            
-            if successful_files > 0:
-                # 성공한 파일이 있는 경우에만 저장
-                with open('learned_documents.json', 'w', encoding='utf-8') as f:
-                    json.dump(learned_content, f, ensure_ascii=False, indent=2)
-                
-                st.success(f"📚 PDF 학습 완료! 총 {total_files}개 파일 중 {successful_files}개 성공")
-                st.info(f"학습된 내용: {learned_content['summary']['total_content_length']:,}자")
-                st.info(f"학습 일시: {learned_content['learned_at']}")
-                
-                # 학습 완료 후 다시 로드
-                if load_learned_documents():
-                    st.sidebar.success("✅ PDF 학습이 완료되었습니다!")
-                    st.rerun()
-                else:
-                    st.sidebar.error("❌ 학습 결과를 로드할 수 없습니다.")
-            else:
-                # 성공한 파일이 없는 경우
-                st.error(f"❌ PDF 학습 실패! 총 {total_files}개 파일 모두 읽기 실패")
-                st.warning("PyPDF2 모듈이나 PDF 파일에 문제가 있을 수 있습니다.")
-                
-                # 실패 상세 정보 표시
-                for pdf_file, file_data in learned_content['files'].items():
-                    if not file_data['success']:
-                        st.error(f"📄 {pdf_file}: {file_data['content'][:200]}...")
-                
-                st.info("💡 해결 방법: requirements.txt에 PyPDF2가 포함되어 있는지 확인하고, Streamlit을 재시작해보세요.")
-                
+        submit_job("learn", {"folder": ".", "backend": pdf_text_backend,
+                             "profile": profiling_allowed and st.session_state.get("profile_stages", False)}, unique=True)
+        st.sidebar.info("📚 백그라운드에서 PDF 학습을 시작했습니다. 진행 상황은 '⏳ 백그라운드 작업'에서 확인하세요.")
     except Exception as e:
         st.sidebar.error(f"❌ 학습 실행 중 오류: {str(e)}")
 
@@ -866,9 +1008,12 @@ html_key = f"html_{doc_type.replace(' ', '_')}"
 
 # 필요한 상태만 초기화
 state_defaults = {
-    draft_key: {},
+    draft_key: None,
     html_key: "",
     "clarifying_questions": None,
+    "clarify_conversation": None,
+    "preview_fingerprint": None,
+    "auto_preview_pending": None,
     "current_keywords": "",
     "file_processing_complete": False,
     "ai_generation_complete": False
@@ -878,6 +1023,65 @@ for key, default_value in state_defaults.items():
     if key not in st.session_state:
         st.session_state[key] = default_value
 
+if history_record:
+    # 저장된 초안을 편집기로 불러오고, 이후 미리보기는 같은 이력 항목을 갱신
+    st.session_state[draft_key] = draft_model.from_dict(doc_type, history_record["fields"])
+    st.session_state[html_key] = ""
+    st.session_state.preview_fingerprint = None
+    st.session_state.clarifying_questions = None
+    st.session_state.clarify_conversation = None
+    st.session_state.draft_history_meta = {"id": history_record["id"], "keywords": history_record["keywords"], "model": history_record["model"]}
+
+# 작성 이력 검색
+with st.sidebar.expander("🗂️ 작성 이력 검색"):
+    history_query = st.text_input("검색어", key="history_query", placeholder="예: 태블릿 구매, 보안 교육")
+    only_current_type = st.checkbox("현재 문서 종류만", value=True, key="history_only_current")
+    try:
+        history_results = draft_history.search_drafts(history_query, doc_type if only_current_type else None, limit=10)
+    except Exception as e:
+        history_results = []
+        st.caption(f"작성 이력을 불러오지 못했습니다: {str(e)}")
+    if not history_results:
+        st.caption("검색 결과가 없습니다." if history_query else "아직 저장된 초안이 없습니다. 미리보기를 만들면 자동으로 저장됩니다.")
+    if history_results and st.button("📦 검색 결과 일괄 내보내기 (PDF·Word)", use_container_width=True):
+        submit_job("export", {"draft_ids": [record["id"] for record in history_results]})
+        st.caption("백그라운드 작업으로 내보내기를 시작했습니다.")
+    for record in history_results:
+        st.markdown(f"**{record['title'] or '(제목 없음)'}**")
+        st.caption(f"{record['doc_type']} · {record['updated_at']} · {record['model'] or '-'}")
+        if st.button("불러오기", key=f"history_load_{record['id']}", use_container_width=True):
+            st.session_state.history_load_id = record["id"]
+            st.rerun()
+
+# 백그라운드 작업 (학습, 일괄 내보내기, OCR)
+recent_jobs = session_jobs()
+jobs_active = any(job["status"] in job_queue.ACTIVE_STATUSES for job in recent_jobs)
+with st.sidebar.expander("⏳ 백그라운드 작업", expanded=jobs_active):
+    ocr_file = st.file_uploader("스캔 PDF 텍스트 추출 (OCR)", type=["pdf"], key="ocr_job_file")
+    if ocr_file is not None and st.button("텍스트 추출 시작", use_container_width=True):
+        submit_job("ocr", {"path": job_queue.queue.store_input(ocr_file.name, ocr_file.getvalue()),
+                           "name": ocr_file.name, "backend": pdf_text_backend})
+        jobs_active = True
+    if jobs_active:
+        job_progress_panel()
+    else:
+        render_jobs(recent_jobs)
+
+# 성능 프로파일링 (관리자)
+if profiling_allowed:
+    with st.sidebar.expander("🩺 성능 프로파일링 (관리자)"):
+        if st.button("다음 화면 갱신 1회 프로파일링", use_container_width=True):
+            st.session_state.profile_next_rerun = True
+        if st.session_state.get("profile_next_rerun"):
+            st.caption("다음에 화면이 갱신될 때(입력, 버튼 클릭) 전체 스크립트 실행을 기록합니다.")
+        st.checkbox("학습·내보내기 단계 프로파일링", key="profile_stages")
+        for i, result in enumerate(st.session_state.get("profile_results", [])):
+            st.caption(f"{result['created_at']} · {result['stage']} · {result['seconds']:.2f}초 · 최대 메모리 {result['peak_mb']:.1f} MB")
+            if os.path.exists(result["path"]):
+                with open(result["path"], "rb") as f:
+                    st.download_button("📥 프로파일 다운로드", data=f.read(), file_name=os.path.basename(result["path"]), mime="application/zip", key=f"profile_download_{i}", use_container_width=True)
+        st.caption("zip 안의 speedscope.json은 https://www.speedscope.app 에서, allocations.txt는 메모리 할당 상위 목록입니다.")
+
 if openai_available:
     st.title(f"✍️ {doc_type} 작성 가이드")
     col1, col2 = st.columns([3, 1])
@@ -938,6 +1142,12 @@ if not st.session_state.clarifying_questions:
         else:
             st.info(f"파일 {len(uploaded_files)}개 업로드됨 (전체 크기: {total_size/1024/1024:.1f}MB)")
     use_clarifying_questions = st.checkbox("AI에게 추가 질문을 받아 문서 완성도 높이기 (선택 사항)")
+    use_single_round_trip = False
+    if use_clarifying_questions:
+        use_single_round_trip = st.checkbox("⚡ 한 번의 요청으로 질문 또는 초안 받기 (빠른 모드)", value=True, help="입력이 충분하면 추가 질문 단계 없이 바로 초안을 받습니다. 질문에 답변하면 같은 대화를 이어서 초안을 작성합니다.")
+    use_speculative = st.checkbox("🔮 입력을 마치면 미리 분석하기 (실험적)", key="speculative_mode", help="첨부 파일은 올리는 즉시, 추가 질문 분석은 키워드 입력란을 벗어나거나 Ctrl+Enter로 입력을 반영하는 즉시 백그라운드에서 시작해, 버튼을 누른 뒤 기다리는 시간을 줄입니다. 글자를 입력하는 도중에는 입력 내용이 반영되지 않아 분석하지 않습니다.")
+    if use_speculative:
+        speculative_prefetch(doc_type, sub_type, uploaded_files, use_clarifying_questions and not use_single_round_trip)
     ai_button_disabled = not openai_available
     if ai_button_disabled:
         st.warning("⚠️ OpenAI API 키가 필요합니다. Streamlit Secrets에 OPENAI_API_KEY를 설정해주세요.")
@@ -959,7 +1169,7 @@ if not st.session_state.clarifying_questions:
             for error in validation_errors:
                 st.error(f"⚠️ {error}")
         else:
-            full_keywords = f"유형: {sub_type} / 내용: {keywords}" if sub_type != "선택 안함" else keywords
+            full_keywords = compose_keywords(sub_type, keywords)
             st.session_state.current_keywords = full_keywords
             file_context = ""
             
@@ -973,7 +1183,7 @@ if not st.session_state.clarifying_questions:
                     progress_bar.progress(progress)
                     status_text.text(f"파일 처리 중: {uploaded_file.name} ({i+1}/{len(uploaded_files)})")
                     
-                    file_text = read_uploaded_file(uploaded_file)
+                    file_text = read_uploaded_file_speculative(uploaded_file) if use_speculative else read_uploaded_file(uploaded_file)
                     if file_text:
                         file_context += f"--- 첨부 파일: {uploaded_file.name} ---\n{file_text}\n\n"
                 
@@ -982,9 +1192,34 @@ if not st.session_state.clarifying_questions:
                 st.success(f"파일 처리 완료: {len(uploaded_files)}개 파일")
             
             analysis_complete = True
-            if use_clarifying_questions:
+            # 로컬 6W3H 점검으로 결정되면 AI 호출 없이 질문하거나 바로 초안을 생성하고, 애매할 때만 AI가 판단
+            local_analysis = completeness.assess(full_keywords, doc_type) if use_clarifying_questions else None
+            if local_analysis and local_analysis["status"] == "incomplete":
+                st.session_state.clarifying_questions = local_analysis["questions"]
+                analysis_complete = False
+                st.info("🔍 문서 품질 향상을 위해 추가 정보가 필요합니다.")
+                st.rerun()
+            elif local_analysis and local_analysis["status"] == "ambiguous" and use_single_round_trip:
+                # 질문 또는 초안을 한 번의 호출로 받음
+                analysis_complete = False
+                with st.spinner("🤖 AI가 키워드를 분석하고, 정보가 충분하면 바로 초안을 작성합니다..."):
+                    result, conversation = clarify_or_draft(doc_type, full_keywords, file_context)
+                if result and result.get("status") == "incomplete":
+                    st.session_state.clarifying_questions = result.get("questions", [])
+                    # 첨부 파일 내용이 포함된 대화는 저장소에 두고 참조만 보관
+                    st.session_state.clarify_conversation = put_artifact("clarify_conversation", json.dumps(conversation, ensure_ascii=False))
+                    st.info("🔍 문서 품질 향상을 위해 추가 정보가 필요합니다.")
+                    st.rerun()
+                elif result and result.get("draft"):
+                    st.session_state[draft_key] = draft_model.from_dict(doc_type, result["draft"])
+                    start_draft_history(full_keywords)
+                    st.session_state[html_key] = ""
+                    st.success("✨ AI가 문서 초안을 성공적으로 생성했습니다! 아래에서 내용을 확인하고 수정해주세요.")
+                else:
+                    st.error("문서 생성에 실패했습니다. 다시 시도해주세요.")
+            elif local_analysis and local_analysis["status"] == "ambiguous":
                 with st.spinner("🤖 AI가 키워드를 분석하여 추가 질문을 준비 중입니다..."):
-                    analysis = analyze_keywords(full_keywords, doc_type)
+                    analysis = analyze_keywords_speculative(full_keywords, doc_type) if use_speculative else analyze_keywords(full_keywords, doc_type)
                     if analysis and analysis.get("status") == "incomplete":
                         st.session_state.clarifying_questions = analysis.get("questions", [])
                         analysis_complete = False
@@ -1003,14 +1238,14 @@ if not st.session_state.clarifying_questions:
                 
                 progress_bar.progress(1.0)
                 status_text.text("✅ 문서 생성 완료!")
-                import time
                 time.sleep(1)
                 
                 progress_bar.empty()
                 status_text.empty()
                     
                 if ai_result:
-                    st.session_state[draft_key] = ai_result
+                    st.session_state[draft_key] = draft_model.from_dict(doc_type, ai_result)
+                    start_draft_history(full_keywords)
                     st.session_state[html_key] = ""
                     st.success("✨ AI가 문서 초안을 성공적으로 생성했습니다! 아래에서 내용을 확인하고 수정해주세요.")
                 else:
@@ -1060,19 +1295,26 @@ else:
             ]
             progress_bar, status_text = show_progress_with_status(steps)
             
-            ai_result = generate_ai_draft(doc_type, combined_info)
+            conversation_json = get_artifact(st.session_state.get("clarify_conversation"))
+            conversation = json.loads(conversation_json) if conversation_json else None
+            if conversation:
+                # 빠른 모드: 첫 호출의 대화(같은 접두부)에 이어서 답변만 전송
+                ai_result = continue_draft_with_answers(doc_type, conversation, answers)
+            else:
+                ai_result = generate_ai_draft(doc_type, combined_info)
             
             progress_bar.progress(1.0)
             status_text.text("✅ 개선된 문서 생성 완료!")
-            import time
             time.sleep(1)
             
             progress_bar.empty()
             status_text.empty()
             
             if ai_result:
-                st.session_state[draft_key] = ai_result
+                st.session_state[draft_key] = draft_model.from_dict(doc_type, ai_result)
+                start_draft_history(combined_info)
                 st.session_state.clarifying_questions = None
+                st.session_state.clarify_conversation = None
                 st.session_state.current_keywords = ""
                 st.session_state[html_key] = ""
                 st.success("✨ 추가 정보를 반영한 개선된 문서가 생성되었습니다!")
@@ -1081,388 +1323,71 @@ else:
                 st.error("문서 생성에 실패했습니다. 다시 시도해주세요.")
 
 st.divider()
-draft = st.session_state.get(draft_key, {})
+draft = st.session_state.get(draft_key)
 
 if draft:
-    preview_button = False; signature_data = {}
+    signature_data = {}
     st.markdown("---")
     st.subheader("📄 AI 생성 초안 검토 및 수정")
-    if doc_type == '품의서':
-        p_data = draft
-        title_input = st.text_input("제목", value=p_data.get("title", ""), help="결재자가 제목만 보고도 내용을 파악할 수 있도록 작성합니다.")
-        if title_input and len(title_input.strip()) < 5:
-            st.warning("⚠️ 제목이 너무 짧습니다. 더 드립적으로 작성해주세요.")
-        elif title_input and len(title_input) > 100:
-            st.warning("⚠️ 제목이 너무 깁니다. 100자 이하로 작성해주세요.")
-        p_data["title"] = title_input
-        
-        purpose_input = st.text_area("목적 및 개요", value=p_data.get("purpose", ""), height=100, help="이 품의를 올리는 이유와 목표를 명확하고 간결하게 기술합니다. (Why)")
-        if purpose_input and len(purpose_input.strip()) < 20:
-            st.warning("⚠️ 목적이 너무 짧습니다. 더 상세하게 설명해주세요.")
-        p_data["purpose"] = purpose_input
-        
-        # 텍스트 내용 편집
-        st.markdown("**상세 설명 (텍스트)**")
-        p_data["body_edited"] = st.text_area("배경 및 설명", value=p_data.get("body", ""), height=150, help="배경, 필요성, 추진 방법 등을 텍스트로 상세히 설명합니다.")
-        
-        # 표 데이터 편집
-        st.markdown("**상세 내역 (표)**")
-        st.caption("구체적인 항목, 수량, 금액 등을 표로 정리합니다.")
-        
-        try:
-            if "items" in p_data and p_data["items"] and len(p_data["items"]) > 0:
-                # AI가 생성한 표가 있는 경우 - 안전하게 DataFrame 생성
-                items_data = p_data.get("items", [])
-                if isinstance(items_data, list) and len(items_data) > 0:
-                    # 첫 번째 항목이 딕셔너리인지 확인
-                    if isinstance(items_data[0], dict):
-                        try:
-                            p_data["df"] = pd.DataFrame(items_data)
-                            p_data["df_edited"] = st.data_editor(p_data["df"], num_rows="dynamic")
-                        except Exception as e:
-                            st.warning(f"⚠️ AI 생성 표 데이터에 문제가 있어 기본 형식을 사용합니다: {str(e)}")
-                            # 기본 구조로 대체
-                            default_items = [
-                                {"항목": "예시 항목", "수량": "1", "단가": "별도 협의", "비고": "설명"}
-                            ]
-                            p_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                    else:
-                        # 데이터 형식이 올바르지 않은 경우
-                        default_items = [
-                            {"항목": "예시 항목", "수량": "1", "단가": "별도 협의", "비고": "설명"}
-                        ]
-                        p_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                else:
-                    # 빈 데이터인 경우
-                    default_items = [
-                        {"항목": "예시 항목", "수량": "1", "단가": "별도 협의", "비고": "설명"}
-                    ]
-                    p_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-            else:
-                # 표가 없는 경우 기본 구조 제공
-                default_items = [
-                    {"항목": "예시 항목", "수량": "1", "단가": "별도 협의", "비고": "설명"}
-                ]
-                p_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-        except Exception as e:
-            st.error(f"⚠️ 표 데이터 처리 중 오류가 발생했습니다: {str(e)}")
-            # 최종 fallback
-            default_items = [
-                {"항목": "예시 항목", "수량": "1", "단가": "100,000", "금액": "100,000", "비고": "설명"}
-            ]
-            p_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-        
-        p_data["remarks"] = st.text_area("비고", value=p_data.get("remarks", ""), height=150, help="예상 비용(How much), 소요 기간(How long), 기대 효과 등 의사결정에 필요한 추가 정보를 기입합니다.")
-        
-        # 품의서 유효성 검사
-        validation_errors = validate_document_fields(doc_type, p_data)
-        
-        if validation_errors:
-            for error in validation_errors:
-                st.error(f"⚠️ {error}")
-            preview_button = st.button("미리보기 생성", use_container_width=True, disabled=True)
-        else:
-            preview_button = st.button("미리보기 생성", use_container_width=True)
-    elif doc_type == '공지문':
-        g_data = draft
-        g_data["title"] = st.text_input("제목", value=g_data.get("title", ""), help="공지의 내용을 한눈에 파악할 수 있도록 작성합니다.")
-        g_data["target"] = st.text_input("대상", value=g_data.get("target", ""), help="공지의 적용 범위를 명확히 합니다. (예: 전 직원)")
-        g_data["summary"] = st.text_area("핵심 요약", value=g_data.get("summary", ""), height=100, help="본문 상단에 한두 문장으로 공지의 핵심을 요약합니다.")
-        # 상세 내용이 JSON 객체 형태인 경우 텍스트로 변환
-        details_value = g_data.get("details", "")
-        if isinstance(details_value, dict):
-            formatted_details = ""
-            for key, value in details_value.items():
-                if key.strip() in ['1.', '2.', '3.', '4.', '5.']:
-                    formatted_details += f"{key} {value}\n"
-                elif key.strip().endswith(')') and key.strip().replace(')', '').strip().isdigit():
-                    formatted_details += f"  {key} {value}\n"
-                elif key.strip().startswith('(') and key.strip().endswith(')'):
-                    formatted_details += f"    {key} {value}\n"
-                else:
-                    formatted_details += f"{key} {value}\n"
-            details_value = formatted_details
-        
-        g_data["details"] = st.text_area("상세 내용", value=details_value, height=200, help="5W1H 원칙에 따라 구체적인 정보를 제공합니다. 번호 매기기: 1. → 1) → (1)")
-        
-        # 표 데이터 편집 (공지문용)
-        st.markdown("**상세 내역 (표) - 선택사항**")
-        st.caption("일정, 교육과정, 제도 변경사항 등을 표로 정리할 수 있습니다.")
-        try:
-            if "items" in g_data and g_data["items"] and len(g_data["items"]) > 0:
-                # AI가 생성한 표가 있는 경우
-                items_data = g_data.get("items", [])
-                if isinstance(items_data, list) and len(items_data) > 0 and isinstance(items_data[0], dict):
-                    try:
-                        g_data["df"] = pd.DataFrame(items_data)
-                        g_data["df_edited"] = st.data_editor(g_data["df"], num_rows="dynamic")
-                    except Exception as e:
-                        st.warning(f"⚠️ AI 생성 표 데이터에 문제가 있어 기본 형식을 사용합니다: {str(e)}")
-                        default_items = [
-                            {"항목": "교육과정", "날짜": "2025-01-15", "시간": "09:00", "장소": "대회의실"}
-                        ]
-                        g_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                else:
-                    default_items = [
-                        {"항목": "교육과정", "날짜": "2025-01-15", "시간": "09:00", "장소": "대회의실"}
-                    ]
-                    g_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-            else:
-                # 표가 없는 경우 기본 구조 제공 (필요시만)
-                if st.checkbox("표 추가하기 (일정, 교육과정 등)", key="add_table_gongji"):
-                    default_items = [
-                        {"항목": "교육과정", "날짜": "2025-01-15", "시간": "09:00", "장소": "대회의실"}
-                    ]
-                    g_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                else:
-                    g_data["df_edited"] = None
-        except Exception as e:
-            st.error(f"⚠️ 표 데이터 처리 중 오류가 발생했습니다: {str(e)}")
-            g_data["df_edited"] = None
-        
-        g_data["contact"] = st.text_input("문의처", value=g_data.get("contact", ""), help="관련 질문에 답변할 담당자 정보입니다.")
-        preview_button = st.button("미리보기 생성", use_container_width=True)
-    elif doc_type == '공문':
-        gm_data = draft
-        gm_data["sender_org"] = st.text_input("발신 기관명", value=gm_data.get("sender_org", ""))
-        gm_data["receiver"] = st.text_input("수신", value=gm_data.get("receiver", ""))
-        gm_data["cc"] = st.text_input("참조", value=gm_data.get("cc", ""))
-        gm_data["title"] = st.text_input("제목", value=gm_data.get("title", ""))
-        gm_data["body"] = st.text_area("내용", value=gm_data.get("body", ""), height=250)
-        
-        # 표 데이터 편집 (공문용)
-        st.markdown("**상세 내역 (표) - 선택사항**")
-        st.caption("행사일정, 제출서류, 협력요청 등을 표로 정리할 수 있습니다.")
-        try:
-            if "items" in gm_data and gm_data["items"] and len(gm_data["items"]) > 0:
-                # AI가 생성한 표가 있는 경우
-                items_data = gm_data.get("items", [])
-                if isinstance(items_data, list) and len(items_data) > 0 and isinstance(items_data[0], dict):
-                    try:
-                        gm_data["df"] = pd.DataFrame(items_data)
-                        gm_data["df_edited"] = st.data_editor(gm_data["df"], num_rows="dynamic")
-                    except Exception as e:
-                        st.warning(f"⚠️ AI 생성 표 데이터에 문제가 있어 기본 형식을 사용합니다: {str(e)}")
-                        default_items = [
-                            {"항목": "제출서류", "서류명": "사업자등록증", "제출기한": "2025-01-31", "제출처": "총무팀"}
-                        ]
-                        gm_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                else:
-                    default_items = [
-                        {"항목": "제출서류", "서류명": "사업자등록증", "제출기한": "2025-01-31", "제출처": "총무팀"}
-                    ]
-                    gm_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-            else:
-                # 표가 없는 경우 기본 구조 제공 (필요시만)
-                if st.checkbox("표 추가하기 (일정, 서류, 협력요청 등)", key="add_table_gongmun"):
-                    default_items = [
-                        {"항목": "제출서류", "서류명": "사업자등록증", "제출기한": "2025-01-31", "제출처": "총무팀"}
-                    ]
-                    gm_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                else:
-                    gm_data["df_edited"] = None
-        except Exception as e:
-            st.error(f"⚠️ 표 데이터 처리 중 오류가 발생했습니다: {str(e)}")
-            gm_data["df_edited"] = None
-        
-        gm_data["sender_name"] = st.text_input("발신 명의", value=gm_data.get("sender_name", ""))
-        preview_button = st.button("미리보기 생성", use_container_width=True)
-    elif doc_type == '비즈니스 이메일':
-        e_data = draft
-        st.subheader("받는 사람 정보")
-        signature_data["recipient_name"] = st.text_input("받는 사람 이름", value=e_data.get("recipient_name", ""))
-        signature_data["recipient_title"] = st.text_input("받는 사람 직책", value=e_data.get("recipient_title", ""))
-        e_data["cc"] = st.text_input("참조 (CC)", value=e_data.get("cc", ""))
-        st.subheader("메일 내용")
-        e_data["subject"] = st.text_input("제목", value=e_data.get("subject", ""))
-        e_data["body"] = st.text_area("본론", value=e_data.get("body", ""), height=200)
-        
-        # 표 데이터 편집 (비즈니스 이메일용)
-        st.markdown("**상세 내역 (표) - 선택사항**")
-        st.caption("미팅일정, 견적서, 업무일정 등을 표로 정리할 수 있습니다.")
-        try:
-            if "items" in e_data and e_data["items"] and len(e_data["items"]) > 0:
-                # AI가 생성한 표가 있는 경우
-                items_data = e_data.get("items", [])
-                if isinstance(items_data, list) and len(items_data) > 0 and isinstance(items_data[0], dict):
-                    try:
-                        e_data["df"] = pd.DataFrame(items_data)
-                        e_data["df_edited"] = st.data_editor(e_data["df"], num_rows="dynamic")
-                    except Exception as e:
-                        st.warning(f"⚠️ AI 생성 표 데이터에 문제가 있어 기본 형식을 사용합니다: {str(e)}")
-                        default_items = [
-                            {"항목": "미팅일정", "날짜": "2025-01-15", "시간": "14:00", "안건": "프로젝트 계획 논의"}
-                        ]
-                        e_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                else:
-                    default_items = [
-                        {"항목": "미팅일정", "날짜": "2025-01-15", "시간": "14:00", "안건": "프로젝트 계획 논의"}
-                    ]
-                    e_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-            else:
-                # 표가 없는 경우 기본 구조 제공 (필요시만)
-                if st.checkbox("표 추가하기 (일정, 견적, 업무 등)", key="add_table_email"):
-                    default_items = [
-                        {"항목": "미팅일정", "날짜": "2025-01-15", "시간": "14:00", "안건": "프로젝트 계획 논의"}
-                    ]
-                    e_data["df_edited"] = st.data_editor(pd.DataFrame(default_items), num_rows="dynamic")
-                else:
-                    e_data["df_edited"] = None
-        except Exception as e:
-            st.error(f"⚠️ 표 데이터 처리 중 오류가 발생했습니다: {str(e)}")
-            e_data["df_edited"] = None
-        
-        e_data["closing"] = st.text_area("결론", value=e_data.get("closing", ""), height=100)
-        with st.expander("내 서명 정보 입력/수정"):
-            signature_data["signature_name"] = st.text_input("이름", value="홍길동")
-            signature_data["signature_title"] = st.text_input("직책", value="대리")
-            signature_data["signature_team"] = st.text_input("부서/팀", value="총무팀")
-            signature_data["signature_phone"] = st.text_input("연락처", value="010-1234-5678")
-        preview_button = st.button("이메일 본문 생성", use_container_width=True)
+    if openai_available:
+        st.text_input("🔄 다시 생성 시 요청 사항 (선택)", key="regen_instruction", placeholder="예: 더 간결하게, 예산 항목을 추가해서", help="각 항목의 '다시 생성' 버튼은 전체 문서가 아닌 해당 항목만 새로 작성합니다.")
+    auto_preview = st.checkbox("🔁 편집이 멈추면 미리보기 자동 갱신", key="auto_preview", help="내용을 고친 뒤 잠시 입력이 없으면 미리보기를 자동으로 다시 만듭니다. 바뀐 내용이 없으면 다시 만들지 않습니다.")
+    render_draft_editor(doc_type, draft, signature_data)
+    validation_errors = validate_document_fields(doc_type, draft.snapshot()) if doc_type == '품의서' else []
+    for error in validation_errors:
+        st.error(f"⚠️ {error}")
+    preview_allowed = not validation_errors
+    preview_label = "이메일 본문 생성" if doc_type == "비즈니스 이메일" else "미리보기 생성"
+    preview_button = st.button(preview_label, use_container_width=True, disabled=not preview_allowed)
     
+    if auto_preview and preview_allowed:
+        if auto_preview_due(doc_type, draft, signature_data):
+            refresh_preview(doc_type, draft, signature_data)
+        auto_preview_timer()
+    elif st.session_state.get("auto_preview_pending"):
+        st.session_state.auto_preview_pending = None
     if preview_button:
-        if doc_type == '품의서':
-            # 제목, 목적, 비고 업데이트
-            draft['title'] = p_data["title"]
-            draft['purpose'] = p_data["purpose"] 
-            draft['remarks'] = p_data["remarks"]
-            
-            # 텍스트 내용 항상 포함
-            draft['body'] = p_data["body_edited"]
-            
-            # 표 데이터 항상 포함 (비어있지 않은 경우에만)
-            try:
-                if "df_edited" in p_data and p_data["df_edited"] is not None and not p_data["df_edited"].empty:
-                    # 빈 행 제거
-                    filtered_df = p_data["df_edited"].dropna(how='all')
-                    if not filtered_df.empty:
-                        draft['items'] = filtered_df.to_dict('records')
-                    else:
-                        draft['items'] = []
-                else:
-                    draft['items'] = []
-            except Exception as e:
-                st.warning(f"⚠️ 표 데이터 처리 중 문제가 발생했습니다: {str(e)}")
-                draft['items'] = []
-            
-            # 템플릿 컨텍스트 구성
-            context = { 
-                "title": draft["title"], 
-                "purpose": text_to_html(draft["purpose"]), 
-                "remarks": text_to_html(draft["remarks"]), 
-                "generation_date": datetime.now().strftime('%Y-%m-%d') 
-            }
-            
-            # 텍스트 내용 추가
-            if draft.get("body"):
-                context["body"] = text_to_html(draft["body"])
-            
-            # 표 데이터 추가
-            if draft.get("items"):
-                try:
-                    if "df_edited" in p_data and p_data["df_edited"] is not None and not p_data["df_edited"].empty:
-                        context["table_headers"] = list(p_data["df_edited"].columns)
-                        context["items"] = draft["items"]
-                    else:
-                        context["items"] = []
-                except Exception as e:
-                    st.warning(f"⚠️ 표 헤더 처리 중 문제가 발생했습니다: {str(e)}")
-                    context["items"] = []
-            
-            template = load_template('pumui_template_final.html')
-            st.session_state[html_key] = generate_html(template, context)
-        elif doc_type == '공지문':
-            draft = g_data
-            context = { "title": draft["title"], "target": draft["target"], "summary": text_to_html(draft["summary"]), "details": text_to_html(draft["details"]), "contact": draft["contact"], "generation_date": datetime.now().strftime('%Y. %m. %d.') }
-            
-            # 표 데이터 처리 (AI 생성 또는 사용자 편집)
-            try:
-                if "df_edited" in g_data and g_data["df_edited"] is not None and not g_data["df_edited"].empty:
-                    # 사용자가 편집한 표 데이터 사용
-                    filtered_df = g_data["df_edited"].dropna(how='all')
-                    if not filtered_df.empty:
-                        context["table_headers"] = list(filtered_df.columns)
-                        context["items"] = filtered_df.to_dict('records')
-                elif draft.get("items"):
-                    # AI가 생성한 표 데이터 사용
-                    items_data = draft.get("items", [])
-                    if isinstance(items_data, list) and len(items_data) > 0 and isinstance(items_data[0], dict):
-                        context["table_headers"] = list(items_data[0].keys())
-                        context["items"] = items_data
-            except Exception as e:
-                st.warning(f"⚠️ 공지문 표 데이터 처리 중 문제: {str(e)}")
-            
-            template = load_template('gongji_template.html')
-            st.session_state[html_key] = generate_html(template, context)
-        elif doc_type == '공문':
-            draft = gm_data
-            context = { "sender_org": draft["sender_org"], "receiver": draft["receiver"], "cc": draft["cc"], "title": draft["title"], "body": text_to_html(draft["body"]), "sender_name": draft["sender_name"], "generation_date": datetime.now().strftime('%Y. %m. %d.') }
-            
-            # 표 데이터 처리 (AI 생성 또는 사용자 편집)
-            try:
-                if "df_edited" in gm_data and gm_data["df_edited"] is not None and not gm_data["df_edited"].empty:
-                    # 사용자가 편집한 표 데이터 사용
-                    filtered_df = gm_data["df_edited"].dropna(how='all')
-                    if not filtered_df.empty:
-                        context["table_headers"] = list(filtered_df.columns)
-                        context["items"] = filtered_df.to_dict('records')
-                elif draft.get("items"):
-                    # AI가 생성한 표 데이터 사용
-                    items_data = draft.get("items", [])
-                    if isinstance(items_data, list) and len(items_data) > 0 and isinstance(items_data[0], dict):
-                        context["table_headers"] = list(items_data[0].keys())
-                        context["items"] = items_data
-            except Exception as e:
-                st.warning(f"⚠️ 공문 표 데이터 처리 중 문제: {str(e)}")
-            
-            template = load_template('gongmun_template.html')
-            st.session_state[html_key] = generate_html(template, context)
-        elif doc_type == '비즈니스 이메일':
-            draft = {**e_data, **signature_data}
-            context = draft.copy()
-            context["signature_company"] = "주식회사 몬쉘코리아"
-            
-            # 이메일 본문 텍스트 처리 (자연스러운 줄바꿈)
-            context["body"] = text_to_html(draft.get("body", ""), for_email=True)
-            context["closing"] = text_to_html(draft.get("closing", ""), for_email=True)
-            
-            # 표 데이터 처리 (AI 생성 또는 사용자 편집)
-            try:
-                if "df_edited" in e_data and e_data["df_edited"] is not None and not e_data["df_edited"].empty:
-                    # 사용자가 편집한 표 데이터 사용
-                    filtered_df = e_data["df_edited"].dropna(how='all')
-                    if not filtered_df.empty:
-                        context["table_headers"] = list(filtered_df.columns)
-                        context["items"] = filtered_df.to_dict('records')
-                elif e_data.get("items"):
-                    # AI가 생성한 표 데이터 사용
-                    items_data = e_data.get("items", [])
-                    if isinstance(items_data, list) and len(items_data) > 0 and isinstance(items_data[0], dict):
-                        context["table_headers"] = list(items_data[0].keys())
-                        context["items"] = items_data
-            except Exception as e:
-                st.warning(f"⚠️ 이메일 표 데이터 처리 중 문제: {str(e)}")
-            
-            template = load_template('email_template_v2.html')
-            st.session_state[html_key] = generate_html(template, context)
+        changed = refresh_preview(doc_type, draft, signature_data)
+        if not changed:
+            st.caption("바뀐 내용이 없어 기존 미리보기를 그대로 사용합니다.")
+    # 행이 많은 표는 미리보기에 앞부분만 표시하고, 전체 보기를 켜면 바로 다시 렌더링
+    row_count = draft.current_items().row_count
+    if row_count > pipeline.PREVIEW_TABLE_ROWS and get_artifact(st.session_state.get(html_key)) is not None:
+        st.toggle(f"📋 미리보기에 상세 내역 전체 표시 ({row_count:,}행)", key="show_full_table",
+                  help=f"행이 많으면 미리보기에는 앞 {pipeline.PREVIEW_TABLE_ROWS:,}행만 표시합니다. 내려받는 파일과 복사할 HTML에는 항상 모든 행이 들어갑니다.")
+        if st.session_state.get("preview_max_rows") != preview_max_rows():
+            refresh_preview(doc_type, draft, signature_data)
 
-if st.session_state.get(html_key):
+html_ref = st.session_state.get(html_key)
+html_content = get_artifact(html_ref)
+# 미리보기가 표 앞부분만 담고 있으면 내보내기는 따로 보관한 전체 HTML 사용
+full_html_ref = st.session_state.get(f"{html_key}_full") if html_ref else None
+export_html = get_artifact(full_html_ref) if full_html_ref else html_content
+if html_ref and (html_content is None or export_html is None):
+    st.session_state[html_key] = ""
+    html_content = None
+    st.info("⏳ 오래된 미리보기가 정리되었습니다. '미리보기 생성'을 다시 눌러주세요.")
+if html_content:
     st.divider()
     st.subheader("📄 최종 미리보기")
-    components.html(st.session_state[html_key], height=600, scrolling=True)
+    components.html(html_content, height=600, scrolling=True)
     if doc_type == "비즈니스 이메일":
         st.subheader("📋 복사할 HTML 코드")
-        st.code(st.session_state[html_key], language='html')
+        st.code(export_html, language='html')
     else:
         st.divider()
         col1, col2 = st.columns(2)
         with col1:
-            pdf_output = generate_pdf(st.session_state[html_key])
-            title_for_file = draft.get("title", "document")
+            # 미리보기가 바뀌지 않았으면 PDF를 다시 만들지 않음
+            pdf_output = export_artifact("pdf", input_hash(export_html), lambda: generate_pdf(export_html))
+            title_for_file = getattr(draft, "title", "") or "document"
             st.download_button(label="📥 PDF 파일로 다운로드", data=pdf_output, file_name=f"{title_for_file}.pdf", mime="application/pdf", use_container_width=True)
         with col2:
-            docx_output = generate_docx(draft, doc_type, signature_data)
+            docx_fields = draft.snapshot()
+            docx_source = input_hash(doc_type, json.dumps(docx_fields, ensure_ascii=False, sort_keys=True), json.dumps(signature_data, sort_keys=True))
+            docx_output = export_artifact("docx", docx_source, lambda: generate_docx(docx_fields, doc_type, signature_data))
             st.download_button(label="📄 Word 파일로 다운로드", data=docx_output, file_name=f"{title_for_file}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True)
 
-
-
+# 화면 갱신 프로파일 저장 (결과는 다음 화면 갱신 때 사이드바에 표시)
+if "rerun_profiler" in st.session_state:
+    save_profile_result(profiling.finish(st.session_state.pop("rerun_profiler")))
@@ -0,0 +1,185 @@
+"""세션별 대용량 산출물(미리보기 HTML, 첨부 파일 추출 텍스트, 내보내기 파일) 공유 저장소
+
+st.session_state에는 짧은 참조 문자열만 보관하고 실제 내용은 이 저장소에 압축해 둡니다.
+- 세션마다 메모리 예산(session_budget)을 넘으면 그 세션의 가장 오래 쓰지 않은 항목부터 제거하고,
+- 전체 메모리 예산(memory_budget)을 넘으면 오래된 항목을 디스크로 내리며(spill),
+- 디스크 예산(disk_budget)까지 넘으면 가장 오래된 항목부터 삭제합니다.
+제거된 참조를 조회하면 None이 반환되므로 호출하는 쪽은 다시 만들면 됩니다.
+"""
+import atexit
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+MB = 1024 * 1024
+
+class _Entry:
+    __slots__ = ("session_id", "name", "is_text", "raw_size", "data", "path", "size", "last_access")
+
+    def __init__(self, session_id, name, is_text, raw_size, data):
+        self.session_id = session_id
+        self.name = name
+        self.is_text = is_text
+        self.raw_size = raw_size
+        self.data = data  # 압축된 bytes (디스크로 내려가면 None)
+        self.path = None
+        self.size = len(data)
+        self.last_access = time.time()
+
+class ArtifactStore:
+    """참조(ref) 문자열로 접근하는 압축 LRU 저장소. 프로세스 내 모든 세션이 공유합니다."""
+
+    def __init__(self, memory_budget=64 * MB, disk_budget=512 * MB, session_budget=8 * MB,
+                 spill_dir=None, ttl_seconds=6 * 3600, compress_level=6):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.session_budget = session_budget
+        self.ttl_seconds = ttl_seconds
+        self.compress_level = compress_level
+        self._spill_dir = spill_dir
+        self._entries = OrderedDict()  # ref -> _Entry (앞쪽이 가장 오래 쓰지 않은 항목)
+        self._names = {}  # (session_id, name) -> ref
+        self._memory_used = 0
+        self._disk_used = 0
+        self._lock = threading.Lock()
+
+    def _spill_path(self, ref):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="doc-helper-artifacts-")
+            atexit.register(shutil.rmtree, self._spill_dir, True)
+        os.makedirs(self._spill_dir, exist_ok=True)
+        return os.path.join(self._spill_dir, hashlib.sha1(ref.encode("utf-8")).hexdigest())
+
+    def _remove(self, ref):
+        """항목을 삭제합니다. (잠금 상태에서 호출)"""
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return
+        if self._names.get((entry.session_id, entry.name)) == ref:
+            del self._names[(entry.session_id, entry.name)]
+        if entry.path:
+            self._disk_used -= entry.size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        else:
+            self._memory_used -= entry.size
+
+    def _spill(self, ref, entry):
+        """메모리의 항목을 디스크로 내립니다. 실패하면 삭제합니다. (잠금 상태에서 호출)"""
+        try:
+            path = self._spill_path(ref)
+            with open(path, "wb") as f:
+                f.write(entry.data)
+        except OSError:
+            self._remove(ref)
+            return
+        entry.path, entry.data = path, None
+        self._memory_used -= entry.size
+        self._disk_used += entry.size
+
+    def _enforce(self, session_id, keep_ref):
+        """세션/메모리/디스크 예산과 TTL을 맞춥니다. 방금 저장한 keep_ref는 남겨 둡니다. (잠금 상태에서 호출)"""
+        now = time.time()
+        for ref in [r for r, e in self._entries.items() if now - e.last_access > self.ttl_seconds and r != keep_ref]:
+            self._remove(ref)
+        session_refs = [r for r, e in self._entries.items() if e.session_id == session_id]
+        session_used = sum(self._entries[r].size for r in session_refs)
+        for ref in session_refs:
+            if session_used <= self.session_budget:
+                break
+            if ref != keep_ref:
+                session_used -= self._entries[ref].size
+                self._remove(ref)
+        for ref, entry in list(self._entries.items()):
+            if self._memory_used <= self.memory_budget:
+                break
+            if ref != keep_ref and entry.path is None:
+                self._spill(ref, entry)
+        for ref, entry in list(self._entries.items()):
+            if self._disk_used <= self.disk_budget:
+                break
+            if ref != keep_ref and entry.path is not None:
+                self._remove(ref)
+
+    def put(self, session_id, name, data):
+        """세션의 name 항목을 data(str 또는 bytes)로 저장하고 참조 문자열을 반환합니다.
+
+        같은 세션의 같은 name 항목은 새 내용으로 교체됩니다.
+        참조에는 내용의 해시가 포함되므로 내용이 바뀌면 참조도 바뀝니다.
+        """
+        is_text = isinstance(data, str)
+        raw = data.encode("utf-8") if is_text else bytes(data)
+        ref = f"{session_id}:{name}:{hashlib.sha1(raw).hexdigest()[:16]}"
+        compressed = zlib.compress(raw, self.compress_level)
+        with self._lock:
+            old_ref = self._names.get((session_id, name))
+            if old_ref is not None:
+                self._remove(old_ref)
+            self._entries[ref] = _Entry(session_id, name, is_text, len(raw), compressed)
+            self._names[(session_id, name)] = ref
+            self._memory_used += len(compressed)
+            self._enforce(session_id, ref)
+        return ref
+
+    def get(self, ref):
+        """참조에 해당하는 내용을 반환합니다. 없거나 제거되었으면 None"""
+        if not ref:
+            return None
+        with self._lock:
+            entry = self._entries.get(ref)
+            if entry is None:
+                return None
+            self._entries.move_to_end(ref)
+            entry.last_access = time.time()
+            compressed, path, is_text = entry.data, entry.path, entry.is_text
+        if compressed is None:
+            try:
+                with open(path, "rb") as f:
+                    compressed = f.read()
+            except OSError:
+                with self._lock:
+                    self._remove(ref)
+                return None
+        raw = zlib.decompress(compressed)
+        return raw.decode("utf-8") if is_text else raw
+
+    def discard(self, ref):
+        with self._lock:
+            self._remove(ref)
+
+    def drop_session(self, session_id):
+        """세션의 모든 항목을 삭제합니다."""
+        with self._lock:
+            for ref in [r for r, e in self._entries.items() if e.session_id == session_id]:
+                self._remove(ref)
+
+    def stats(self, session_id=None):
+        """항목 수, 압축 전/후 크기, 메모리/디스크 사용량(바이트)을 반환합니다."""
+        with self._lock:
+            entries = [e for e in self._entries.values() if session_id is None or e.session_id == session_id]
+            return {
+                "entries": len(entries),
+                "raw_bytes": sum(e.raw_size for e in entries),
+                "stored_bytes": sum(e.size for e in entries),
+                "memory_bytes": sum(e.size for e in entries if e.path is None),
+                "disk_bytes": sum(e.size for e in entries if e.path is not None),
+            }
+
+def _budget_from_env(name, default):
+    value = os.environ.get(name)
+    return int(float(value) * MB) if value else default
+
+# 프로세스 전체에서 공유하는 저장소 (예산은 MB 단위 환경 변수로 조정)
+artifact_store = ArtifactStore(
+    memory_budget=_budget_from_env("ARTIFACT_MEMORY_MB", 64 * MB),
+    disk_budget=_budget_from_env("ARTIFACT_DISK_MB", 512 * MB),
+    session_budget=_budget_from_env("ARTIFACT_SESSION_MB", 8 * MB),
+    spill_dir=os.environ.get("ARTIFACT_SPILL_DIR") or None,
+)
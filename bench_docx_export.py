@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""대용량 표가 포함된 DOCX 내보내기 시간 벤치마크
+
+사용법: python bench_docx_export.py [행 수 ...]
+기존 방식(pandas DataFrame + 행마다 table.add_row()/cell.text)과
+docx_export.add_items_table()의 일괄 XML 방식을 같은 데이터로 비교합니다.
+표 없는 문서에서는 뼈대를 매번 다시 여는 방식(Document(뼈대 바이트) + doc.save())과
+generate_docx(열어 둔 뼈대의 본문만 복제하고 본문 부분만 새로 압축)를 비교합니다.
+"""
+import io
+import statistics
+import sys
+import time
+
+import pandas as pd
+from docx import Document
+
+from docx_export import _fill_document, _skeleton, add_items_table, generate_docx
+
+def make_items(row_count):
+    """납품 내역 형태의 테스트 데이터를 만듭니다."""
+    return [
+        {"품목": f"납품 품목 {i + 1}", "규격": "A4 / 80g", "수량": str(10 + i % 50), "단가": f"{(i % 20 + 1) * 1000:,}", "비고": "정기 납품"}
+        for i in range(row_count)
+    ]
+
+def legacy_table(doc, items):
+    """변경 전 generate_docx의 표 생성 방식"""
+    df = pd.DataFrame(items)
+    table = doc.add_table(rows=1, cols=len(df.columns), style='Table Grid')
+    hdr_cells = table.rows[0].cells
+    for i, col_name in enumerate(df.columns):
+        hdr_cells[i].text = col_name
+    for _, row in df.iterrows():
+        row_cells = table.add_row().cells
+        for i, col_name in enumerate(df.columns):
+            row_cells[i].text = str(row[col_name])
+
+def time_it(func, repeat):
+    """func를 repeat번 실행한 소요 시간(초)의 중앙값을 반환합니다."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+def export_with(table_builder, items):
+    doc = Document()
+    table_builder(doc, items)
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+def reopen_skeleton_export(draft, doc_type):
+    """변경 전 generate_docx: 뼈대 DOCX를 매번 다시 열고 문서 전체를 저장"""
+    skeleton_bytes, _, _, _, slots = _skeleton(doc_type)
+    doc = Document(io.BytesIO(skeleton_bytes))
+    _fill_document(doc, slots, draft, doc_type, {})
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+def bench_skeleton_clone(repeat=30):
+    print(f"{'문서 유형':>10} | {'뼈대 다시 열기(ms)':>16} | {'generate_docx(ms)':>16} | {'개선 배율':>8}")
+    print("-" * 62)
+    draft = {"title": "사무용품 구매 요청", "purpose": "사무용품 구매를 요청함.", "body": "1. 구매 품목", "remarks": "특이사항 없음.",
+             "target": "전 직원", "summary": "요약", "details": "상세", "contact": "총무팀", "sender_org": "몬쉘코리아", "receiver": "거래처",
+             "cc": "", "sender_name": "대표이사", "subject": "안내", "closing": "감사합니다."}
+    for doc_type in ('품의서', '공지문', '공문', '비즈니스 이메일'):
+        generate_docx(draft, doc_type)
+        reopen = time_it(lambda: reopen_skeleton_export(draft, doc_type), repeat) * 1000
+        clone = time_it(lambda: generate_docx(draft, doc_type), repeat) * 1000
+        print(f"{doc_type:>10} | {reopen:>16.2f} | {clone:>16.2f} | {reopen / clone:>7.1f}x")
+    print()
+
+def main():
+    bench_skeleton_clone()
+    row_counts = [int(arg) for arg in sys.argv[1:]] or [50, 500, 2000]
+    print(f"{'행 수':>8} | {'기존 방식(s)':>12} | {'일괄 XML(s)':>12} | {'generate_docx(s)':>16} | {'개선 배율':>8}")
+    print("-" * 70)
+    for row_count in row_counts:
+        items = make_items(row_count)
+        repeat = 3 if row_count <= 2000 else 1
+        legacy = time_it(lambda: export_with(legacy_table, items), repeat)
+        bulk = time_it(lambda: export_with(add_items_table, items), repeat)
+        draft = {"title": "납품 내역 보고", "purpose": "납품 내역을 보고함.", "body": "1. 납품 현황", "items": items, "remarks": "특이사항 없음."}
+        full = time_it(lambda: generate_docx(draft, '품의서'), repeat)
+        print(f"{row_count:>8} | {legacy:>12.3f} | {bulk:>12.3f} | {full:>16.3f} | {legacy / bulk:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""PDF 텍스트 추출 백엔드 벤치마크
+
+사용법: python bench_pdf_backends.py [PDF 파일 ...]
+파일을 지정하지 않으면 폴더의 품의서 PDF를 사용합니다.
+설치된 백엔드(pdf_text.PDF_BACKENDS)별로 초당 페이지 수와 한국어 추출 품질 지표를 비교합니다.
+
+품질 지표 (정답 텍스트 없이 비교할 수 있는 값):
+- 한글 비율: 공백을 제외한 문자 중 한글 음절 비율 (높을수록 좋음)
+- 한 글자 어절: 한글 어절 중 한 글자짜리 비율. '품 의 서'처럼 띄어쓰기가 깨지면 커짐 (낮을수록 좋음)
+- 깨진 문자: (cid:N), U+FFFD 등 해석하지 못한 글자 수 (낮을수록 좋음)
+"""
+import glob
+import re
+import statistics
+import sys
+import time
+
+from pdf_text import PDF_BACKENDS, available_backends
+
+HANGUL = re.compile(r"[가-힣]")
+HANGUL_WORD = re.compile(r"[가-힣]+")
+BROKEN = re.compile(r"\(cid:\d+\)|�")
+
+def quality(text):
+    """텍스트 품질 지표 (한글 비율, 한 글자 어절 비율, 깨진 문자 수)"""
+    chars = re.sub(r"\s", "", text)
+    words = HANGUL_WORD.findall(text)
+    return {
+        "hangul_ratio": len(HANGUL.findall(chars)) / len(chars) if chars else 0.0,
+        "single_ratio": sum(1 for w in words if len(w) == 1) / len(words) if words else 0.0,
+        "broken": len(BROKEN.findall(text)),
+        "chars": len(chars),
+    }
+
+def bench_backend(name, documents, repeat):
+    """백엔드 하나로 모든 문서를 repeat번 추출해 (초당 페이지 수, 품질 지표)를 반환합니다."""
+    extract = PDF_BACKENDS[name][0]
+    durations, pages, texts = [], 0, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages, texts = 0, []
+        for pdf_bytes in documents:
+            _, page_texts = extract(pdf_bytes, None)
+            pages += len(page_texts)
+            texts.append("\n".join(t or "" for t in page_texts))
+        durations.append(time.perf_counter() - start)
+    scores = [quality(text) for text in texts]
+    return pages / statistics.median(durations), {
+        "hangul_ratio": statistics.mean(s["hangul_ratio"] for s in scores),
+        "single_ratio": statistics.mean(s["single_ratio"] for s in scores),
+        "broken": sum(s["broken"] for s in scores),
+        "chars": sum(s["chars"] for s in scores),
+    }
+
+def main():
+    files = sys.argv[1:] or sorted(glob.glob("*품의서*.pdf"))
+    if not files:
+        print("벤치마크할 PDF 파일이 없습니다.")
+        return
+    documents = []
+    for path in files:
+        with open(path, "rb") as f:
+            documents.append(f.read())
+    backends = available_backends()
+    missing = [name for name in PDF_BACKENDS if name not in backends]
+    print(f"PDF {len(files)}개, 백엔드: {', '.join(backends)}" + (f" (미설치: {', '.join(missing)})" if missing else ""))
+    print(f"{'백엔드':>10} | {'페이지/초':>9} | {'추출 글자':>9} | {'한글 비율':>8} | {'한 글자 어절':>10} | {'깨진 문자':>8}")
+    print("-" * 76)
+    for name in backends:
+        try:
+            pages_per_sec, q = bench_backend(name, documents, repeat=3)
+        except Exception as e:
+            print(f"{name:>10} | 실패: {e}")
+            continue
+        print(f"{name:>10} | {pages_per_sec:>9.1f} | {q['chars']:>9,} | {q['hangul_ratio']:>8.1%} | {q['single_ratio']:>10.1%} | {q['broken']:>8}")
+
+if __name__ == "__main__":
+    main()
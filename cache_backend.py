@@ -0,0 +1,211 @@
+"""여러 앱 인스턴스(replica)가 함께 쓰는 캐시/저장소 백엔드
+
+학습 코퍼스, 첨부 파일 추출 결과, AI 응답, 내보내기 파일을 키-값(bytes)으로 보관합니다.
+CACHE_BACKEND_URL(환경 변수 또는 Streamlit secrets)로 백엔드를 고릅니다.
+- memory://                    프로세스 내 LRU (기본값, 인스턴스 간 공유 안 됨)
+- file:///공유/디렉터리         NFS 등 공유 파일 시스템
+- redis://host:6379/0          Redis 호환 서버 (redis 패키지 필요)
+- redis+local://               테스트용 프로세스 내 Redis 대체품(LocalRedis)
+백엔드 오류는 캐시 미스로 처리하므로 캐시가 죽어도 앱은 평소처럼 동작합니다.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+class MemoryBackend:
+    """프로세스 내 LRU 캐시. max_bytes를 넘으면 가장 오래 쓰지 않은 항목부터 지웁니다."""
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (만료 시각 또는 None, value)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.time():
+                self._drop(key)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._drop(key)
+            self._items[key] = (time.time() + ttl if ttl else None, value)
+            self._size += len(value)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                self._drop(next(iter(self._items)))
+
+    def delete(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= len(item[1])
+
+class FileSystemBackend:
+    """공유 디렉터리에 키별 파일로 저장합니다. 쓰기는 임시 파일 + rename으로 원자적으로 처리합니다.
+
+    파일 앞 8바이트에 만료 시각(초, 0이면 만료 없음)을 기록합니다.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        expires = int.from_bytes(data[:8], "big")
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        return data[8:]
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        expires = int(time.time() + ttl) if ttl else 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(expires.to_bytes(8, "big"))
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+class LocalRedis:
+    """redis-py 클라이언트의 get/set/delete만 흉내 내는 프로세스 내 대체품 (테스트용)"""
+
+    def __init__(self):
+        self._backend = MemoryBackend(max_bytes=float("inf"))
+
+    def get(self, name):
+        return self._backend.get(name)
+
+    def set(self, name, value, ex=None):
+        self._backend.set(name, bytes(value), ttl=ex)
+        return True
+
+    def delete(self, *names):
+        for name in names:
+            self._backend.delete(name)
+        return len(names)
+
+class RedisBackend:
+    """Redis 호환 서버를 사용합니다. client는 redis.Redis와 같은 get/set(ex=)/delete를 제공해야 합니다."""
+
+    def __init__(self, client, prefix="doc-helper:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+        return cls(redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2))
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+def create_backend(url=None):
+    """URL에 맞는 백엔드를 만듭니다. (모듈 docstring 참고)"""
+    parsed = urlparse(url or "memory://")
+    if parsed.scheme in ("", "memory"):
+        return MemoryBackend()
+    if parsed.scheme == "file":
+        return FileSystemBackend(parsed.path)
+    if parsed.scheme == "redis+local":
+        return RedisBackend(LocalRedis())
+    if parsed.scheme in ("redis", "rediss"):
+        return RedisBackend.from_url(url)
+    raise ValueError(f"지원하지 않는 캐시 백엔드입니다: {url}")
+
+class SharedCache:
+    """백엔드를 감싸 JSON 값 저장과 오류 무시를 처리합니다. 키는 'corpus:...'처럼 용도별 접두사를 붙입니다."""
+
+    def __init__(self, backend, url=None):
+        self.backend = backend
+        self.url = url
+        self.errors = 0
+
+    @property
+    def in_process(self):
+        """값을 이 프로세스 메모리에 보관하는 백엔드(memory://)면 True"""
+        return isinstance(self.backend, MemoryBackend)
+
+    def get_bytes(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            return None
+
+    def set_bytes(self, key, value, ttl=None):
+        try:
+            self.backend.set(key, value, ttl=ttl)
+        except Exception:
+            self.errors += 1
+
+    def get_json(self, key):
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data.decode("utf-8"))
+        except ValueError:
+            return None
+
+    def set_json(self, key, value, ttl=None):
+        self.set_bytes(key, json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), ttl=ttl)
+
+    def delete(self, key):
+        try:
+            self.backend.delete(key)
+        except Exception:
+            self.errors += 1
+
+# 프로세스 전체에서 공유하는 캐시 (configure로 백엔드 교체)
+cache = SharedCache(create_backend(os.environ.get("CACHE_BACKEND_URL")), os.environ.get("CACHE_BACKEND_URL"))
+
+def configure(url):
+    """CACHE_BACKEND_URL 설정으로 백엔드를 교체합니다. 같은 URL이면 아무것도 하지 않습니다."""
+    if url == cache.url:
+        return
+    cache.backend = create_backend(url)
+    cache.url = url
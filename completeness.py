@@ -0,0 +1,110 @@
+"""키워드 6W3H 완성도 로컬 점검
+
+추가 질문 분석(analyze) 전에 정규식으로 키워드에 6W3H 항목(누가, 누구에게, 언제, 어디서, 무엇을, 왜, 어떻게,
+얼마나(금액), 몇 개(수량), 얼마 동안(기간))이 들어 있는지 확인합니다.
+문서 종류별 가중치로 점수를 매겨 충분하면 'complete', 핵심 항목이 여럿 빠졌으면 빠진 항목의 템플릿 질문과 함께
+'incomplete'를 바로 반환하고, 그 사이(판단이 애매한 경우)만 'ambiguous'로 돌려 LLM 분석을 호출하게 합니다.
+반환 형식은 LLM 분석 응답({"status", "questions"})과 같으며 source, score, found, missing을 덧붙입니다.
+"""
+import re
+
+# 항목 -> (이름, 패턴). 한국어 금액(400만원, 1,200,000원), 날짜(10월 5일, 2025.11.3), 수량(5대, 20명) 등
+DIMENSIONS = {
+    "what": ("무엇을", r"구매|구입|도입|계약|변경|시행|개최|실시|교육|채용|지급|신청|요청|승인|공사|설치|개발|출시|운영|이전|폐점|개점|"
+                     r"점검|보고|안내|협조|제출|발주|납품|교체|수리|포상|행사|회의|세미나|워크숍|이벤트|개편|개정|발령|초대|견적|정산"),
+    "why": ("왜", r"위해|위하여|위한|때문|목적|필요|개선|향상|효율|강화|절감|해결|대응|따른|따라|인한|인해|노후|부족|증가|감소|불편|"
+                 r"용도|업무용|용으로|취지|배경"),
+    "who": ("누가", r"[가-힣A-Za-z]+(?:팀|본부|파트|사업부|부서|지사)(?=[\s,./은는이가의에을를과와도로]|$)|담당자|팀장|본부장|대표이사|책임자|신청자"),
+    "whom": ("누구에게", r"대상|전\s?직원|임직원|신입|고객|가맹점|협력사|거래처|업체|수신|참석자|[가-힣]+님|[가-힣]+에게|귀사|귀하"),
+    "when": ("언제", r"\d{4}\s?[년.\-/]\s?\d{1,2}|\d{1,2}\s?월(?:\s?\d{1,2}\s?일)?|\d{1,2}/\d{1,2}|\d{1,2}\s?일\s?(?:까지|부터)|"
+                   r"(?:이번|다음|다다음)\s?(?:주|달|분기)|[1-4]\s?분기|[상하]반기|연내|월말|월초|내일|모레|금주|차주|익월|즉시|"
+                   r"시행일|마감|기한|일정|[월화수목금토일]요일|오전|오후|\d{1,2}\s?시(?![가-힣])"),
+    "where": ("어디서", r"장소|회의실|교육장|강당|본사|사옥|공장|물류센터|매장|지점|사무실|현장|온라인|오프라인|\d+\s?층|[가-힣]+에서"),
+    "how": ("어떻게", r"방법|방식|통해|통하여|절차|법인카드|카드\s?결제|계좌|이체|세금계산서|현금|입찰|견적\s?비교|수의계약|온라인|오프라인|"
+                    r"대면|비대면|메일로|전화로|시스템|결제|분할|일시불"),
+    "how_much": ("얼마나(금액)", r"\d[\d,.]*\s?(?:천|백|십)?\s?(?:만|억)?\s?원|\d[\d,.]*\s?(?:만|억|천만|백만)(?![가-힣])|"
+                             r"[일이삼사오육칠팔구십백천]+\s?(?:만|억)\s?원|예산|비용|금액|단가|총액|견적가|[$₩]\s?\d"),
+    "how_many": ("몇 개(수량)", r"\d[\d,]*\s?(?:대|개(?!월)|명|건|식|회|세트|set|EA|ea|박스|box|부|장|권|종|인|벌|곳|석|kg|톤)|수량|규모"),
+    "how_long": ("얼마 동안(기간)", r"\d+\s?(?:일|주|개월|달|년|시간)\s?(?:간|동안)|\d+\s?개월|기간|부터|까지|~\s?\d|약정"),
+}
+_PATTERNS = {name: re.compile(pattern) for name, (_, pattern) in DIMENSIONS.items()}
+
+# 문서 종류별 항목 가중치. 가중치가 CRITICAL_WEIGHT 이상이면 꼭 필요한 항목
+REQUIREMENTS = {
+    "품의서": {"what": 3, "why": 2, "how_much": 2, "when": 1, "how_many": 1, "how": 1, "who": 1},
+    "공지문": {"what": 3, "whom": 2, "when": 2, "where": 1, "how": 1, "who": 1},
+    "공문": {"what": 3, "whom": 2, "why": 2, "when": 1, "how": 1, "who": 1},
+    "비즈니스 이메일": {"what": 3, "whom": 2, "when": 1, "why": 1, "how": 1},
+}
+# 품의서 세부 유형(키워드 앞의 '유형: ...')별 가중치 조정
+SUB_TYPE_REQUIREMENTS = {
+    "인사/정책 변경": {"how_much": 0, "when": 2},
+    "결과/사건 보고": {"how_much": 0, "how_many": 0, "when": 2},
+    "신규 사업/계약": {"whom": 2, "how_long": 1},
+}
+CRITICAL_WEIGHT = 2
+COMPLETE_SCORE = 0.7  # 꼭 필요한 항목이 모두 있고 점수가 이 이상이면 충분
+INCOMPLETE_SCORE = 0.4  # 점수가 이보다 낮거나 꼭 필요한 항목이 둘 이상 빠지면 부족
+MAX_QUESTIONS = 3
+
+QUESTIONS = {
+    "what": "구체적으로 무엇을 진행(요청)하려는지 알려주세요. (예: 품목, 행사명, 변경 내용)",
+    "why": "작성 목적이나 배경(필요한 이유)은 무엇인가요?",
+    "who": "진행(담당) 부서나 담당자는 누구인가요?",
+    "whom": "대상은 누구인가요?",
+    "when": "관련 일정이나 기한은 언제인가요?",
+    "where": "장소는 어디인가요? (온라인이면 접속 방법)",
+    "how": "진행 방법이나 절차(결제 방식, 신청 방법 등)는 어떻게 되나요?",
+    "how_much": "예상 비용은 얼마인가요? (예: 단가, 총액, 예산 항목)",
+    "how_many": "수량이나 규모는 어느 정도인가요? (예: 5대, 20명)",
+    "how_long": "기간은 얼마나 되나요? (시작일과 종료일)",
+}
+DOC_TYPE_QUESTIONS = {
+    "품의서": {"when": "언제 집행(시행)할 예정인가요? 날짜나 기한을 알려주세요."},
+    "공지문": {"when": "일정(날짜, 시간)은 언제인가요?", "whom": "공지 대상은 누구인가요? (예: 전 직원, 특정 부서)"},
+    "공문": {"whom": "수신 기관(받는 곳)은 어디인가요?", "why": "요청(통보)하는 근거나 배경은 무엇인가요?"},
+    "비즈니스 이메일": {"whom": "메일 받는 분(회사, 담당자)은 누구인가요?", "when": "회신이나 진행이 필요한 일정이 있나요?"},
+}
+
+_SUB_TYPE_PREFIX = re.compile(r"유형:\s*(.+?)\s*/\s*내용:\s*")
+
+def split_sub_type(keywords):
+    """'유형: X / 내용: Y'(app.compose_keywords) -> (X, Y). 유형 이름('비용 집행' 등)이 항목으로 잡히지 않게 분리합니다."""
+    match = _SUB_TYPE_PREFIX.match(keywords)
+    return (match.group(1), keywords[match.end():]) if match else (None, keywords)
+
+def requirements_for(doc_type, sub_type=None):
+    weights = dict(REQUIREMENTS.get(doc_type, REQUIREMENTS["품의서"]))
+    weights.update(SUB_TYPE_REQUIREMENTS.get(sub_type, {}))
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+def detect(keywords):
+    """키워드에 들어 있는 6W3H 항목 -> 찾은 첫 표현"""
+    found = {}
+    for name, pattern in _PATTERNS.items():
+        match = pattern.search(keywords)
+        if match:
+            found[name] = match.group(0)
+    return found
+
+def question_for(dimension, doc_type):
+    return DOC_TYPE_QUESTIONS.get(doc_type, {}).get(dimension) or QUESTIONS[dimension]
+
+def assess(keywords, doc_type):
+    """키워드의 6W3H 완성도를 점검합니다.
+
+    status: complete(충분), incomplete(부족, questions에 빠진 항목 질문), ambiguous(LLM 분석 필요)
+    """
+    sub_type, content = split_sub_type(keywords or "")
+    weights = requirements_for(doc_type, sub_type)
+    found = detect(content)
+    total = sum(weights.values())
+    score = sum(weight for name, weight in weights.items() if name in found) / total if total else 1.0
+    missing = sorted((name for name in weights if name not in found), key=lambda name: weights[name], reverse=True)
+    missing_critical = [name for name in missing if weights[name] >= CRITICAL_WEIGHT]
+    result = {"source": "local", "score": round(score, 2), "found": found, "missing": missing}
+    if not missing_critical and score >= COMPLETE_SCORE:
+        return {"status": "complete", **result}
+    if len(missing_critical) >= 2 or score < INCOMPLETE_SCORE:
+        return {"status": "incomplete", "questions": [question_for(name, doc_type) for name in missing[:MAX_QUESTIONS]], **result}
+    return {"status": "ambiguous", **result}
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""학습 코퍼스 요약 (문서 종류별 문체 프로필)
+
+학습한 PDF 원문을 프롬프트에 그대로 넣는 대신, 학습할 때 한 번 문서 종류별 문체 프로필을 만들어 코퍼스에 저장합니다.
+(corpus["style_profiles"]) 프롬프트에는 doc_pipeline.enhance_prompt가 format_profile()로 만든 짧은 요약만 넣습니다.
+
+1. 반복 문구 제거: 여러 문서에 되풀이되는 줄(그룹웨어 결재란, 문서번호, 'Page 1 of 3', 변환 파일 경로 등)을 찾습니다.
+   숫자, 요일, 16진수 ID를 지운 형태로 비교하며 BOILERPLATE_MIN_SHARE 이상의 문서에 나오면 반복 문구로 봅니다.
+2. 문서 종류별 통계: 제목 끝맺음(~의 건 등)과 예시, 문장 종결 형태와 자주 쓰는 끝 구절, 첫 문장(품의 요청 문구),
+   대항목 구성 순서, 번호 체계
+3. 작성 지침: 매뉴얼·가이드 문서에서 반복 문구를 뺀 규칙 문장을 GUIDELINE_MAX_CHARS 이내로 추립니다.
+
+학습(corpus_watcher.assemble_corpus) 때 자동으로 실행되며, 이미 학습한 코퍼스는 다시 요약할 수 있습니다.
+    python corpus_distill.py            # learned_documents.json을 다시 요약해 게시
+    python corpus_distill.py --dry-run  # 게시하지 않고 프로필과 프롬프트 크기만 출력
+"""
+import argparse
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+
+PROFILE_VERSION = 1
+BOILERPLATE_MIN_SHARE = 0.3  # 이 비율 이상의 문서(최소 2개)에 나오는 줄은 반복 문구
+MIN_PATTERN_DOCS = 2  # 통계에 넣을 최소 등장 문서 수
+SECTION_MIN_SHARE = 0.15  # 대항목 구성에 넣을 최소 문서 비율
+GUIDELINE_MAX_CHARS = 500
+
+_HEX_ID = re.compile(r"[0-9A-Fa-f]{6,}")
+_DIGITS = re.compile(r"\d+")
+_WEEKDAY = re.compile(r"\([월화수목금토일]\)")
+_SPACES = re.compile(r"\s+")
+_FILENAME_TITLE = re.compile(r"^\d{4}-\d{2}-\d{2}_[^_]+_(.+?)_[^_]+_[^_]+\.pdf$", re.IGNORECASE)
+_TITLE_LINE = re.compile(r"^제\s*목\s*[:：]?\s*(.+)$")
+_SECTION = re.compile(r"^(?:[ⅠⅡⅢⅣⅤⅥⅦⅧⅨⅩ]|\d{1,2})\.\s*([가-힣A-Za-z][가-힣A-Za-z ()/·]{0,14}?)\s*(?::|：|$)")
+_SENTENCE_END = re.compile(r"((?:\S+\s)?[가-힣]+)\.(?=\s|$)")
+_NOUN_ENDINGS = ("함", "음", "임", "됨", "람", "망")
+NUMBERING_MARKERS = (  # 위계 순서
+    ("Ⅰ.", re.compile(r"^[ⅠⅡⅢⅣⅤⅥⅦⅧⅨⅩ]\.")),
+    ("1.", re.compile(r"^\d{1,2}\.\s")),
+    ("1)", re.compile(r"^\d{1,2}\)")),
+    ("(1)", re.compile(r"^\(\d{1,2}\)")),
+    ("①", re.compile(r"^[①-⑳]")),
+    ("가.", re.compile(r"^[가-하]\.\s")),
+    ("-", re.compile(r"^-\s")),
+    ("▶", re.compile(r"^▶")),
+    ("•", re.compile(r"^[•·]\s")),
+    ("*", re.compile(r"^\*")),
+)
+
+def classify_file(filename):
+    """파일 이름으로 문서 종류(품의서 등)를 정합니다. 매뉴얼·가이드는 'guide', 알 수 없으면 None"""
+    lower = filename.lower()
+    if '메뉴얼' in filename or '매뉴얼' in filename or '가이드' in filename or 'manual' in lower or 'guide' in lower:
+        return "guide"
+    if '품의서' in filename or '모음' in filename or 'sample' in lower:
+        return "품의서"
+    if '공지' in filename:
+        return "공지문"
+    if '공문' in filename:
+        return "공문"
+    if '이메일' in filename or 'email' in lower:
+        return "비즈니스 이메일"
+    return None
+
+def normalize_line(line):
+    """반복 문구 비교용 형태: 공백 정리, 16진수 ID·요일·숫자를 #으로"""
+    line = _SPACES.sub(" ", line.strip())
+    return _DIGITS.sub("#", _WEEKDAY.sub("(#)", _HEX_ID.sub("#", line)))
+
+def find_boilerplate(texts, min_share=BOILERPLATE_MIN_SHARE):
+    """여러 문서에 되풀이되는 줄의 normalize_line 형태 집합"""
+    document_counts = Counter()
+    for text in texts:
+        document_counts.update({normalize_line(line) for line in text.splitlines() if line.strip()})
+    threshold = max(2, math.ceil(len(texts) * min_share))
+    return {line for line, count in document_counts.items() if count >= threshold}
+
+def strip_boilerplate(text, boilerplate):
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip() and normalize_line(line) not in boilerplate)
+
+def _top(counter, documents, limit):
+    """(값, 문서 비율) 목록. MIN_PATTERN_DOCS 미만으로 나온 값은 뺍니다."""
+    return [[value, round(count / documents, 2)] for value, count in counter.most_common(limit) if count >= MIN_PATTERN_DOCS]
+
+def _title_ending(title):
+    title = re.sub(r"\s*\([^)]*\)?\s*$", "", title).strip()
+    words = title.split()
+    if not words:
+        return None
+    if words[-1] == "건" and len(words) > 1:
+        return "~의 건" if words[-2].endswith("의") else "~ 건"
+    return f"~{words[-1][-4:]}" if len(words[-1]) > 1 else None
+
+def _ending_phrase(match):
+    """문장 끝 구절: 명사형 종결(함/임 등)은 앞 어절과 함께, 그 밖에는 마지막 어절"""
+    words = match.split()
+    last = words[-1]
+    if len(words) > 1 and (len(last) == 1 or last.endswith(("드립니다", "바랍니다"))):
+        return f"{words[-2]} {last}"
+    return last
+
+def profile_documents(texts, titles):
+    """같은 종류 문서들의 통계 (반복 문구를 뺀 본문 texts, 제목 titles)"""
+    documents = max(len(texts), 1)
+    title_endings = Counter(ending for ending in map(_title_ending, titles) if ending)
+    style, phrases, openings, sections, markers = Counter(), Counter(), Counter(), defaultdict(list), Counter()
+    phrase_forms = defaultdict(Counter)  # 띄어쓰기를 뺀 끝 구절 -> 원래 표기별 횟수 (PDF 줄바꿈으로 갈라진 표기 통합)
+    for text in texts:
+        lines = text.splitlines()
+        doc_phrases, doc_markers = set(), set()
+        for match in _SENTENCE_END.findall(" ".join(lines)):
+            last = match.split()[-1]
+            style["명사형 종결(~함./~임.)" if last.endswith(_NOUN_ENDINGS) else "합쇼체(~니다.)" if last.endswith("니다") else "기타"] += 1
+            phrase = _DIGITS.sub("#", _ending_phrase(match))
+            phrase_forms[phrase.replace(" ", "")][phrase] += 1
+            doc_phrases.add(phrase.replace(" ", ""))
+        phrases.update(doc_phrases)
+        # 대항목: 문서 안에서 몇 번째 항목인지(0~1)를 모아 평균 순서로 정렬
+        doc_sections = list(dict.fromkeys(m.group(1).replace(" ", "") for m in map(_SECTION.match, lines) if m))
+        for index, name in enumerate(doc_sections):
+            sections[name].append(index / max(len(doc_sections) - 1, 1))
+        for line in lines:
+            for label, pattern in NUMBERING_MARKERS:
+                if pattern.match(line):
+                    doc_markers.add(label)
+                    break
+        markers.update(doc_markers)
+        opening = next((line for line in lines if len(line) > 15 and line.endswith(("니다.", "니다", "함.", "바랍니다."))), None)
+        if opening:
+            openings[_DIGITS.sub("#", opening.split("에서는")[-1].split("아래와 같이")[-1].strip())] += 1
+    total_sentences = sum(style.values()) or 1
+    section_min = max(MIN_PATTERN_DOCS, documents * SECTION_MIN_SHARE)
+    common_sections = sorted((name for name, positions in sections.items() if len(positions) >= section_min),
+                             key=lambda name: len(sections[name]), reverse=True)[:6]
+    return {
+        "documents": len(texts),
+        "title_endings": _top(title_endings, max(len(titles), 1), 3),
+        "title_examples": sorted({title for title in titles if 4 <= len(title) <= 25}, key=len)[:3],
+        "sentence_style": [[name, round(count / total_sentences, 2)] for name, count in style.most_common() if name != "기타"],
+        "ending_phrases": [[phrase_forms[key].most_common(1)[0][0], share] for key, share in _top(phrases, documents, 5)],
+        "openings": _top(openings, documents, 2),
+        "sections": [[name, round(len(sections[name]) / documents, 2)]
+                     for name in sorted(common_sections, key=lambda name: sum(sections[name]) / len(sections[name]))],
+        "numbering": [label for label, _ in NUMBERING_MARKERS if markers[label] >= max(MIN_PATTERN_DOCS, documents * 0.2)],
+    }
+
+def extract_guidelines(texts, max_chars=GUIDELINE_MAX_CHARS):
+    """매뉴얼·가이드에서 규칙 문장('~한다', '~피한다', '~지양', 예시 '→')을 중복 없이 max_chars 이내로 추립니다."""
+    rules, seen, size = [], set(), 0
+    for text in texts:
+        previous = ""
+        for line in text.splitlines():
+            line, wrapped = line.strip(" •-·\t"), len(previous) >= 30 and re.search(r"[가-힣,]$", previous)
+            previous = line
+            # 긴 줄에 이어진 줄(PDF 줄바꿈으로 잘린 문장 끝)은 제외
+            if wrapped or not (10 <= len(line) <= 70) or line in seen:
+                continue
+            if not (re.search(r"(한다|는다|쓴다|피한다|지양|않는다|합니다|해야 함|하여야 함)\.?$", line) or "→" in line):
+                continue
+            if size + len(line) > max_chars:
+                return rules
+            seen.add(line)
+            rules.append(line)
+            size += len(line)
+    return rules
+
+def distill(files):
+    """코퍼스의 files 항목(파일 이름 -> {content, success, ...})으로 style_profiles를 만듭니다."""
+    contents = {name: entry["content"] for name, entry in files.items() if entry.get("success") and entry.get("content")}
+    boilerplate = find_boilerplate(list(contents.values()))
+    cleaned = {name: strip_boilerplate(text, boilerplate) for name, text in contents.items()}
+    groups, titles = defaultdict(list), defaultdict(list)
+    for name, text in contents.items():
+        doc_type = classify_file(name)
+        if doc_type is None:
+            continue
+        groups[doc_type].append(cleaned[name])
+        if doc_type == "guide":
+            continue
+        title_lines = [m.group(1).strip() for m in map(_TITLE_LINE.match, text.splitlines()) if m]
+        filename_title = _FILENAME_TITLE.match(name)
+        titles[doc_type].extend(title_lines or ([filename_title.group(1).strip()] if filename_title else []))
+    return {
+        "version": PROFILE_VERSION,
+        "distilled_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "source_chars": sum(len(text) for text in contents.values()),
+        "boilerplate_lines": len(boilerplate),
+        "doc_types": {doc_type: profile_documents(texts, titles[doc_type]) for doc_type, texts in groups.items() if doc_type != "guide"},
+        "guidelines": extract_guidelines(groups.get("guide", [])),
+    }
+
+def _shares(pairs):
+    return ", ".join(f"{value}({share:.0%})" for value, share in pairs)
+
+def format_profile(style_profiles, doc_type):
+    """프롬프트에 넣을 문체 프로필 텍스트. 넣을 내용이 없으면 빈 문자열"""
+    profile = (style_profiles.get("doc_types") or {}).get(doc_type)
+    lines = []
+    if profile:
+        lines.append(f"📊 {doc_type} 문체 프로필 (학습 문서 {profile['documents']}건):")
+        if profile["title_endings"]:
+            examples = f" 예: {', '.join(profile['title_examples'])}" if profile["title_examples"] else ""
+            lines.append(f"- 제목: {_shares(profile['title_endings'])}.{examples}")
+        if profile["sentence_style"]:
+            lines.append(f"- 문장 종결: {_shares(profile['sentence_style'])}")
+        if profile["ending_phrases"]:
+            lines.append(f"- 자주 쓰는 끝 구절: {', '.join(phrase for phrase, _ in profile['ending_phrases'])}")
+        if profile["openings"]:
+            lines.append(f"- 첫 문장: {profile['openings'][0][0]}")
+        if profile["sections"]:
+            lines.append(f"- 대항목(문서 비율, 자주 쓰는 순서): {' → '.join(f'{name}({share:.0%})' for name, share in profile['sections'])}")
+        if profile["numbering"]:
+            lines.append(f"- 번호 체계: {' → '.join(profile['numbering'])}")
+    if style_profiles.get("guidelines"):
+        lines.append("📋 작성 지침:")
+        lines.extend(f"- {rule}" for rule in style_profiles["guidelines"])
+    return "\n".join(lines)
+
+def main():
+    import doc_pipeline as pipeline
+
+    parser = argparse.ArgumentParser(description="학습 코퍼스를 문서 종류별 문체 프로필로 요약")
+    parser.add_argument("--path", default=pipeline.LEARNED_DOCUMENTS_PATH, help="코퍼스 파일")
+    parser.add_argument("--dry-run", action="store_true", help="게시하지 않고 결과만 출력")
+    args = parser.parse_args()
+
+    corpus = pipeline.read_learned_documents(args.path)
+    if not corpus.get("files"):
+        print("files 항목이 없는 코퍼스입니다. 앱이나 corpus_watcher.py로 먼저 PDF를 학습하세요.")
+        return
+    before = {doc_type: len(pipeline.enhance_prompt("", doc_type, {k: v for k, v in corpus.items() if k != "style_profiles"}))
+              for doc_type in pipeline.DOC_TYPES}
+    corpus = {**corpus, "style_profiles": distill(corpus["files"])}
+    profiles = corpus["style_profiles"]
+    print(f"원문 {profiles['source_chars']:,}자, 반복 문구 {profiles['boilerplate_lines']}종 제거")
+    for doc_type in pipeline.DOC_TYPES:
+        after = len(pipeline.enhance_prompt("", doc_type, corpus))
+        print(f"\n[{doc_type}] 학습 가이드라인 {before[doc_type]:,}자 → {after:,}자")
+        print(format_profile(profiles, doc_type))
+    if not args.dry_run:
+        pipeline.publish_learned_documents(corpus, args.path)
+        print("\n게시했습니다.")
+
+if __name__ == "__main__":
+    main()
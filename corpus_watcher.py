@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""문서 폴더 감시 및 증분 학습
+
+PDF 폴더를 주기적으로 살펴 추가·변경·삭제된 파일만 다시 읽고, 새 코퍼스를 원자적으로 게시합니다.
+(doc_pipeline.publish_learned_documents: 임시 파일 + rename, 공유 캐시 게시)
+실행 중인 세션은 다음 화면 갱신 때 새 코퍼스를 읽으므로 재시작이 필요 없습니다.
+
+- 파일 변경은 (수정 시각, 크기)로 판단하며, 복사 중인 파일을 읽지 않도록 두 번 연속 같은 값일 때만 처리합니다.
+- 학습 데이터가 초기화된 상태(관리자가 '학습 데이터 초기화')면 다시 학습할 때까지 감시만 하고 게시하지 않습니다.
+- 앱 안에서는 CORPUS_WATCH=1(환경 변수 또는 secrets)일 때 백그라운드 스레드로 실행하고,
+  별도 프로세스로도 실행할 수 있습니다.
+    python corpus_watcher.py --dir . --interval 60
+    python corpus_watcher.py --once
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+import corpus_distill
+import doc_pipeline as pipeline
+from pdf_text import extract_pdf_text
+
+CORPUS_DIR = os.environ.get("CORPUS_DIR", ".")
+CORPUS_WATCH_INTERVAL = float(os.environ.get("CORPUS_WATCH_INTERVAL", "30"))
+
+def scan_pdfs(folder):
+    """폴더의 PDF 파일 이름 -> (수정 시각(ns), 크기)"""
+    found = {}
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return found
+    for entry in entries:
+        if entry.name.lower().endswith(".pdf") and entry.is_file():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            found[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+def file_signature(path):
+    """코퍼스 파일 항목에 함께 저장하는 변경 감지용 값"""
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def extract_entry(path, name=None, backend=None):
+    """PDF 하나를 읽어 코퍼스의 files 항목을 만듭니다. (스캔 페이지는 OCR, 페이지 캐시 사용)"""
+    name = name or os.path.basename(path)
+    signature = file_signature(path)
+    try:
+        text, stats = extract_pdf_text(path, backend=backend)
+        text = text.strip()
+    except Exception as e:
+        return {"filename": name, "content": f"PDF '{name}' 읽기 중 오류: {str(e)}", "source": "error", "length": 0, "success": False, **signature}
+    if not text:
+        reason = " 스캔 문서로 보이며 OCR(Tesseract)이 설치되어 있지 않습니다." if stats["scanned_pages"] and not stats["ocr_available"] else ""
+        return {"filename": name, "content": f"PDF '{name}'에서 텍스트를 추출할 수 없습니다.{reason} (총 {stats['total_pages']}페이지)",
+                "source": "error", "length": 0, "success": False, **signature}
+    return {"filename": name, "content": text, "source": "pdf_extracted", "length": len(text), "success": True, **signature}
+
+def assemble_corpus(files, learned_at=None):
+    """files 항목으로 코퍼스(요약, 문체 프로필, 기존 manual/samples 키 포함)를 만듭니다."""
+    successful = [entry for entry in files.values() if entry.get("success")]
+    corpus = {
+        "learned_at": learned_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "status": "learned",
+        "files": files,
+        "summary": {
+            "total_files": len(files),
+            "successful_files": len(successful),
+            "failed_files": len(files) - len(successful),
+            "total_content_length": sum(entry.get("length", 0) for entry in successful),
+        },
+        # 프롬프트에는 원문 대신 문서 종류별 문체 프로필을 넣음
+        "style_profiles": corpus_distill.distill(files),
+    }
+    # 기존 파일들 호환성 유지 (manual, samples 키 생성)
+    manual_files = [f for f in files if '메뉴얼' in f or 'manual' in f.lower()]
+    samples_files = [f for f in files if '품의서' in f or '모음' in f or 'sample' in f.lower()]
+    corpus["manual"] = files[manual_files[0]] if manual_files else {
+        "content": "기본 가이드라인을 사용합니다.", "source": "fallback_guidelines", "success": False}
+    corpus["samples"] = files[samples_files[0]] if samples_files else {
+        "content": "기본 샘플 패턴을 사용합니다.", "source": "fallback_patterns", "success": False}
+    return corpus
+
+def corpus_was_reset(path=pipeline.LEARNED_DOCUMENTS_PATH):
+    """관리자가 학습 데이터를 초기화한 뒤 아직 다시 학습하지 않았으면 True"""
+    shared = pipeline.shared_corpus_version() or pipeline.read_shared_corpus()
+    return shared.get("status") == "reset" and not os.path.exists(path)
+
+class CorpusWatcher:
+    """폴더를 interval초마다 확인해 바뀐 PDF만 다시 학습합니다."""
+
+    def __init__(self, folder=CORPUS_DIR, interval=CORPUS_WATCH_INTERVAL, backend=None, path=pipeline.LEARNED_DOCUMENTS_PATH):
+        self.folder = folder
+        self.interval = interval
+        self.backend = backend
+        self.path = path
+        self.last_checked = None
+        self.last_change = None  # 최근 게시 결과: added/changed/removed 파일 목록, published_at, seconds
+        self.last_error = None
+        self._previous_scan = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync_once(self):
+        """한 번 확인하고 바뀐 파일이 있으면 새 코퍼스를 게시합니다. 게시했으면 변경 내역, 아니면 None을 반환합니다."""
+        with self._lock:
+            current = scan_pdfs(self.folder)
+            # 두 번 연속 같은 (수정 시각, 크기)인 파일만 처리 (복사 중인 파일 제외)
+            stable = {name: sig for name, sig in current.items() if self._previous_scan.get(name) == sig}
+            self._previous_scan = current
+            self.last_checked = datetime.now()
+            if corpus_was_reset(self.path):
+                return None
+            corpus = pipeline.read_learned_documents(self.path)
+            files = dict(corpus.get("files") or {})
+            known = {name: (entry.get("mtime_ns"), entry.get("size")) for name, entry in files.items()}
+            added = sorted(name for name in stable if name not in files)
+            changed = sorted(name for name, sig in stable.items() if name in files and known[name] != sig)
+            removed = sorted(name for name in files if name not in current)
+            if not (added or changed or removed):
+                return None
+
+            start = time.perf_counter()
+            for name in added + changed:
+                files[name] = extract_entry(os.path.join(self.folder, name), name, self.backend)
+            for name in removed:
+                del files[name]
+            pipeline.publish_learned_documents(assemble_corpus(files), self.path)
+            self.last_change = {"added": added, "changed": changed, "removed": removed,
+                                "published_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                "seconds": time.perf_counter() - start}
+            return self.last_change
+
+    def _run(self):
+        while True:
+            try:
+                self.sync_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="corpus-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def start(folder=CORPUS_DIR, interval=CORPUS_WATCH_INTERVAL, backend=None):
+    """프로세스에 하나뿐인 감시 스레드를 시작하고 반환합니다. 이미 실행 중이면 그대로 반환합니다."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None or not _watcher.running:
+            _watcher = CorpusWatcher(folder, interval, backend).start()
+        return _watcher
+
+def current():
+    """실행 중인 감시 스레드 (없으면 None)"""
+    return _watcher
+
+def main():
+    parser = argparse.ArgumentParser(description="문서 폴더 감시 및 증분 학습")
+    parser.add_argument("--dir", default=CORPUS_DIR, help="PDF 폴더 (기본: CORPUS_DIR 또는 현재 폴더)")
+    parser.add_argument("--interval", type=float, default=CORPUS_WATCH_INTERVAL, help="확인 주기(초)")
+    parser.add_argument("--once", action="store_true", help="한 번만 동기화하고 종료 (크기 확인 없이 현재 파일 사용)")
+    args = parser.parse_args()
+
+    watcher = CorpusWatcher(args.dir, args.interval)
+    if args.once:
+        watcher._previous_scan = scan_pdfs(args.dir)
+        change = watcher.sync_once()
+        print(f"반영: {change}" if change else "바뀐 파일이 없습니다.")
+        return
+    print(f"{os.path.abspath(args.dir)} 폴더를 {args.interval:g}초마다 확인합니다. (종료: Ctrl+C)")
+    while True:
+        try:
+            change = watcher.sync_once()
+        except Exception as e:
+            print(f"[{datetime.now():%H:%M:%S}] 오류: {e}")
+            change = None
+        if change:
+            print(f"[{change['published_at']}] 추가 {len(change['added'])}, 변경 {len(change['changed'])}, "
+                  f"삭제 {len(change['removed'])} ({change['seconds']:.1f}초)")
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
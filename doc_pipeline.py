@@ -0,0 +1,695 @@
+"""문서 작성 파이프라인 공용 모듈
+
+프롬프트 구성, LLM 호출, 템플릿 렌더링, PDF 생성처럼 Streamlit 화면과 무관한 부분을 모아
+app.py와 HTTP API 서버(api_server.py)가 같은 구현을 사용하도록 합니다.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import escape
+
+from cache_backend import cache
+from corpus_distill import format_profile
+from docx_export import table_columns
+from model_router import router
+from text_utils import text_to_html
+import usage_ledger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEARNED_DOCUMENTS_PATH = 'learned_documents.json'
+DOC_TYPES = ('품의서', '공지문', '공문', '비즈니스 이메일')
+
+# --- 학습된 문서 ---
+CORPUS_CACHE_KEY = "corpus:learned_documents"
+# 게시된 코퍼스의 learned_at/status만 담은 작은 값. 이것이 바뀌었을 때만 코퍼스 전체를 가져옴
+CORPUS_VERSION_KEY = "corpus:learned_documents:version"
+
+@lru_cache(maxsize=4)
+def _load_corpus_file(path, mtime_ns, size):
+    """파일이 바뀌지 않았으면(수정 시각, 크기가 같으면) 이미 읽은 내용을 재사용합니다."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+_shared_corpus = {"version": None, "digest": None, "corpus": {}}
+_shared_corpus_lock = threading.Lock()
+
+def _corpus_version(corpus):
+    return {"learned_at": str(corpus.get("learned_at", "")), "status": corpus.get("status")}
+
+def _publish_shared_corpus(corpus):
+    cache.set_json(CORPUS_CACHE_KEY, corpus)
+    cache.set_json(CORPUS_VERSION_KEY, _corpus_version(corpus))
+
+def shared_corpus_version():
+    """공유 캐시에 게시된 코퍼스의 {learned_at, status} (없으면 None)"""
+    return cache.get_json(CORPUS_VERSION_KEY)
+
+def read_shared_corpus():
+    """공유 캐시에 게시된 코퍼스. 버전(또는 원본 바이트)이 같으면 이전에 읽은 딕셔너리를 재사용합니다."""
+    version = shared_corpus_version()
+    with _shared_corpus_lock:
+        if version is not None and version == _shared_corpus["version"]:
+            return _shared_corpus["corpus"]
+    data = cache.get_bytes(CORPUS_CACHE_KEY)
+    if data is None:
+        return {}
+    digest = hashlib.sha256(data).hexdigest()
+    with _shared_corpus_lock:
+        if digest != _shared_corpus["digest"]:
+            try:
+                corpus = json.loads(data.decode("utf-8"))
+            except ValueError:
+                corpus = {}
+            _shared_corpus.update(digest=digest, corpus=corpus)
+        # 버전 키가 없던 예전 게시본은 원본 바이트 해시로만 재사용
+        _shared_corpus["version"] = version
+        return _shared_corpus["corpus"]
+
+def read_learned_documents(path=LEARNED_DOCUMENTS_PATH):
+    """학습된 문서를 읽습니다. 없으면 빈 딕셔너리를 반환합니다. (반환한 딕셔너리는 고치지 마세요)
+
+    공유 캐시에 게시된 코퍼스와 로컬 파일 중 learned_at이 더 최근인 쪽을 사용하며(같으면 로컬 파일),
+    로컬 파일이 더 최근이면 공유 캐시에 게시해 다른 인스턴스도 학습 없이 사용하게 합니다.
+    로컬 파일과 공유 코퍼스는 바뀌지 않았으면 다시 파싱하지 않으므로 화면을 그릴 때마다 호출해도 됩니다.
+    """
+    local = {}
+    try:
+        stat = os.stat(path)
+        local = _load_corpus_file(path, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        pass
+    shared = read_shared_corpus()
+    local_at, shared_at = str(local.get('learned_at', '')), str(shared.get('learned_at', ''))
+    if local and local_at > shared_at:
+        _publish_shared_corpus(local)
+        return local
+    if shared.get('status') == 'reset':
+        return {}
+    if local and local_at == shared_at:
+        return local
+    return shared or local
+
+def publish_learned_documents(learned_documents, path=LEARNED_DOCUMENTS_PATH):
+    """학습 결과를 파일로 저장하고 공유 캐시에 게시합니다.
+
+    임시 파일에 쓴 뒤 rename하므로 다른 세션이나 감시 스레드가 쓰다 만 파일을 읽지 않습니다.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(learned_documents, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    _publish_shared_corpus(learned_documents)
+
+def clear_learned_documents(path=LEARNED_DOCUMENTS_PATH):
+    """학습 데이터를 삭제합니다. 다른 인스턴스의 오래된 파일이 다시 게시되지 않도록 초기화 기록을 남깁니다."""
+    if os.path.exists(path):
+        os.remove(path)
+    _publish_shared_corpus({'learned_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'status': 'reset'})
+
+def compute_learning_status(learned_documents):
+    """학습된 문서에서 manual/samples/files 학습 여부를 계산합니다."""
+    # 기존 방식과 새로운 방식 모두 지원
+    learning_status = {
+        "manual": learned_documents.get('manual', {}).get('content', '') != '',
+        "samples": learned_documents.get('samples', {}).get('content', '') != ''
+    }
+    
+    # 새로운 files 구조가 있으면 추가로 확인
+    if learned_documents.get('files'):
+        files_data = learned_documents.get('files', {})
+        successful_files = [f for f, data in files_data.items() if data.get('success')]
+        learning_status["files_learned"] = bool(successful_files)
+    return learning_status
+
+LEARNED_GUIDELINES_MARKER = "\n\n[학습된 문서 가이드라인]:\n"
+
+def enhance_prompt(base_prompt, doc_type, learned_documents):
+    """학습된 내용이 포함된 강화된 프롬프트를 생성합니다.
+
+    학습할 때 만든 문체 프로필(style_profiles, corpus_distill 참고)이 있으면 원문 대신 프로필 요약만 넣습니다.
+    """
+    if not learned_documents:
+        return base_prompt
+    style_profiles = learned_documents.get("style_profiles")
+    if style_profiles:
+        profile_text = format_profile(style_profiles, doc_type)
+        if not profile_text:
+            return base_prompt
+        return (base_prompt + LEARNED_GUIDELINES_MARKER + profile_text
+                + f"\n\n위 프로필의 제목 형식, 문체, 구성 순서를 따라 '{doc_type}'를 작성하세요.")
+    learning_status = compute_learning_status(learned_documents)
+    
+    enhancement = LEARNED_GUIDELINES_MARKER
+    total_content = ""
+    
+    # 기존 manual, samples 키 지원
+    if learning_status.get("manual") and learned_documents.get('manual', {}).get('content'):
+        enhancement += "\n📋 문서작성 가이드라인:\n"
+        enhancement += learned_documents['manual']['content'][:2000]  # 2000자로 확장
+    
+    if learning_status.get("samples") and learned_documents.get('samples', {}).get('content'):
+        enhancement += "\n📝 품의서 작성 패턴:\n"
+        enhancement += learned_documents['samples']['content'][:2000]  # 2000자로 확장
+    
+    # 새로운 files 구조 지원 - 문서 유형별로 관련성 높은 파일 우선 포함
+    if learned_documents.get('files'):
+        relevant_files = []
+        other_files = []
+        
+        for filename, file_data in learned_documents['files'].items():
+            if file_data.get('success') and file_data.get('content'):
+                # 현재 작성 중인 문서 유형과 관련성 체크
+                is_relevant = False
+                if doc_type == '품의서' and ('품의서' in filename or '모음' in filename or '메뉴얼' in filename):
+                    is_relevant = True
+                elif doc_type == '공지문' and ('공지' in filename or '메뉴얼' in filename):
+                    is_relevant = True
+                elif doc_type == '공문' and ('공문' in filename or '메뉴얼' in filename):
+                    is_relevant = True
+                elif doc_type == '비즈니스 이메일' and ('이메일' in filename or 'email' in filename.lower() or '메뉴얼' in filename):
+                    is_relevant = True
+                
+                if is_relevant:
+                    relevant_files.append((filename, file_data))
+                else:
+                    other_files.append((filename, file_data))
+        
+        # 관련 파일을 먼저 포함
+        all_files = relevant_files + other_files
+        
+        if all_files:
+            enhancement += "\n📚 학습된 전문 문서 가이드라인:\n"
+            
+            for filename, file_data in all_files[:5]:  # 최대 5개 파일만 포함
+                # 파일명에서 카테고리 추론
+                if '메뉴얼' in filename or 'manual' in filename.lower():
+                    category = "📋 작성 가이드라인"
+                elif '품의서' in filename or '모음' in filename:
+                    category = "📝 품의서 실제 사례"
+                elif '공지' in filename:
+                    category = "📢 공지문 템플릿"
+                elif '공문' in filename:
+                    category = "📄 공문 양식"
+                elif '이메일' in filename or 'email' in filename.lower():
+                    category = "📧 이메일 양식"
+                else:
+                    category = "📖 참고 문서"
+                
+                enhancement += f"\n{category}:\n"
+                
+                # 내용을 더 길게 포함 (문서 유형 관련성에 따라 조정)
+                content = file_data['content']
+                if filename in [f[0] for f in relevant_files]:
+                    max_length = 3000  # 관련성 높은 파일은 더 길게
+                else:
+                    max_length = 1500  # 일반 파일은 중간 길이
+                
+                if len(content) > max_length:
+                    # 중요한 부분을 보존하기 위해 앞부분과 뒷부분을 포함
+                    front_part = content[:max_length//2]
+                    back_part = content[-(max_length//2):]
+                    content = front_part + "\n...(중간 내용 생략)...\n" + back_part
+                
+                enhancement += content + "\n"
+    
+    enhancement += f"\n\n위의 모든 학습된 가이드라인과 실제 사례를 바탕으로 '{doc_type}' 문서의 전문성과 완성도를 최대한 높여 작성해주세요. 특히 학습된 문서의 구조, 문체, 표현 방식을 참고하여 한국 비즈니스 문서 표준에 맞춰 작성하세요."
+    
+    return base_prompt + enhancement
+
+# --- LLM 호출 ---
+class AIResponseError(Exception):
+    """AI 호출 실패. 사용자에게 보여줄 메시지를 담습니다."""
+
+def describe_ai_error(error_msg):
+    """API 호출 오류를 사용자에게 알기 쉬운 메시지로 바꿉니다."""
+    if "rate limit" in error_msg.lower():
+        return "⚠️ API 요청 한도를 초과했습니다. 잠시 후 다시 시도해주세요."
+    elif "timeout" in error_msg.lower():
+        return "⚠️ AI 응답 시간이 초과되었습니다. 다시 시도해주세요."
+    elif "insufficient_quota" in error_msg.lower():
+        return "⚠️ OpenAI API 할당량이 부족합니다. 계정을 확인해주세요."
+    return f"AI 생성 중 오류가 발생했습니다: {error_msg}"
+
+# 같은 프롬프트의 응답을 재사용할 작업 (초안 생성과 필드 재생성은 누를 때마다 새 결과가 필요하므로 제외)
+RESPONSE_CACHE_TASKS = ("analyze",)
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+
+def response_cache_key(system_prompt, user_prompt, selected_model, max_tokens, task, history, response_schema=None):
+    payload = json.dumps([task, selected_model, max_tokens, system_prompt, history or [], user_prompt, response_schema], ensure_ascii=False)
+    return "llm:v2:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def response_format_for(model, response_schema):
+    """(response_format, 시스템 프롬프트에 덧붙일 텍스트). 스키마를 강제할 수 없는 모델에는 스키마를 프롬프트로 알려줍니다."""
+    if not response_schema:
+        return {"type": "json_object"}, ""
+    if supports_structured_output(model):
+        return {"type": "json_schema", "json_schema": {"name": response_schema["name"], "strict": True, "schema": response_schema["schema"]}}, ""
+    schema_text = json.dumps(response_schema["schema"], ensure_ascii=False, separators=(",", ":"))
+    return {"type": "json_object"}, f"\n\n[응답 JSON 스키마]: {schema_text}"
+
+def call_llm_json(client, system_prompt, user_prompt, selected_model, max_tokens=3000, task="draft", history=None, doc_type=None, response_schema=None):
+    """LLM을 호출해 JSON 응답을 반환합니다. 실패하면 AIResponseError를 발생시킵니다.
+
+    client는 OpenAI 클라이언트와 같은 chat.completions.create 인터페이스를 가진 객체입니다.
+    task(analyze/draft/regenerate)에 따라 model_router가 정한 순서로 모델을 시도하며,
+    API 오류가 나거나 응답이 올바른 JSON이 아니면 다음 후보 모델로 넘어갑니다.
+    response_schema(draft_schema 등)를 넘기면 지원하는 모델에는 strict JSON 스키마로 요청합니다.
+    history에는 시스템 프롬프트와 이번 사용자 메시지 사이에 들어갈 이전 대화를 넘깁니다.
+    RESPONSE_CACHE_TASKS 작업은 같은 요청의 응답을 공유 캐시에서 재사용합니다. (첫 후보 모델의 응답만 저장)
+    호출마다 토큰 수, 지연시간, 예상 비용을 doc_type과 함께 usage_ledger에 기록합니다.
+    Streamlit에 의존하지 않으므로 백그라운드 스레드나 API 서버에서도 호출할 수 있습니다.
+    """
+    if client is None:
+        raise AIResponseError("⚠️ OpenAI API가 설정되지 않아 AI 기능을 사용할 수 없습니다.")
+        
+    if not system_prompt or not user_prompt:
+        raise AIResponseError("프롬프트가 비어있습니다.")
+    
+    cache_key = None
+    if task in RESPONSE_CACHE_TASKS:
+        cache_key = response_cache_key(system_prompt, user_prompt, selected_model, max_tokens, task, history, response_schema)
+        cached = cache.get_json(cache_key)
+        if cached is not None:
+            usage_ledger.record_call(doc_type, task, cached["model"], "cached")
+            return cached["result"]
+    
+    last_error = ""
+    candidates = router.candidates(task, selected_model)
+    for model in candidates:
+        response_format, schema_prompt = response_format_for(model, response_schema)
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                response_format=response_format,
+                messages=[
+                    {"role": "system", "content": system_prompt + schema_prompt},
+                    *(history or []),
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.7,
+                max_tokens=max_tokens,
+                timeout=30
+            )
+        except Exception as e:
+            router.record(model, time.perf_counter() - started, ok=False)
+            usage_ledger.record_call(doc_type, task, model, "error", time.perf_counter() - started)
+            last_error = str(e)
+            continue
+        latency = time.perf_counter() - started
+        router.record(model, latency, ok=True)
+        
+        message = response.choices[0].message if response.choices else None
+        content = (message.content or "").strip() if message else ""
+        usage_ledger.record_call(doc_type, task, model, "ok", latency, sections=prompt_sections(system_prompt, user_prompt, history, schema_prompt),
+                                 usage=getattr(response, "usage", None), output_text=content)
+        if not content:
+            last_error = getattr(message, "refusal", None) or "AI 응답이 비어있습니다."
+            continue
+        
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError as e:
+            # 잘린 응답 등 형식 오류는 다음 후보 모델로 다시 시도
+            last_error = f"AI 응답 형식이 올바르지 않습니다: {str(e)}"
+            continue
+        # 장애 조치로 다른 모델이 답한 결과는 저장하지 않음
+        if cache_key and model == candidates[0]:
+            cache.set_json(cache_key, {"model": model, "result": result}, ttl=RESPONSE_CACHE_TTL)
+        return result
+    
+    raise AIResponseError(describe_ai_error(last_error))
+
+# --- 프롬프트 구성 ---
+def build_analysis_prompts(keywords, doc_type, learned_documents=None):
+    """추가 질문 분석용 (시스템 프롬프트, 사용자 프롬프트)를 만듭니다."""
+    analysis_prompt = f"사용자가 '{doc_type}' 작성을 위해 다음 키워드를 입력했습니다: '{keywords}'. 6W3H 원칙에 따라 완성도 높은 문서를 작성하기에 정보가 부족하다면, 가장 중요한 질문 2-3개를 `{{\"status\": \"incomplete\", \"questions\": [\"질문1\", \"질문2\"]}}` 형식으로 반환하고, 충분하다면 `{{\"status\": \"complete\"}}` 를 반환하세요."
+    base_system_prompt = "당신은 사용자의 입력을 분석하여 문서 작성에 필요한 추가 정보를 질문하는 시스템입니다. 반드시 지정된 JSON 형식으로만 응답해야 합니다."
+    
+    # 학습된 내용으로 시스템 프롬프트 강화
+    enhanced_system_prompt = enhance_prompt(base_system_prompt, doc_type, learned_documents)
+    return enhanced_system_prompt, analysis_prompt
+
+# 문서 유형별 초안 작성 기본 시스템 프롬프트
+# 필드 구성과 번호 위계는 JSON 스키마(DRAFT_FIELDS)로 강제하므로 프롬프트에는 역할, 문체, 표 작성 기준만 둡니다.
+TABLE_RULE = "표로 만들 내용이 없으면 items의 columns와 rows를 빈 배열로 두세요."
+DRAFT_BASE_PROMPTS = {
+    "품의서": "당신은 한국의 '주식회사 몬쉘코리아' 소속의 유능한 사원으로 품의서 초안을 작성합니다. 문장 종결어미는 `...함.`, `...요청함.` 형태로 합니다. 키워드에 수치·금액·기간이 딸린 여러 항목, 비교할 옵션이나 조건, 단계별 일정, 부서·유형별로 분류할 내용이 있으면 items 표로 정리하세요. 표에는 키워드에 있는 실제 항목만 넣고 가상의 데이터를 만들지 말며, 모르는 값은 '별도 협의'로 표시하세요. " + TABLE_RULE,
+    "공지문": "당신은 한국 기업의 사내 커뮤니케이션 담당자로, 키워드와 첨부파일 내용을 바탕으로 사내 공지문 초안을 작성합니다. 여러 일정, 교육 과정, 대상별 혜택이나 조건, 변경 전후 비교, 업무별 담당자처럼 구분되는 항목이 있으면 items 표로 정리하세요. 실제 내용만 사용하고 미정 정보는 '추후 안내'로 표시하세요. " + TABLE_RULE,
+    "공문": "당신은 대외 문서를 담당하는 총무팀 직원으로, 키워드와 첨부파일 내용을 바탕으로 격식에 맞는 공문 초안을 작성합니다. 여러 일정, 제출 서류, 협력 요청 사항, 비용 항목, 기관별 참석자가 있으면 items 표로 정리하세요. 실제 내용만 사용하고 확정되지 않은 정보는 '추후 협의'로 표시하세요. " + TABLE_RULE,
+    "비즈니스 이메일": "당신은 비즈니스 커뮤니케이션 전문가로, 키워드와 첨부파일 내용을 바탕으로 전문적인 비즈니스 이메일 초안을 작성합니다. 여러 일정, 견적·주문 항목, 업무 진행 상황, 제품 정보, 담당자 연락처가 있으면 items 표로 정리하세요. 실제 내용만 사용하고 미확정 정보는 'TBD'로 표시하세요. " + TABLE_RULE,
+}
+
+# --- 구조화된 출력 (JSON 스키마) ---
+# 본문 위계는 번호 없는 중첩 배열({"t": 문장, "c": 하위 항목})로, 표는 열 이름과 행 값 배열로 받아
+# 출력 토큰을 줄이고, 번호와 행 딕셔너리는 decode_draft에서 로컬로 만듭니다.
+# OpenAI strict 모드는 모든 속성이 required이고 additionalProperties가 false여야 합니다.
+def _object(properties, description=None):
+    schema = {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+    if description:
+        schema["description"] = description
+    return schema
+
+def _text(description):
+    return {"type": "string", "description": description}
+
+def _outline(description):
+    """최대 3단계(1. → 1) → (1)) 항목 목록"""
+    level3 = _object({"t": {"type": "string"}})
+    level2 = _object({"t": {"type": "string"}, "c": {"type": "array", "items": level3}})
+    level1 = _object({"t": {"type": "string"}, "c": {"type": "array", "items": level2}})
+    return {"type": "array", "items": level1,
+            "description": description + " 항목 번호는 쓰지 말고 t에 항목 문장, c에 하위 항목을 넣으세요. 각 문장은 마침표로 끝냅니다."}
+
+def _table(description):
+    return _object({
+        "columns": {"type": "array", "items": {"type": "string"}},
+        "rows": {"type": "array", "items": {"type": "array", "items": {"type": "string"}}},
+    }, description + " rows의 각 행은 columns와 같은 순서의 값 배열입니다.")
+
+DRAFT_FIELDS = {
+    "품의서": {
+        "title": _text("결재자가 제목만 보고 내용을 알 수 있는 품의 제목"),
+        "purpose": _text("품의 목적과 개요 2~3문장"),
+        "body": _outline("배경, 필요성, 추진 방법 등 상세 설명"),
+        "items": _table("상세 내역 표 (품목, 수량, 단가 등)"),
+        "remarks": _text("예상 비용, 소요 기간, 기대 효과 등 비고"),
+    },
+    "공지문": {
+        "title": _text("공지 제목"),
+        "target": _text("공지 대상 (예: 전 직원)"),
+        "summary": _text("공지 핵심 요약 한두 문장"),
+        "details": _outline("5W1H에 따른 상세 내용"),
+        "items": _table("일정, 과정 등 상세 내역 표"),
+        "contact": _text("문의처 (담당 부서, 연락처)"),
+    },
+    "공문": {
+        "sender_org": _text("발신 기관명"),
+        "receiver": _text("수신처"),
+        "cc": _text("참조 (없으면 빈 문자열)"),
+        "title": _text("공문 제목"),
+        "body": _outline("공문 본문"),
+        "items": _table("일정, 제출 서류, 요청 사항 등 표"),
+        "sender_name": _text("발신 명의"),
+    },
+    "비즈니스 이메일": {
+        "subject": _text("이메일 제목"),
+        "body": _outline("이메일 본론"),
+        "items": _table("일정, 견적, 업무 등 표"),
+        "closing": _text("인사말이나 마무리 문구만 (회사명, 연락처, 이메일 주소 등 서명 정보 제외)"),
+    },
+}
+
+STATUS_FIELDS = {
+    "status": {"type": "string", "enum": ["complete", "incomplete"]},
+    "questions": {"type": "array", "items": {"type": "string"}, "description": "정보가 부족할 때 가장 중요한 질문 2-3개 (충분하면 빈 배열)"},
+}
+
+ANALYSIS_SCHEMA = {"name": "analysis", "schema": _object(STATUS_FIELDS)}
+
+def draft_schema(doc_type):
+    return {"name": "draft", "schema": _object(DRAFT_FIELDS[doc_type])}
+
+def clarify_or_draft_schema(doc_type):
+    """질문 또는 초안 응답: 정보가 부족하면 draft가 null"""
+    return {"name": "clarify_or_draft", "schema": _object({
+        **STATUS_FIELDS,
+        "draft": {"anyOf": [_object(DRAFT_FIELDS[doc_type]), {"type": "null"}]},
+    })}
+
+def regenerate_schema(doc_type, field):
+    return {"name": f"regenerate_{field}", "schema": _object({field: DRAFT_FIELDS[doc_type][field]})}
+
+# JSON 스키마 강제(structured outputs)를 지원하는 모델 (그 밖의 모델은 스키마를 시스템 프롬프트에 붙여 json_object로 요청)
+STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+def supports_structured_output(model):
+    return model.startswith(STRUCTURED_OUTPUT_MODELS) and model != "gpt-4o-2024-05-13"
+
+OUTLINE_MARKERS = ("{}. ", "  {}) ", "    ({}) ")
+
+def outline_to_text(nodes, level=0):
+    """중첩 항목 배열을 `1.`, `  1)`, `    (1)` 위계의 텍스트로 바꿉니다. (렌더링 시 renumber_text가 다시 번호를 매김)"""
+    lines = []
+    for number, node in enumerate(nodes, 1):
+        if not isinstance(node, dict):
+            node = {"t": str(node)}
+        lines.append(OUTLINE_MARKERS[min(level, 2)].format(number) + str(node.get("t", "")).strip())
+        if node.get("c"):
+            lines.append(outline_to_text(node["c"], level + 1))
+    return "\n".join(lines)
+
+def table_to_rows(table):
+    """{"columns": [...], "rows": [[...]]}를 행 딕셔너리 목록으로 바꿉니다."""
+    columns = table.get("columns") or []
+    return [dict(zip(columns, row)) for row in table.get("rows") or [] if any(str(v).strip() for v in row)]
+
+def decode_field(value):
+    """압축 형식 필드 값을 앱에서 쓰는 형식(텍스트, 행 목록)으로 바꿉니다. 이미 앱 형식이면 그대로 반환합니다."""
+    if isinstance(value, dict) and "columns" in value and "rows" in value:
+        return table_to_rows(value)
+    if isinstance(value, list) and value and all(isinstance(node, dict) and "t" in node for node in value):
+        return outline_to_text(value)
+    return value
+
+def decode_draft(draft):
+    if not isinstance(draft, dict):
+        return draft
+    return {key: decode_field(value) for key, value in draft.items()}
+
+def build_draft_system_prompt(doc_type, learned_documents=None):
+    """학습된 내용으로 강화된 초안 작성용 시스템 프롬프트를 만듭니다."""
+    return enhance_prompt(DRAFT_BASE_PROMPTS[doc_type], doc_type, learned_documents)
+
+ATTACHMENT_MARKER = "\n\n[첨부 파일 내용]:\n"
+
+def build_draft_user_prompt(doc_type, context_keywords, file_context=""):
+    """초안 작성용 사용자 프롬프트를 만듭니다."""
+    return f"다음 정보를 바탕으로 '{doc_type}' 초안을 JSON 형식으로 생성해주세요:\n\n[핵심 키워드]: {context_keywords}{ATTACHMENT_MARKER}{file_context}"
+
+# --- 질문 또는 초안을 한 번에 받는 모드 ---
+# 시스템 프롬프트는 일반 초안 생성과 동일하게 두고 지시문은 사용자 메시지에 붙여
+# 답변 후 이어지는 호출에서도 같은 접두부(prefix)가 재사용(프롬프트 캐시)되도록 합니다.
+CLARIFY_OR_DRAFT_INSTRUCTION = (
+    "[응답 방식]: 먼저 6W3H 원칙에 따라 위 정보가 완성도 높은 문서를 작성하기에 충분한지 판단하세요. "
+    "정보가 부족하다면 가장 중요한 질문 2-3개를 `{\"status\": \"incomplete\", \"questions\": [\"질문1\", \"질문2\"]}` 형식으로 반환하고, "
+    "충분하다면 `{\"status\": \"complete\", \"draft\": {...}}` 형식으로 'draft' 안에 위 규칙에 맞는 초안 JSON 전체를 담아 반환하세요."
+)
+
+def build_clarify_or_draft_user_prompt(doc_type, context_keywords, file_context=""):
+    """질문 또는 초안을 한 번에 받는 모드의 사용자 프롬프트를 만듭니다."""
+    return build_draft_user_prompt(doc_type, context_keywords, file_context) + "\n\n" + CLARIFY_OR_DRAFT_INSTRUCTION
+
+def build_continuation_user_prompt(answers):
+    """추가 질문에 대한 답변을 담아 최종 초안을 요청하는 후속 사용자 프롬프트를 만듭니다."""
+    answer_text = "\n".join(f"- {q}: {a}" for q, a in answers.items() if a)
+    return f"[추가 정보]\n{answer_text}\n\n위 추가 정보를 반영하여 더 이상 질문하지 말고 `{{\"status\": \"complete\", \"draft\": {{...}}}}` 형식으로 최종 초안을 작성하세요."
+
+def prompt_sections(system_prompt, user_prompt, history=None, schema_prompt=""):
+    """사용량 기록(usage_ledger)용으로 프롬프트를 구성 요소별 텍스트로 나눕니다.
+
+    system_base(기본 지시문), learned_guidelines(학습 문서 강화), response_schema(프롬프트로 알려준 JSON 스키마),
+    history(이전 대화), user_input(키워드, 답변, 재생성할 초안 등), attachments(첨부 파일 내용),
+    response_instruction(질문 또는 초안 지시문)
+    """
+    base, marker, guidelines = system_prompt.partition(LEARNED_GUIDELINES_MARKER)
+    user, instruction = user_prompt, ""
+    if user.endswith(CLARIFY_OR_DRAFT_INSTRUCTION):
+        user, instruction = user[:-len(CLARIFY_OR_DRAFT_INSTRUCTION)], CLARIFY_OR_DRAFT_INSTRUCTION
+    user, _, attachments = user.partition(ATTACHMENT_MARKER)
+    return {
+        "system_base": base,
+        "learned_guidelines": marker + guidelines,
+        "response_schema": schema_prompt,
+        "history": "\n".join(message["content"] for message in history or []),
+        "user_input": user,
+        "attachments": attachments,
+        "response_instruction": instruction,
+    }
+
+def extract_draft(result):
+    """clarify-or-draft 응답에서 초안 딕셔너리를 꺼냅니다."""
+    if isinstance(result.get("draft"), dict):
+        return decode_draft(result["draft"])
+    # 'draft' 없이 초안 필드를 최상위에 담아 응답한 경우
+    draft = {k: v for k, v in result.items() if k not in ("status", "questions", "draft")}
+    return decode_draft(draft) or None
+
+# --- 필드 단위 재생성 ---
+# 문서 유형별로 재생성 가능한 필드와 필드별 작성 규칙
+REGENERATABLE_FIELDS = {
+    "품의서": {
+        "purpose": ("목적 및 개요", "이 품의를 올리는 이유와 목표를 2~3문장으로 간결하게 작성하세요. 문장 종결어미는 `...함.` 형태입니다."),
+        "body": ("상세 설명", "항목과 하위 항목으로 위계를 나누어 작성하고, 문장 종결어미는 `...함.`, `...요청함.` 형태로 하세요."),
+        "items": ("상세 내역 표", "키워드와 초안에 있는 실제 내용만 사용하고 가상의 데이터를 만들지 마세요."),
+        "remarks": ("비고", "예상 비용, 소요 기간, 기대 효과 등 의사결정에 필요한 추가 정보를 간결하게 작성하세요."),
+    },
+    "공지문": {
+        "summary": ("핵심 요약", "공지의 핵심을 한두 문장으로 요약하세요."),
+        "details": ("상세 내용", "5W1H에 따라 항목과 하위 항목으로 위계를 나누어 작성하세요."),
+        "items": ("상세 내역 표", "실제 내용만 사용하고 미정 정보는 '추후 안내'로 표시하세요."),
+    },
+    "공문": {
+        "body": ("내용", "격식에 맞게 항목과 하위 항목으로 위계를 나누어 작성하세요."),
+        "items": ("상세 내역 표", "실제 내용만 사용하고 미정 정보는 '추후 협의'로 표시하세요."),
+    },
+    "비즈니스 이메일": {
+        "body": ("본론", "항목과 하위 항목으로 위계를 나누어 작성하세요."),
+        "items": ("상세 내역 표", "실제 내용만 사용하고 미정 정보는 'TBD'로 표시하세요."),
+        "closing": ("결론", "인사말이나 마무리 문구만 작성하고 회사명, 연락처 등 서명 정보는 포함하지 마세요."),
+    },
+}
+
+def compact_draft_context(snapshot, exclude_field, max_chars=400, max_rows=5):
+    """재생성할 필드를 제외한 초안을 짧은 JSON 문자열로 만듭니다."""
+    compact = {}
+    for key, value in snapshot.items():
+        if key == exclude_field or value in (None, "", []):
+            continue
+        if isinstance(value, list):
+            compact[key] = value[:max_rows]
+        elif isinstance(value, str) and len(value) > max_chars:
+            compact[key] = value[:max_chars] + "..."
+        else:
+            compact[key] = value
+    return json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+
+def build_regenerate_prompts(doc_type, snapshot, field, instruction=""):
+    """필드 하나만 다시 생성하기 위한 (시스템 프롬프트, 사용자 프롬프트, 최대 토큰 수)를 만듭니다."""
+    label, rule = REGENERATABLE_FIELDS[doc_type][field]
+    system_prompt = (
+        f"당신은 한국 기업의 '{doc_type}' 작성을 돕는 전문가입니다. 주어진 초안의 나머지 내용과 일관되게 "
+        f"'{label}' 필드 하나만 다시 작성합니다. {rule} "
+        f"반드시 `{{\"{field}\": ...}}` 형식의 JSON으로만 응답하세요."
+    )
+    user_prompt = f"[현재 초안]: {compact_draft_context(snapshot, field)}\n[기존 {label}]: {json.dumps(snapshot.get(field, ''), ensure_ascii=False)[:1500]}"
+    if instruction:
+        user_prompt += f"\n[수정 요청]: {instruction}"
+    max_tokens = 1500 if field == "items" else 800
+    return system_prompt, user_prompt, max_tokens
+
+def parse_regenerated_field(result, field):
+    """재생성 응답에서 필드 값을 꺼냅니다. 형식이 맞지 않으면 None"""
+    if not result or field not in result:
+        return None
+    value = decode_field(result[field])
+    if field == "items" and not (isinstance(value, list) and all(isinstance(row, dict) for row in value)):
+        return None
+    return value
+
+# --- 템플릿 렌더링 및 PDF ---
+TEMPLATE_FILES = {
+    '품의서': 'pumui_template_final.html',
+    '공지문': 'gongji_template.html',
+    '공문': 'gongmun_template.html',
+    '비즈니스 이메일': 'email_template_v2.html',
+}
+template_env = Environment(loader=FileSystemLoader(BASE_DIR))
+
+@lru_cache(maxsize=2048)
+def _cached_field_html(text, for_email):
+    return text_to_html(text, for_email=for_email)
+
+def field_html(value, for_email=False):
+    """필드 텍스트를 HTML 조각으로 변환합니다. 문자열은 내용별로 캐시된 조각을 재사용합니다."""
+    if isinstance(value, str):
+        return _cached_field_html(value, for_email)
+    return text_to_html(value, for_email=for_email)
+
+def preview_fingerprint(doc_type, draft, signature_data=None, table_headers=None, max_rows=None):
+    """미리보기에 영향을 주는 입력의 필드별 해시. 이전 값과 비교해 바뀐 필드를 찾을 때 사용합니다."""
+    fields = {**draft, **{f"signature.{k}": v for k, v in (signature_data or {}).items()}}
+    fields["_doc_type"] = doc_type
+    fields["_table_headers"] = table_headers
+    fields["_max_rows"] = max_rows
+    fields["_date"] = datetime.now().strftime('%Y-%m-%d')
+    return {
+        key: hashlib.sha1(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        for key, value in fields.items()
+    }
+
+def changed_fields(previous, current):
+    """두 preview_fingerprint 사이에 바뀐(추가/삭제 포함) 필드 이름 목록"""
+    previous = previous or {}
+    return sorted(key for key in set(previous) | set(current) if previous.get(key) != current.get(key))
+
+# --- 큰 표 (행이 많은 상세 내역) ---
+LARGE_TABLE_ROWS = int(os.environ.get("LARGE_TABLE_ROWS", "200"))  # 이 행 수를 넘으면 행을 미리 렌더링
+TABLE_CHUNK_ROWS = 250  # 미리 렌더링하는 <tbody> 하나의 행 수
+PREVIEW_TABLE_ROWS = int(os.environ.get("PREVIEW_TABLE_ROWS", "100"))  # 화면 미리보기에 기본으로 보여줄 행 수
+
+@lru_cache(maxsize=256)
+def _render_row_chunk(cells):
+    # 템플릿의 일반 표({{ ...|e }})와 같은 방식으로 이스케이프
+    return "".join("<tr>" + "".join(f"<td>{escape(cell)}</td>" for cell in row) + "</tr>" for row in cells)
+
+def render_table_chunks(items, headers, chunk_rows=TABLE_CHUNK_ROWS):
+    """상세 내역 행을 chunk_rows행씩 <tr> HTML 문자열로 렌더링합니다.
+
+    Jinja에서 셀마다 row.get()을 부르는 대신 파이썬에서 한 번에 만들며, 내용이 같은 묶음은 캐시된 문자열을 재사용하므로
+    행 하나를 고치면 그 행이 속한 묶음만 다시 만듭니다.
+    """
+    headers = tuple(headers)
+    chunks = []
+    for start in range(0, len(items), chunk_rows):
+        cells = tuple(tuple(str(row.get(header) if row.get(header) is not None else "") for header in headers)
+                      for row in items[start:start + chunk_rows])
+        chunks.append(_render_row_chunk(cells))
+    return chunks
+
+def build_template_context(doc_type, draft, signature_data=None, table_headers=None, max_rows=None):
+    """초안 필드로 문서 유형별 HTML 템플릿 컨텍스트를 만듭니다.
+
+    draft["items"]는 행 딕셔너리 목록이며, table_headers를 주지 않으면 행에서 컬럼을 수집합니다.
+    행이 LARGE_TABLE_ROWS를 넘으면 큰 표 모드로 행을 미리 렌더링합니다(table_chunks). 템플릿은 고정 폭 레이아웃과
+    페이지마다 반복되는 머리글로 출력합니다. max_rows를 주면(화면 미리보기) 앞의 max_rows행만 넣고 table_note에 안내 문구를 넣습니다.
+    """
+    signature_data = signature_data or {}
+    items = [row for row in (draft.get("items") or []) if isinstance(row, dict)]
+    if doc_type == '품의서':
+        context = {
+            "title": draft.get("title", ""),
+            "purpose": field_html(draft.get("purpose", "")),
+            "remarks": field_html(draft.get("remarks", "")),
+            "generation_date": datetime.now().strftime('%Y-%m-%d')
+        }
+        if draft.get("body"):
+            context["body"] = field_html(draft["body"])
+    elif doc_type == '공지문':
+        context = { "title": draft.get("title", ""), "target": draft.get("target", ""), "summary": field_html(draft.get("summary", "")), "details": field_html(draft.get("details", "")), "contact": draft.get("contact", ""), "generation_date": datetime.now().strftime('%Y. %m. %d.') }
+    elif doc_type == '공문':
+        context = { "sender_org": draft.get("sender_org", ""), "receiver": draft.get("receiver", ""), "cc": draft.get("cc", ""), "title": draft.get("title", ""), "body": field_html(draft.get("body", "")), "sender_name": draft.get("sender_name", ""), "generation_date": datetime.now().strftime('%Y. %m. %d.') }
+    elif doc_type == '비즈니스 이메일':
+        context = {**draft, **signature_data}
+        context["signature_company"] = "주식회사 몬쉘코리아"
+        # 이메일 본문 텍스트 처리 (자연스러운 줄바꿈)
+        context["body"] = field_html(draft.get("body", ""), for_email=True)
+        context["closing"] = field_html(draft.get("closing", ""), for_email=True)
+    else:
+        raise ValueError(f"지원하지 않는 문서 유형입니다: {doc_type}")
+    
+    context["items"] = items
+    if items:
+        context["table_headers"] = list(table_headers) if table_headers else table_columns(items)
+        if max_rows and len(items) > max_rows:
+            context["table_note"] = f"전체 {len(items):,}행 중 앞 {max_rows:,}행만 미리보기에 표시했습니다."
+            context["items"] = items = items[:max_rows]
+        if len(items) > LARGE_TABLE_ROWS:
+            context["table_chunks"] = render_table_chunks(items, context["table_headers"])
+    return context
+
+def render_html(doc_type, context):
+    """문서 유형별 템플릿에 컨텍스트를 채워 HTML 문자열을 반환합니다."""
+    return template_env.get_template(TEMPLATE_FILES[doc_type]).render(context)
+
+def generate_pdf(html_content):
+    """HTML을 PDF 바이트로 변환합니다. (WeasyPrint는 사용할 때만 불러옵니다)"""
+    from weasyprint import HTML, CSS
+    font_css = CSS(string="@import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR:wght@400;700&display=swap'); body { font-family: 'Noto Sans KR', sans-serif; }")
+    return HTML(string=html_content, base_url=BASE_DIR).write_pdf(stylesheets=[font_css])
@@ -0,0 +1,123 @@
+"""작성한 초안의 영구 보관 및 전문 검색 (SQLite FTS5)
+
+미리보기를 만든 초안(확정본)의 필드, 문서 종류, 모델, 키워드, 작성/수정 시각을 저장합니다.
+한국어는 띄어쓰기 단위 토큰화로는 조사('태블릿을') 때문에 잘 찾히지 않으므로
+trigram 토크나이저로 부분 문자열 검색을 하고, 3글자 미만 검색어는 LIKE로 찾습니다.
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("DRAFT_HISTORY_DB", os.path.join(BASE_DIR, "draft_history.db"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drafts (
+    id TEXT PRIMARY KEY,
+    doc_type TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    keywords TEXT NOT NULL DEFAULT '',
+    fields TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS drafts_updated ON drafts (doc_type, updated_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS drafts_fts USING fts5(id UNINDEXED, title, keywords, content, tokenize='trigram');
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+@contextmanager
+def _connect(path=None):
+    """연결을 열어 작업이 끝나면 커밋하고 닫습니다. (스레드마다 별도 연결 사용)"""
+    path = path or DB_PATH
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        if path not in _initialized:
+            with _init_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _initialized.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def draft_title(fields):
+    return str(fields.get("title") or fields.get("subject") or "")
+
+def searchable_text(fields):
+    """검색 대상 본문: 문자열 필드와 표의 셀 값을 이어 붙입니다."""
+    parts = []
+    for key, value in fields.items():
+        if key in ("title", "subject"):
+            continue
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            for row in value:
+                if isinstance(row, dict):
+                    parts.append(" ".join(str(v) for v in row.values() if v is not None))
+    return "\n".join(part for part in parts if part)
+
+def save_draft(draft_id, doc_type, fields, model="", keywords="", path=None):
+    """초안을 저장합니다. 같은 draft_id가 있으면 내용과 수정 시각을 갱신합니다."""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    title = draft_title(fields)
+    with _connect(path) as conn:
+        conn.execute(
+            "INSERT INTO drafts (id, doc_type, title, model, keywords, fields, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET doc_type=excluded.doc_type, title=excluded.title, model=excluded.model, "
+            "keywords=excluded.keywords, fields=excluded.fields, updated_at=excluded.updated_at",
+            (draft_id, doc_type, title, model or "", keywords or "", json.dumps(fields, ensure_ascii=False, default=str), now, now),
+        )
+        conn.execute("DELETE FROM drafts_fts WHERE id = ?", (draft_id,))
+        conn.execute("INSERT INTO drafts_fts (id, title, keywords, content) VALUES (?, ?, ?, ?)",
+                     (draft_id, title, keywords or "", searchable_text(fields)))
+
+def get_draft(draft_id, path=None):
+    """저장된 초안을 딕셔너리로 반환합니다. (fields는 초안 필드 딕셔너리) 없으면 None"""
+    with _connect(path) as conn:
+        row = conn.execute("SELECT * FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+    if row is None:
+        return None
+    record = dict(row)
+    record["fields"] = json.loads(record["fields"])
+    return record
+
+def delete_draft(draft_id, path=None):
+    with _connect(path) as conn:
+        conn.execute("DELETE FROM drafts WHERE id = ?", (draft_id,))
+        conn.execute("DELETE FROM drafts_fts WHERE id = ?", (draft_id,))
+
+def search_drafts(query="", doc_type=None, limit=20, path=None):
+    """검색어(공백으로 구분, 모두 포함)로 초안을 찾아 최신순/관련도순으로 반환합니다.
+
+    결과 항목: id, doc_type, title, model, keywords, created_at, updated_at, preview
+    검색어가 없으면 최근 초안을 반환합니다.
+    """
+    terms = [term for term in (query or "").split() if term]
+    fts_terms = [term for term in terms if len(term) >= 3]
+    like_terms = [term for term in terms if len(term) < 3]
+    sql = ("SELECT d.id, d.doc_type, d.title, d.model, d.keywords, d.created_at, d.updated_at, "
+           "substr(f.content, 1, 80) AS preview FROM drafts d JOIN drafts_fts f ON f.id = d.id WHERE 1=1")
+    params = []
+    if fts_terms:
+        sql += " AND drafts_fts MATCH ?"
+        params.append(" AND ".join('"' + term.replace('"', '""') + '"' for term in fts_terms))
+    for term in like_terms:
+        sql += " AND (f.title || ' ' || f.keywords || ' ' || f.content) LIKE ?"
+        params.append(f"%{term}%")
+    if doc_type:
+        sql += " AND d.doc_type = ?"
+        params.append(doc_type)
+    sql += " ORDER BY " + ("bm25(drafts_fts), " if fts_terms else "") + "d.updated_at DESC LIMIT ?"
+    params.append(limit)
+    with _connect(path) as conn:
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
@@ -0,0 +1,190 @@
+"""문서 초안 모델 (문서 종류별 slots 데이터 클래스)
+
+AI 응답, 작성 이력, 편집기 값을 모두 같은 모델로 다룹니다.
+- 문자열 필드는 문서 종류별 클래스(ProposalDraft 등)의 속성입니다.
+- 상세 내역 표(items)는 열 단위로 저장하는 Table입니다. 한 번 만든 Table은 바꾸지 않으며,
+  행 딕셔너리 목록(템플릿, DOCX, 작성 이력용)과 DataFrame(st.data_editor용) 변환 결과를 Table마다 한 번만 만듭니다.
+- 편집기에서 고친 표는 edited_items에 두었다가 미리보기나 재생성 때 apply_edits()로 items에 반영합니다.
+다른 모듈(doc_pipeline, docx_export, draft_history, API 서버)에는 to_dict()/snapshot()의 딕셔너리를 넘깁니다.
+"""
+import math
+from dataclasses import dataclass, field, fields
+
+def _cell(value):
+    """표 셀 값을 문자열로 바꿉니다. None/NaN은 빈 칸입니다."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+def _text_value(value):
+    """AI 응답이나 이력의 필드 값을 편집기용 텍스트로 바꿉니다.
+
+    {"1.": "...", "1)": "..."}처럼 번호를 키로 쓴 객체는 번호 위계에 맞춰 들여쓴 텍스트로, 목록은 줄 단위 텍스트로 바꿉니다.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            marker = key.strip()
+            if marker.endswith(')') and marker[:-1].strip().isdigit():
+                lines.append(f"  {key} {item}")
+            elif marker.startswith('(') and marker.endswith(')'):
+                lines.append(f"    {key} {item}")
+            else:
+                lines.append(f"{key} {item}")
+        return "\n".join(lines)
+    if isinstance(value, list):
+        return "\n".join(_text_value(item) for item in value)
+    return str(value)
+
+@dataclass(slots=True, eq=False)
+class Table:
+    """열 단위로 저장한 표. values[i]는 columns[i] 열의 셀 값(문자열) 튜플입니다."""
+    columns: tuple = ()
+    values: tuple = ()
+    _records: list = field(default=None, init=False, repr=False)
+    _frame: object = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_records(cls, records):
+        """행 딕셔너리 목록으로 표를 만듭니다. 딕셔너리가 아닌 행과 모든 칸이 빈 행은 버립니다."""
+        rows = [row for row in (records or []) if isinstance(row, dict)]
+        columns = tuple(dict.fromkeys(key for row in rows for key in row))
+        rows = [row for row in rows if any(_cell(row.get(column)).strip() for column in columns)]
+        return cls(columns, tuple(tuple(_cell(row.get(column)) for row in rows) for column in columns))
+
+    @classmethod
+    def from_frame(cls, frame, previous=None):
+        """st.data_editor가 돌려준 DataFrame으로 표를 만듭니다. previous와 내용이 같으면 previous를 그대로 반환합니다."""
+        if previous is not None and previous._frame is not None and frame.equals(previous._frame):
+            return previous
+        columns = tuple(str(column) for column in frame.columns)
+        cells = [tuple(_cell(value) for value in frame[column].tolist()) for column in frame.columns]
+        keep = [index for index in range(len(frame)) if any(column[index].strip() for column in cells)]
+        if len(keep) < len(frame):
+            cells = [tuple(column[index] for index in keep) for column in cells]
+        return cls(columns, tuple(cells))
+
+    @property
+    def row_count(self):
+        return len(self.values[0]) if self.values else 0
+
+    def __bool__(self):
+        return self.row_count > 0
+
+    def records(self):
+        """행 딕셔너리 목록. 같은 Table이면 같은 목록을 돌려주므로 받은 쪽에서 고치지 마세요."""
+        if self._records is None:
+            self._records = [dict(zip(self.columns, row)) for row in zip(*self.values)]
+        return self._records
+
+    def to_frame(self):
+        """st.data_editor에 넘길 DataFrame (Table마다 한 번만 만듭니다)"""
+        if self._frame is None:
+            import pandas as pd
+            self._frame = pd.DataFrame({column: list(values) for column, values in zip(self.columns, self.values)}, columns=list(self.columns))
+        return self._frame
+
+EMPTY_TABLE = Table()
+
+@dataclass(slots=True)
+class Draft:
+    """문서 종류별 초안의 공통 부분 (상세 내역 표)"""
+    items: Table = EMPTY_TABLE
+    edited_items: Table = None  # 편집기에서 고친 표 (아직 items에 반영 전)
+
+    doc_type = ""
+
+    @classmethod
+    def text_fields(cls):
+        return tuple(f.name for f in fields(cls) if f.name not in ("items", "edited_items"))
+
+    @classmethod
+    def from_dict(cls, data):
+        """AI 응답이나 작성 이력의 딕셔너리로 초안을 만듭니다. 모르는 키는 버립니다."""
+        data = data if isinstance(data, dict) else {}
+        items = data.get("items")
+        return cls(items=items if isinstance(items, Table) else Table.from_records(items if isinstance(items, list) else []),
+                   **{name: _text_value(data.get(name)) for name in cls.text_fields()})
+
+    def current_items(self):
+        return self.edited_items if self.edited_items is not None else self.items
+
+    def to_dict(self):
+        """반영된 값만 담은 딕셔너리 (items는 행 딕셔너리 목록)"""
+        data = {name: getattr(self, name) for name in self.text_fields()}
+        data["items"] = self.items.records()
+        return data
+
+    def snapshot(self):
+        """편집기에서 고친 표까지 반영한 딕셔너리 (미리보기, 재생성, 내보내기용)"""
+        data = {name: getattr(self, name) for name in self.text_fields()}
+        data["items"] = self.current_items().records()
+        return data
+
+    def table_headers(self):
+        """미리보기 표의 컬럼 순서. 표가 비어 있으면 None"""
+        table = self.current_items()
+        return list(table.columns) if table else None
+
+    def apply_edits(self):
+        """편집기에서 고친 표를 items에 반영합니다."""
+        if self.edited_items is not None:
+            self.items = self.edited_items
+
+    def set_field(self, name, value):
+        """재생성한 필드 값을 넣습니다. 편집 중이던 표는 먼저 반영하고 편집 상태를 비웁니다."""
+        self.apply_edits()
+        self.edited_items = None
+        if name == "items":
+            self.items = Table.from_records(value if isinstance(value, list) else [])
+        else:
+            setattr(self, name, _text_value(value))
+
+@dataclass(slots=True)
+class ProposalDraft(Draft):
+    title: str = ""
+    purpose: str = ""
+    body: str = ""
+    remarks: str = ""
+
+    doc_type = "품의서"
+
+@dataclass(slots=True)
+class NoticeDraft(Draft):
+    title: str = ""
+    target: str = ""
+    summary: str = ""
+    details: str = ""
+    contact: str = ""
+
+    doc_type = "공지문"
+
+@dataclass(slots=True)
+class OfficialLetterDraft(Draft):
+    sender_org: str = ""
+    receiver: str = ""
+    cc: str = ""
+    title: str = ""
+    body: str = ""
+    sender_name: str = ""
+
+    doc_type = "공문"
+
+@dataclass(slots=True)
+class EmailDraft(Draft):
+    subject: str = ""
+    cc: str = ""
+    body: str = ""
+    closing: str = ""
+
+    doc_type = "비즈니스 이메일"
+
+DRAFT_CLASSES = {cls.doc_type: cls for cls in (ProposalDraft, NoticeDraft, OfficialLetterDraft, EmailDraft)}
+
+def from_dict(doc_type, data):
+    """문서 종류에 맞는 초안 모델을 만듭니다."""
+    return DRAFT_CLASSES[doc_type].from_dict(data)
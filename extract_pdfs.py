@@ -1,19 +1,14 @@
 #!/usr/bin/env python3
-import PyPDF2
 import json
 import os
 
+from pdf_text import extract_pdf_text
+
 def extract_pdf_content(filename):
-    """PDF 파일에서 텍스트 내용을 추출합니다."""
+    """PDF 파일에서 텍스트 내용을 추출합니다. (스캔 페이지는 OCR 사용)"""
     try:
-        with open(filename, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ''
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + '\n'
-            return text.strip()
+        text, _ = extract_pdf_text(filename)
+        return text.strip()
     except Exception as e:
         return f'Error reading {filename}: {str(e)}'
 
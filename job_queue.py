@@ -0,0 +1,336 @@
+"""백그라운드 작업 큐 (PDF 학습, 일괄 내보내기, OCR)
+
+오래 걸리는 작업을 화면 갱신과 분리해 작업자 스레드 풀에서 실행합니다.
+작업 상태(대기/실행/완료/실패/취소, 진행률, 메시지, 결과)는 SQLite(JOB_QUEUE_DB)에 저장하므로
+새로고침이나 재접속 뒤에도 진행 상황을 다시 볼 수 있고, 결과 파일은 JOB_DIR에 남습니다.
+프로세스가 작업 도중 종료되면 다음 실행 때 남은 작업을 다시 대기열에 넣습니다.
+
+작업 종류는 @handler("이름", "표시 이름")로 등록하며, 처리 함수는 (params, ctx)를 받아 결과 딕셔너리를 반환합니다.
+ctx.progress(비율, 메시지)로 진행률을 알리고, ctx.output_path(파일 이름)에 결과 파일을 씁니다.
+"""
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("JOB_QUEUE_DB", os.path.join(BASE_DIR, "job_queue.db"))
+JOB_DIR = os.environ.get("JOB_DIR", os.path.join(BASE_DIR, ".jobs"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_KEEP = 50  # 보관할 최근 작업 수 (오래된 작업은 결과 파일과 함께 삭제)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+@contextmanager
+def _connect(path=None):
+    """연결을 열어 작업이 끝나면 커밋하고 닫습니다. (스레드마다 별도 연결 사용)"""
+    path = path or DB_PATH
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        if path not in _initialized:
+            with _init_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _initialized.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _row_to_job(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# --- 작업 종류 등록 ---
+HANDLERS = {}  # 이름 -> (표시 이름, 처리 함수)
+
+def handler(kind, label):
+    def register(func):
+        HANDLERS[kind] = (label, func)
+        return func
+    return register
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """처리 함수에 넘기는 진행 상황 보고 도구"""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def progress(self, fraction, message=""):
+        """진행률(0~1)과 메시지를 기록합니다. 취소 요청이 있으면 JobCancelled를 발생시킵니다."""
+        if self.job_id in self.queue._cancel_requested:
+            raise JobCancelled()
+        with _connect(self.queue.path) as conn:
+            conn.execute("UPDATE jobs SET progress = ?, message = ? WHERE id = ?", (max(0.0, min(1.0, fraction)), message, self.job_id))
+
+    def output_path(self, name):
+        directory = os.path.join(self.queue.job_dir, self.job_id)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
+
+class JobQueue:
+    """작업 대기열과 작업자 스레드 풀. 프로세스마다 하나(queue)를 사용합니다."""
+
+    def __init__(self, path=None, job_dir=None, workers=JOB_WORKERS):
+        self.path = path or DB_PATH
+        self.job_dir = job_dir or JOB_DIR
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._cancel_requested = set()
+
+    def start(self):
+        """처음 사용할 때 작업자 풀을 만들고, 끝난 프로세스가 남긴 작업을 다시 대기열에 넣습니다."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+            with _connect(self.path) as conn:
+                rows = conn.execute("SELECT id, status, worker_pid FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at").fetchall()
+                orphaned = [row["id"] for row in rows if not _process_alive(row["worker_pid"]) or row["worker_pid"] == os.getpid()]
+                conn.executemany("UPDATE jobs SET status = 'queued', worker_pid = ?, message = '다시 시작 대기 중' WHERE id = ?",
+                                 [(os.getpid(), job_id) for job_id in orphaned])
+            for job_id in orphaned:
+                self._executor.submit(self._run, job_id)
+
+    def submit(self, kind, params=None, unique=False):
+        """작업을 대기열에 넣고 작업 ID를 반환합니다. unique면 같은 종류의 작업이 진행 중일 때 그 작업의 ID를 반환합니다."""
+        if kind not in HANDLERS:
+            raise ValueError(f"알 수 없는 작업 종류입니다: {kind}")
+        self.start()
+        if unique:
+            active = self.recent(limit=1, kind=kind, active_only=True)
+            if active:
+                return active[0]["id"]
+        job_id = uuid.uuid4().hex
+        with _connect(self.path) as conn:
+            conn.execute("INSERT INTO jobs (id, kind, status, params, message, worker_pid, created_at) VALUES (?, ?, 'queued', ?, '대기 중', ?, ?)",
+                         (job_id, kind, json.dumps(params or {}, ensure_ascii=False), os.getpid(), _now()))
+        self._cleanup()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        with _connect(self.path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] not in ACTIVE_STATUSES:
+                return
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ?, worker_pid = ? WHERE id = ?", (_now(), os.getpid(), job_id))
+        job = _row_to_job(row)
+        func = HANDLERS[job["kind"]][1]
+        try:
+            if job_id in self._cancel_requested:
+                raise JobCancelled()
+            result = func(job["params"], JobContext(self, job_id))
+            status, error = "done", None
+        except JobCancelled:
+            result, status, error = None, "cancelled", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+        self._cancel_requested.discard(job_id)
+        with _connect(self.path) as conn:
+            conn.execute("UPDATE jobs SET status = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                         (status, status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None, error, _now(), job_id))
+
+    def get(self, job_id):
+        with _connect(self.path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def recent(self, limit=10, kind=None, active_only=False):
+        """최근 작업 목록 (최신순)"""
+        sql, params = "SELECT * FROM jobs WHERE 1=1", []
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if active_only:
+            sql += " AND status IN ('queued', 'running')"
+        sql += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+        with _connect(self.path) as conn:
+            return [_row_to_job(row) for row in conn.execute(sql, params).fetchall()]
+
+    def get_many(self, job_ids):
+        """주어진 ID의 작업 목록 (최신순, 정리되어 없어진 작업은 제외)"""
+        if not job_ids:
+            return []
+        placeholders = ", ".join("?" for _ in job_ids)
+        with _connect(self.path) as conn:
+            rows = conn.execute(f"SELECT * FROM jobs WHERE id IN ({placeholders}) ORDER BY created_at DESC, rowid DESC", list(job_ids)).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def cancel(self, job_id):
+        """작업 취소를 요청합니다. 실행 중인 작업은 다음 진행률 보고 때 멈춥니다."""
+        self._cancel_requested.add(job_id)
+        with _connect(self.path) as conn:
+            conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'", (_now(), job_id))
+
+    def store_input(self, name, data):
+        """작업 입력 파일(업로드한 PDF 등)을 JOB_DIR에 저장하고 경로를 반환합니다."""
+        directory = os.path.join(self.job_dir, "inputs")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{uuid.uuid4().hex}{os.path.splitext(name)[1].lower()}")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def _cleanup(self):
+        with _connect(self.path) as conn:
+            rows = conn.execute("SELECT id, params FROM jobs WHERE status NOT IN ('queued', 'running') ORDER BY created_at DESC, rowid DESC LIMIT -1 OFFSET ?",
+                                (JOB_KEEP,)).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        for row in rows:
+            paths = [os.path.join(self.job_dir, row["id"])]
+            input_path = json.loads(row["params"] or "{}").get("path", "")
+            if input_path.startswith(os.path.join(self.job_dir, "inputs")):
+                paths.append(input_path)
+            for path in paths:
+                try:
+                    if os.path.isdir(path):
+                        for name in os.listdir(path):
+                            os.remove(os.path.join(path, name))
+                        os.rmdir(path)
+                    elif os.path.exists(path):
+                        os.remove(path)
+                except OSError:
+                    pass
+
+# 프로세스 전체에서 공유하는 작업 큐
+queue = JobQueue()
+
+# --- 작업 종류 ---
+@handler("learn", "PDF 문서 학습")
+def learn_pdfs(params, ctx):
+    """폴더의 PDF를 모두 읽어 코퍼스를 새로 게시합니다. params: folder, backend, profile(단계 프로파일링 여부)"""
+    import corpus_watcher
+    import doc_pipeline as pipeline
+    import profiling
+
+    folder = params.get("folder") or "."
+    profiles = []
+    with profiling.profile("learning", enabled=bool(params.get("profile")), on_finish=profiles.append):
+        pdf_files = sorted(corpus_watcher.scan_pdfs(folder))
+        files = {}
+        for i, name in enumerate(pdf_files):
+            ctx.progress(i / max(len(pdf_files), 1), f"📖 {name} 읽는 중... ({i + 1}/{len(pdf_files)})")
+            files[name] = corpus_watcher.extract_entry(os.path.join(folder, name), name, params.get("backend"))
+        corpus = corpus_watcher.assemble_corpus(files)
+        summary = corpus["summary"]
+        if not summary["successful_files"]:
+            raise RuntimeError(f"총 {summary['total_files']}개 파일을 모두 읽지 못했습니다.")
+        ctx.progress(1.0, "코퍼스 게시 중...")
+        pipeline.publish_learned_documents(corpus)
+    result = {"summary": summary, "learned_at": corpus["learned_at"],
+              "failures": [[name, entry["content"][:200]] for name, entry in files.items() if not entry.get("success")]}
+    if profiles:
+        result["profile"] = profiles[0]
+    return result
+
+def _safe_filename(name):
+    return re.sub(r'[\\/:*?"<>|\n\r\t]', "_", name).strip() or "document"
+
+@handler("export", "작성 이력 일괄 내보내기")
+def export_drafts(params, ctx):
+    """저장된 초안들을 PDF와 Word(이메일은 HTML)로 만들어 zip 하나로 묶습니다. params: draft_ids"""
+    import doc_pipeline as pipeline
+    import draft_history
+    import draft_model
+    from docx_export import generate_docx
+
+    draft_ids = params.get("draft_ids") or []
+    buffer = io.BytesIO()
+    exported, failures, used_names = 0, [], set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, draft_id in enumerate(draft_ids):
+            record = draft_history.get_draft(draft_id)
+            if record is None:
+                failures.append([draft_id, "작성 이력에서 찾을 수 없습니다."])
+                continue
+            title = record["title"] or "document"
+            ctx.progress(i / max(len(draft_ids), 1), f"📄 {title} 내보내는 중... ({i + 1}/{len(draft_ids)})")
+            base = _safe_filename(f"{record['updated_at'][:10]}_{record['doc_type']}_{title}")
+            while base in used_names:
+                base += "_"
+            used_names.add(base)
+            try:
+                doc_type = record["doc_type"]
+                draft = draft_model.from_dict(doc_type, record["fields"])
+                fields = draft.to_dict()
+                html = pipeline.render_html(doc_type, pipeline.build_template_context(doc_type, fields, {}, draft.table_headers()))
+                if doc_type == "비즈니스 이메일":
+                    archive.writestr(f"{base}.html", html)
+                else:
+                    archive.writestr(f"{base}.pdf", pipeline.generate_pdf(html))
+                    archive.writestr(f"{base}.docx", generate_docx(fields, doc_type, {}))
+                exported += 1
+            except Exception as e:
+                failures.append([title, str(e)])
+    path = ctx.output_path("drafts.zip")
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+    return {"file": path, "file_name": f"작성이력_{datetime.now():%Y%m%d_%H%M}.zip", "mime": "application/zip",
+            "count": exported, "failures": failures}
+
+@handler("ocr", "PDF 텍스트 추출 (OCR)")
+def ocr_pdf(params, ctx):
+    """PDF의 텍스트를 추출합니다. 텍스트가 없는 스캔 페이지는 OCR로 읽습니다. params: path, name, backend"""
+    from pdf_text import extract_pdf_text
+
+    name = params.get("name") or os.path.basename(params["path"])
+    ctx.progress(0.0, f"🔎 {name} 읽는 중...")
+    text, stats = extract_pdf_text(params["path"], backend=params.get("backend"))
+    path = ctx.output_path("text.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return {"file": path, "file_name": f"{os.path.splitext(name)[0]}.txt", "mime": "text/plain",
+            "chars": len(text), "pages": stats["pages"], "ocr_pages": stats["ocr_pages"], "ocr_cached": stats["ocr_cached"],
+            "failed_pages": stats["failed_pages"], "ocr_available": stats["ocr_available"]}
@@ -0,0 +1,200 @@
+"""LLM 백엔드 (OpenAI, OpenAI 호환 서버, 가짜 LLM)
+
+doc_pipeline.call_llm_json은 client.chat.completions.create(...) 인터페이스를 가진 객체를 받습니다.
+이 모듈은 설정에 맞는 클라이언트를 만듭니다.
+- openai: OpenAI API. API 키를 여러 개 주면 키마다 클라이언트를 두고 돌아가며(round-robin) 호출합니다.
+  키별로 최근 1분 요청 수를 세어 LLM_KEY_RPM에 도달한 키는 건너뛰고, 요청 한도 오류(429)를 받은 키는
+  Retry-After(없으면 LLM_KEY_COOLDOWN초) 동안 쉬게 하고 다른 키로 바로 다시 보냅니다.
+  따라서 최대 처리량은 키 수에 비례해 늘어납니다.
+- openai_compatible: vLLM, llama.cpp 서버처럼 OpenAI 호환 API를 제공하는 주소(LLM_BASE_URL).
+  LLM_MODEL을 주면 모든 호출의 모델 이름을 서버가 제공하는 모델로 바꿉니다.
+- stub: 네트워크 없이 항상 같은 응답을 돌려주는 stub_llm.StubLLMClient (오프라인 테스트, 벤치마크용)
+
+설정은 Streamlit secrets(우선) 또는 환경 변수로 합니다.
+    LLM_BACKEND = "openai"                  # openai | openai_compatible | stub
+    OPENAI_API_KEYS = ["sk-...", "sk-..."]  # 환경 변수는 쉼표로 구분. 없으면 OPENAI_API_KEY 하나를 사용
+    LLM_BASE_URL = "http://127.0.0.1:8000/v1"
+    LLM_MODEL = "qwen2.5-7b-instruct"
+    LLM_KEY_RPM = 500                       # 키당 분당 요청 수 한도 (0이면 제한 없음)
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+BACKENDS = ("openai", "openai_compatible", "stub")
+DEFAULT_COOLDOWN = float(os.environ.get("LLM_KEY_COOLDOWN", "20"))
+KEY_WAIT_TIMEOUT = 30.0  # 모든 키가 한도에 걸렸을 때 기다리는 최대 시간(초)
+
+class KeyPoolExhausted(RuntimeError):
+    """모든 키가 요청 한도에 걸려 KEY_WAIT_TIMEOUT 안에 보낼 수 없음 (doc_pipeline에서 요청 한도 오류로 안내)"""
+
+def mask_key(key):
+    """화면과 로그에 표시할 키 이름 (앞 3자와 끝 4자만)"""
+    return f"{key[:3]}…{key[-4:]}" if len(key) > 10 else "key"
+
+def _retry_after(error, default):
+    """요청 한도 오류(429)면 쉬어야 할 시간(초), 아니면 None"""
+    if getattr(error, "status_code", None) != 429 and "rate limit" not in str(error).lower():
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return default
+
+class KeySlot:
+    """키 하나의 클라이언트와 요청 기록"""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.requests = deque()  # 최근 1분 동안 보낸 요청 시각 (time.monotonic)
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.cooldown_until = 0.0
+        self.latencies = deque(maxlen=50)
+
+    def ready_at(self, now, rpm):
+        """이 키로 다음 요청을 보낼 수 있는 시각"""
+        while self.requests and self.requests[0] <= now - 60:
+            self.requests.popleft()
+        ready = max(now, self.cooldown_until)
+        if rpm and len(self.requests) >= rpm:
+            ready = max(ready, self.requests[len(self.requests) - rpm] + 60)
+        return ready
+
+class PooledClient:
+    """여러 API 키의 클라이언트를 돌아가며 쓰는 클라이언트 (chat.completions.create 인터페이스)"""
+
+    def __init__(self, clients, rpm=0, cooldown=DEFAULT_COOLDOWN, model=None, wait_timeout=KEY_WAIT_TIMEOUT):
+        """clients: (키 이름, 클라이언트) 목록. model을 주면 요청의 모델 이름을 바꿉니다."""
+        if not clients:
+            raise ValueError("클라이언트가 하나 이상 필요합니다.")
+        self.slots = [KeySlot(name, client) for name, client in clients]
+        self.rpm = rpm
+        self.cooldown = cooldown
+        self.model = model
+        self.wait_timeout = wait_timeout
+        self._next = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _acquire(self):
+        """쓸 수 있는 키를 돌아가며 고릅니다. 모두 한도에 걸렸으면 가장 먼저 풀리는 키를 기다립니다."""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                earliest = None
+                for offset in range(len(self.slots)):
+                    index = (self._next + offset) % len(self.slots)
+                    slot = self.slots[index]
+                    ready = slot.ready_at(now, self.rpm)
+                    if ready <= now:
+                        self._next = (index + 1) % len(self.slots)
+                        slot.requests.append(now)
+                        slot.in_flight += 1
+                        return slot
+                    earliest = ready if earliest is None else min(earliest, ready)
+            if earliest > deadline:
+                raise KeyPoolExhausted("rate limit: 모든 API 키가 요청 한도에 도달했습니다.")
+            time.sleep(max(0.01, earliest - now))
+
+    def _create(self, **kwargs):
+        if self.model:
+            kwargs["model"] = self.model
+        for attempt in range(len(self.slots)):
+            slot = self._acquire()
+            started = time.monotonic()
+            try:
+                response = slot.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                retry_after = _retry_after(e, self.cooldown)
+                with self._lock:
+                    slot.in_flight -= 1
+                    slot.errors += 1
+                    if retry_after is not None:
+                        slot.rate_limited += 1
+                        slot.cooldown_until = time.monotonic() + retry_after
+                # 요청 한도 오류는 다른 키로 다시 보내고, 그 밖의 오류는 호출한 쪽(모델 장애 조치)에 넘김
+                if retry_after is None or attempt == len(self.slots) - 1:
+                    raise
+                continue
+            with self._lock:
+                slot.in_flight -= 1
+                slot.calls += 1
+                slot.latencies.append(time.monotonic() - started)
+            return response
+
+    def stats(self):
+        """키별 호출 수, 오류, 요청 한도 오류, 진행 중 요청, 최근 1분 요청 수, 남은 대기 시간, 평균 지연"""
+        with self._lock:
+            now = time.monotonic()
+            return [{
+                "key": slot.name,
+                "calls": slot.calls,
+                "errors": slot.errors,
+                "rate_limited": slot.rate_limited,
+                "in_flight": slot.in_flight,
+                "last_minute": sum(1 for at in slot.requests if at > now - 60),
+                "cooldown": max(0.0, slot.cooldown_until - now),
+                "avg_latency": sum(slot.latencies) / len(slot.latencies) if slot.latencies else None,
+            } for slot in self.slots]
+
+def load_config(secrets=None):
+    """secrets(있으면 우선)와 환경 변수에서 백엔드 설정 딕셔너리를 읽습니다."""
+    def value(name, default=None):
+        try:
+            if secrets is not None and name in secrets:
+                return secrets[name]
+        except Exception:
+            pass
+        return os.environ.get(name, default)
+
+    keys = value("OPENAI_API_KEYS") or value("OPENAI_API_KEY") or []
+    if isinstance(keys, str):
+        keys = [key.strip() for key in keys.split(",") if key.strip()]
+    return {
+        "backend": value("LLM_BACKEND") or "openai",
+        "api_keys": list(keys),
+        "base_url": value("LLM_BASE_URL") or None,
+        "model": value("LLM_MODEL") or None,
+        "rpm": int(value("LLM_KEY_RPM") or 0),
+    }
+
+def create_client(config):
+    """설정에 맞는 클라이언트를 만듭니다. openai 백엔드에 API 키가 없으면 None"""
+    backend = config.get("backend") or "openai"
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 LLM 백엔드입니다: {backend} (가능한 값: {', '.join(BACKENDS)})")
+    if backend == "stub":
+        from stub_llm import StubLLMClient
+        return StubLLMClient()
+    keys = config.get("api_keys") or []
+    if backend == "openai_compatible":
+        if not config.get("base_url"):
+            raise ValueError("openai_compatible 백엔드에는 LLM_BASE_URL이 필요합니다.")
+        keys = keys or ["local"]  # 키를 확인하지 않는 로컬 서버
+    elif not keys:
+        return None
+    from openai import OpenAI
+    # 키가 여럿이면 클라이언트 자체 재시도 대신 다른 키로 바로 넘깁니다.
+    max_retries = 0 if len(keys) > 1 else 2
+    clients = [(mask_key(key), OpenAI(api_key=key, base_url=config.get("base_url"), max_retries=max_retries)) for key in keys]
+    return PooledClient(clients, rpm=config.get("rpm") or 0, model=config.get("model"))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(config):
+    """설정이 같으면 프로세스에서 하나의 클라이언트를 공유합니다. (키별 요청 기록을 모든 세션이 함께 사용)"""
+    cache_key = json.dumps(config, sort_keys=True)
+    with _clients_lock:
+        if cache_key not in _clients:
+            _clients[cache_key] = create_client(config)
+        return _clients[cache_key]
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""동시 접속 부하 테스트 (가짜 LLM 사용)
+
+앱 프로세스 하나가 동시 사용자를 몇 명까지 감당하는지 측정합니다.
+OpenAI 호환 가짜 LLM 서버(stub_llm)를 띄우고, Streamlit AppTest 세션 N개가
+키워드 입력 → 초안 생성 → 편집 → 미리보기(PDF/DOCX 내보내기 포함) 흐름을 동시에 실행합니다.
+모든 세션이 같은 프로세스에서 돌아가므로 모듈 수준 캐시와 저장소를 실제 서버처럼 함께 씁니다.
+
+단계별 소요 시간(초):
+- load: 첫 화면 / draft: 'AI 초안 생성 시작' / edit: 제목 수정 후 다시 그리기
+- preview: '미리보기 생성' 클릭부터 화면 완성까지 (PDF/DOCX 생성 시간 포함)
+- pdf, docx: 그중 내보내기 파일 생성 시간
+세션마다 키워드와 제목을 다르게 해 캐시 적중 없이 측정합니다.
+
+사용법:
+    python loadtest.py --sessions 20 --concurrency 10 --latency 2.0 --jitter 1.0
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import doc_pipeline as pipeline
+import docx_export
+import usage_ledger
+from stub_llm import serve_openai_compatible
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+STAGES = ("load", "draft", "edit", "preview", "pdf", "docx")
+
+class StageTimer:
+    """단계별 소요 시간과 실패 수를 모읍니다. (여러 세션 스레드에서 함께 사용)"""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, ok=True):
+        with self._lock:
+            if ok:
+                self.durations[stage].append(seconds)
+            else:
+                self.errors[stage] += 1
+
+    def wrap(self, stage, func):
+        """func 호출 시간을 stage로 기록하는 함수를 반환합니다."""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self.record(stage, 0, ok=False)
+                raise
+            self.record(stage, time.perf_counter() - start)
+            return result
+        return timed
+
+def percentile(values, pct):
+    """최근접 순위(nearest-rank) 방식 백분위수"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def serialize_script_compile():
+    """AppTest는 세션마다 스크립트를 따로 컴파일하는데, 여러 스레드에서 동시에 ast.parse를 하면
+    Python 3.11에서 간헐적으로 SystemError가 납니다. 실제 서버는 컴파일 결과를 공유하므로 잠금으로 한 번에 하나씩만 컴파일합니다."""
+    from streamlit.runtime.scriptrunner import magic
+    lock = threading.Lock()
+    add_magic = magic.add_magic
+
+    def locked_add_magic(*args, **kwargs):
+        with lock:
+            return add_magic(*args, **kwargs)
+    magic.add_magic = locked_add_magic
+
+def run_session(index, doc_type, timer, timeout):
+    """세션 하나의 전체 흐름을 실행합니다. 실패하면 실패한 단계 이름을, 성공하면 None을 반환합니다."""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets["OPENAI_API_KEY"] = "stub"
+
+    def step(stage, action):
+        start = time.perf_counter()
+        try:
+            action()
+            ok = not at.exception
+        except Exception:
+            ok = False
+        timer.record(stage, time.perf_counter() - start, ok)
+        return ok
+
+    def generate():
+        at.text_area(key="keyword_input").set_value(f"영업팀 업무용 태블릿 {index + 2}대 구매, 총 예산 {400 + index}만원, 세션 {index}")
+        next(b for b in at.button if b.label == "AI 초안 생성 시작").click().run()
+        if not at.session_state[f"draft_{doc_type.replace(' ', '_')}"]:
+            raise RuntimeError("초안이 생성되지 않았습니다.")
+
+    def edit():
+        title = next(t for t in at.text_input if t.label == "제목")
+        title.set_value(f"{title.value} ({index})").run()
+
+    def preview():
+        next(b for b in at.button if b.label in ("미리보기 생성", "이메일 본문 생성")).click().run()
+
+    def load():
+        at.run()
+        at.sidebar.radio[0].set_value(doc_type).run()
+
+    for stage, action in (("load", load), ("draft", generate), ("edit", edit), ("preview", preview)):
+        if not step(stage, action):
+            return stage
+    return None
+
+def print_report(timer, sessions, failures, elapsed):
+    completed = sessions - len(failures)
+    print(f"\n세션 {sessions}개 중 {completed}개 완료, 소요 {elapsed:.1f}초, 처리량 {completed / elapsed * 60:.1f} 세션/분")
+    if failures:
+        print("실패 단계: " + ", ".join(f"{stage} {failures.count(stage)}건" for stage in STAGES if stage in failures))
+    print(f"{'단계':>8} | {'건수':>5} | {'실패':>4} | {'p50':>7} | {'p95':>7} | {'p99':>7} | {'최대':>7}")
+    print("-" * 64)
+    for stage in STAGES:
+        values = timer.durations.get(stage, [])
+        if not values and not timer.errors.get(stage):
+            continue
+        cols = [f"{percentile(values, p):>7.2f}" if values else f"{'-':>7}" for p in (50, 95, 99)]
+        peak = f"{max(values):>7.2f}" if values else f"{'-':>7}"
+        print(f"{stage:>8} | {len(values):>5} | {timer.errors.get(stage, 0):>4} | {' | '.join(cols)} | {peak}")
+
+def main():
+    parser = argparse.ArgumentParser(description="동시 세션 부하 테스트 (가짜 LLM)")
+    parser.add_argument("--sessions", type=int, default=10, help="실행할 세션 수")
+    parser.add_argument("--concurrency", type=int, default=5, help="동시에 실행할 세션 수")
+    parser.add_argument("--doc-type", default="품의서", choices=pipeline.DOC_TYPES)
+    parser.add_argument("--latency", type=float, default=1.0, help="가짜 LLM 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="가짜 LLM 추가 무작위 지연 최대값(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="가짜 LLM 오류 비율 (0~1)")
+    parser.add_argument("--timeout", type=float, default=120, help="화면 한 번 그리기의 최대 대기 시간(초)")
+    args = parser.parse_args()
+
+    server, base_url = serve_openai_compatible(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    # 부하 테스트 초안, 작업, 사용량 기록이 실제 DB에 섞이지 않도록 임시 DB 사용
+    temp_dir = tempfile.mkdtemp(prefix="doc-helper-loadtest-")
+    os.environ.setdefault("DRAFT_HISTORY_DB", os.path.join(temp_dir, "history.db"))
+    os.environ.setdefault("JOB_QUEUE_DB", os.path.join(temp_dir, "jobs.db"))
+    os.environ.setdefault("USAGE_LEDGER_DB", os.path.join(temp_dir, "usage.db"))
+    # usage_ledger는 doc_pipeline과 함께 이미 import되어 경로를 직접 바꿈
+    usage_ledger.DB_PATH = os.environ["USAGE_LEDGER_DB"]
+
+    serialize_script_compile()
+    timer = StageTimer()
+    pipeline.generate_pdf = timer.wrap("pdf", pipeline.generate_pdf)
+    docx_export.generate_docx = timer.wrap("docx", docx_export.generate_docx)
+
+    print(f"가짜 LLM: {base_url} (지연 {args.latency}s + 0~{args.jitter}s, 오류 {args.error_rate:.0%})")
+    print(f"세션 {args.sessions}개, 동시 {args.concurrency}개, 문서 종류: {args.doc_type}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda i: run_session(i, args.doc_type, timer, args.timeout), range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    print_report(timer, args.sessions, [stage for stage in results if stage], elapsed)
+
+if __name__ == "__main__":
+    main()
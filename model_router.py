@@ -0,0 +1,121 @@
+"""작업 유형별 모델 라우팅 및 지연시간 기반 장애 조치
+
+각 작업(추가 질문 분석, 전체 초안, 필드 재생성)을 모델 등급(tier)에 연결하고,
+모델별 최근 호출의 p95 지연시간과 오류율을 추적해 상태가 나빠진 모델은
+후순위로 미뤄 더 빠른 등급의 모델이 먼저 호출되도록 합니다.
+라우터는 프로세스 단위로 공유되므로 모든 세션의 호출 기록이 함께 반영됩니다.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+# 관리자가 선택한 모델(st.session_state.selected_model)을 가리키는 자리표시자
+SELECTED_MODEL = "$selected"
+
+# 등급별 모델 후보 (앞쪽이 우선)
+DEFAULT_TIERS = {
+    "fast": ["gpt-4o-mini", "gpt-3.5-turbo"],
+    "standard": [SELECTED_MODEL, "gpt-4o-mini"],
+}
+
+# 작업별 사용 등급
+DEFAULT_TASK_TIERS = {
+    "analyze": "fast",
+    "draft": "standard",
+    "regenerate": "fast",
+}
+
+# 등급별 p95 지연시간 한도 (초)
+DEFAULT_LATENCY_LIMITS = {
+    "fast": 8.0,
+    "standard": 25.0,
+}
+
+class ModelHealth:
+    """모델 하나의 최근 호출 기록 (지연시간, 성공 여부)을 보관합니다."""
+
+    def __init__(self, window_size=50, window_seconds=300):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=window_size)
+
+    def record(self, latency, ok, now=None):
+        self.samples.append((now if now is not None else time.time(), latency, ok))
+
+    def _recent(self, now=None):
+        cutoff = (now if now is not None else time.time()) - self.window_seconds
+        return [sample for sample in self.samples if sample[0] >= cutoff]
+
+    def stats(self, now=None):
+        """최근 구간의 호출 수, p95 지연시간(성공 호출 기준), 오류율을 반환합니다."""
+        recent = self._recent(now)
+        if not recent:
+            return {"calls": 0, "p95": None, "error_rate": 0.0}
+        latencies = sorted(latency for _, latency, ok in recent if ok)
+        p95 = latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)] if latencies else None
+        errors = sum(1 for _, _, ok in recent if not ok)
+        return {"calls": len(recent), "p95": p95, "error_rate": errors / len(recent)}
+
+class ModelRouter:
+    """작업별로 호출할 모델 순서를 정하고 호출 결과를 기록합니다."""
+
+    def __init__(self, tiers=None, task_tiers=None, latency_limits=None,
+                 max_error_rate=0.25, min_samples=5):
+        self.tiers = dict(tiers or DEFAULT_TIERS)
+        self.task_tiers = dict(task_tiers or DEFAULT_TASK_TIERS)
+        self.latency_limits = dict(latency_limits or DEFAULT_LATENCY_LIMITS)
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """설정 딕셔너리(tiers, task_tiers, latency_limits)로 라우팅 규칙을 갱신합니다."""
+        if not config:
+            return
+        with self._lock:
+            self.tiers.update({k: list(v) for k, v in config.get("tiers", {}).items()})
+            self.task_tiers.update(config.get("task_tiers", {}))
+            self.latency_limits.update({k: float(v) for k, v in config.get("latency_limits", {}).items()})
+
+    def record(self, model, latency, ok):
+        with self._lock:
+            self._health.setdefault(model, ModelHealth()).record(latency, ok)
+
+    def stats(self, model):
+        with self._lock:
+            health = self._health.get(model)
+            return health.stats() if health else {"calls": 0, "p95": None, "error_rate": 0.0}
+
+    def all_stats(self):
+        with self._lock:
+            return {model: health.stats() for model, health in self._health.items()}
+
+    def is_degraded(self, model, tier):
+        """최근 기록이 충분하고 오류율 또는 p95 지연시간이 한도를 넘으면 True"""
+        stats = self.stats(model)
+        if stats["calls"] < self.min_samples:
+            return False
+        if stats["error_rate"] > self.max_error_rate:
+            return True
+        limit = self.latency_limits.get(tier)
+        return limit is not None and stats["p95"] is not None and stats["p95"] > limit
+
+    def candidates(self, task, selected_model):
+        """작업에 사용할 모델을 시도 순서대로 반환합니다.
+
+        등급의 후보 뒤에 더 빠른 'fast' 등급 후보를 이어 붙이고,
+        상태가 나빠진 모델은 최후의 수단으로 맨 뒤로 보냅니다.
+        """
+        tier = self.task_tiers.get(task, "standard")
+        ordered = []
+        for name in self.tiers.get(tier, [SELECTED_MODEL]) + self.tiers.get("fast", []):
+            model = selected_model if name == SELECTED_MODEL else name
+            if model and model not in ordered:
+                ordered.append(model)
+        healthy = [m for m in ordered if not self.is_degraded(m, tier)]
+        degraded = [m for m in ordered if m not in healthy]
+        return healthy + degraded
+
+# 프로세스 전체에서 공유하는 라우터
+router = ModelRouter()
@@ -0,0 +1,290 @@
+"""PDF 텍스트 추출 (스캔 페이지 OCR 대체 포함)
+
+텍스트 레이어는 설정한 추출 백엔드(PyPDF2, pypdf, pdfminer.six, pypdfium2)로 읽고,
+추출되는 텍스트가 없는 페이지(스캔 이미지)만 Tesseract OCR로 읽습니다.
+- 백엔드는 extract_pdf_text(backend=...) 또는 PDF_TEXT_BACKEND 환경 변수로 고릅니다. (기본: pypdfium2)
+  설치되지 않은 백엔드를 지정하면 PyPDF2를 사용합니다. (비교: bench_pdf_backends.py)
+- OCR 대상 페이지는 pypdfium2로 이미지로 렌더링한 뒤 프로세스 풀에서 병렬로 인식하고,
+- 결과는 페이지 내용의 해시를 키로 공유 캐시(cache_backend)와 디스크(OCR_CACHE_DIR)에 캐시합니다.
+pytesseract, pypdfium2, tesseract 실행 파일(kor 언어 팩) 중 하나라도 없으면 OCR 없이 동작합니다.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import PyPDF2
+
+from cache_backend import cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OCR_LANG = os.environ.get("OCR_LANG", "kor+eng")
+OCR_DPI = int(os.environ.get("OCR_DPI", "200"))
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "0")) or None  # None이면 CPU 수
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", os.path.join(BASE_DIR, ".ocr_cache"))
+MIN_PAGE_TEXT_CHARS = 5  # 이보다 짧은 텍스트만 나오는 페이지는 스캔 페이지로 간주
+DEFAULT_BACKEND = os.environ.get("PDF_TEXT_BACKEND", "pypdfium2")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def ocr_available():
+    """OCR에 필요한 라이브러리와 tesseract 실행 파일이 모두 있으면 True"""
+    try:
+        import pypdfium2  # noqa: F401
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+# --- 텍스트 추출 백엔드 ---
+# 각 백엔드는 (PDF bytes, 최대 페이지 수)를 받아 (전체 페이지 수, 페이지별 텍스트 목록)을 반환합니다.
+# 읽기에 실패한 페이지의 텍스트는 None입니다.
+def _safe_call(func):
+    try:
+        return func() or ""
+    except Exception:
+        return None
+
+def _extract_pypdf2(pdf_bytes, max_pages):
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return len(reader.pages), [_safe_call(page.extract_text) for page in reader.pages[:max_pages]]
+
+def _extract_pypdf(pdf_bytes, max_pages):
+    import pypdf
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    return len(reader.pages), [_safe_call(page.extract_text) for page in reader.pages[:max_pages]]
+
+def _extract_pdfminer(pdf_bytes, max_pages):
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    from pdfminer.pdfpage import PDFPage
+    total_pages = sum(1 for _ in PDFPage.get_pages(io.BytesIO(pdf_bytes)))
+    texts = []
+    for layout in extract_pages(io.BytesIO(pdf_bytes), maxpages=max_pages or 0):
+        texts.append("".join(element.get_text() for element in layout if isinstance(element, LTTextContainer)))
+    return total_pages, texts
+
+def _extract_pypdfium2(pdf_bytes, max_pages):
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(pdf_bytes)
+    try:
+        total_pages = len(pdf)
+        texts = []
+        for index in range(min(total_pages, max_pages or total_pages)):
+            textpage = pdf[index].get_textpage()
+            text = _safe_call(textpage.get_text_range)
+            texts.append(text.replace("\r\n", "\n") if text is not None else None)
+            textpage.close()
+        return total_pages, texts
+    finally:
+        pdf.close()
+
+# 이름 -> (추출 함수, 필요한 모듈)
+PDF_BACKENDS = {
+    "pypdf2": (_extract_pypdf2, "PyPDF2"),
+    "pypdf": (_extract_pypdf, "pypdf"),
+    "pdfminer": (_extract_pdfminer, "pdfminer"),
+    "pypdfium2": (_extract_pypdfium2, "pypdfium2"),
+}
+
+@lru_cache(maxsize=None)
+def backend_available(name):
+    if name not in PDF_BACKENDS:
+        return False
+    try:
+        __import__(PDF_BACKENDS[name][1])
+        return True
+    except ImportError:
+        return False
+
+def available_backends():
+    return [name for name in PDF_BACKENDS if backend_available(name)]
+
+def resolve_backend(name=None):
+    """사용할 백엔드 이름. 지정한 백엔드가 없거나 설치되지 않았으면 'pypdf2'"""
+    name = (name or DEFAULT_BACKEND).lower()
+    return name if backend_available(name) else "pypdf2"
+
+def _stream_bytes(obj):
+    """PDF 스트림 객체의 원본(인코딩된) 바이트. 디코딩 비용 없이 해시에 사용합니다."""
+    data = getattr(obj, "_data", None)
+    if data is None:
+        try:
+            data = obj.get_data()
+        except Exception:
+            data = b""
+    return data if isinstance(data, bytes) else str(data).encode("utf-8")
+
+MAX_XOBJECT_DEPTH = 8  # Form XObject를 따라 들어가는 최대 깊이
+
+def _hash_xobjects(resources, digest, seen, depth=0):
+    """리소스의 XObject를 해시에 넣습니다. Form XObject(/Fm0 Do → /Im0 Do)는 그 안의 리소스까지 따라갑니다.
+
+    이미지 데이터를 하나라도 넣었으면 True를 반환합니다.
+    """
+    try:
+        xobjects = resources.get_object().get("/XObject", {}).get_object()
+    except Exception:
+        return False
+    hashed_image = False
+    for name in sorted(xobjects):
+        try:
+            obj = xobjects[name].get_object()
+        except Exception:
+            continue
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        digest.update(name.encode("utf-8"))
+        digest.update(_stream_bytes(obj))
+        subtype = obj.get("/Subtype")
+        if subtype == "/Image":
+            hashed_image = True
+        elif subtype == "/Form" and depth < MAX_XOBJECT_DEPTH and "/Resources" in obj:
+            hashed_image = _hash_xobjects(obj["/Resources"], digest, seen, depth + 1) or hashed_image
+    return hashed_image
+
+def page_hash(page):
+    """페이지의 내용 스트림과 이미지 데이터로 만든 해시. 같은 스캔 페이지는 파일이 달라도 같은 값입니다.
+
+    이미지 데이터를 찾지 못하면(리소스가 없거나 읽기 실패) 서로 다른 페이지가 같은 값이 되지 않도록 None을 반환합니다.
+    """
+    digest = hashlib.sha256()
+    try:
+        contents = page.get_contents()
+        if contents is not None:
+            digest.update(_stream_bytes(contents))
+    except Exception:
+        pass
+    if not _hash_xobjects(page.get("/Resources", {}), digest, set()):
+        return None
+    return digest.hexdigest()
+
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_DIR, f"{key}.txt")
+
+def _cache_get(key):
+    """공유 캐시(cache_backend) → 로컬 디스크 순서로 OCR 결과를 찾습니다."""
+    data = cache.get_bytes("ocr:" + key)
+    if data is not None:
+        return data.decode("utf-8")
+    try:
+        with open(_cache_path(key), encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return None
+    cache.set_bytes("ocr:" + key, text.encode("utf-8"))
+    return text
+
+def _cache_put(key, text):
+    cache.set_bytes("ocr:" + key, text.encode("utf-8"))
+    try:
+        os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+        tmp_path = _cache_path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, _cache_path(key))
+    except OSError:
+        pass
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _ocr_image(png_bytes, lang):
+    """프로세스 풀에서 실행: 렌더링된 페이지 이미지 한 장을 OCR합니다."""
+    import pytesseract
+    from PIL import Image
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        return pytesseract.image_to_string(image, lang=lang)
+
+def _render_pages(pdf_bytes, indexes, dpi):
+    """지정한 페이지들을 PNG 바이트로 렌더링합니다."""
+    import pypdfium2
+    rendered = {}
+    pdf = pypdfium2.PdfDocument(pdf_bytes)
+    try:
+        for index in indexes:
+            image = pdf[index].render(scale=dpi / 72).to_pil()
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            rendered[index] = buffer.getvalue()
+    finally:
+        pdf.close()
+    return rendered
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+def extract_pdf_text(source, max_pages=None, ocr=True, separator="\n", lang=OCR_LANG, backend=None):
+    """PDF(경로, bytes, 파일 객체)의 텍스트를 추출해 (텍스트, 통계)를 반환합니다.
+
+    통계: backend(사용한 백엔드), pages(처리한 페이지 수), total_pages, ocr_pages(OCR로 읽은 페이지),
+    ocr_cached(그중 캐시 적중), scanned_pages(텍스트가 없던 페이지),
+    failed_pages(읽기 실패한 페이지 번호 목록), ocr_available
+    """
+    pdf_bytes = _read_bytes(source)
+    backend = resolve_backend(backend)
+    total_pages, texts = PDF_BACKENDS[backend][0](pdf_bytes, max_pages)
+    page_count = len(texts)
+    stats = {"backend": backend, "pages": page_count, "total_pages": total_pages, "ocr_pages": 0, "ocr_cached": 0,
+             "scanned_pages": 0, "failed_pages": [], "ocr_available": False}
+    for index, text in enumerate(texts):
+        if text is None:
+            stats["failed_pages"].append(index + 1)
+            texts[index] = ""
+
+    empty_pages = [index for index, text in enumerate(texts) if len(text.strip()) < MIN_PAGE_TEXT_CHARS]
+    scanned = {}  # 페이지 번호 -> 캐시 키
+    if empty_pages:
+        # 페이지 해시는 스캔 페이지가 있을 때만 계산 (PyPDF2는 필요한 객체만 읽으므로 가벼움)
+        reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        file_digest = None
+        for index in empty_pages:
+            digest = page_hash(reader.pages[index])
+            if digest is None:
+                # 이미지로 페이지를 구분할 수 없으면 파일 내용과 페이지 번호로 캐시
+                file_digest = file_digest or hashlib.sha256(pdf_bytes).hexdigest()
+                digest = f"{file_digest}-p{index}"
+            scanned[index] = f"{digest}-{lang}-{OCR_DPI}"
+    stats["scanned_pages"] = len(scanned)
+
+    if scanned and ocr and ocr_available():
+        stats["ocr_available"] = True
+        pending = []
+        for index, key in scanned.items():
+            cached = _cache_get(key)
+            if cached is None:
+                pending.append(index)
+            else:
+                texts[index] = cached
+                stats["ocr_cached"] += 1
+        if pending:
+            futures = {index: _get_pool().submit(_ocr_image, png, lang)
+                       for index, png in _render_pages(pdf_bytes, pending, OCR_DPI).items()}
+            for index, future in futures.items():
+                try:
+                    texts[index] = future.result()
+                    _cache_put(scanned[index], texts[index])
+                except Exception:
+                    stats["failed_pages"].append(index + 1)
+        stats["ocr_pages"] = sum(1 for index in scanned if texts[index].strip())
+
+    return separator.join(text for text in texts if text), stats
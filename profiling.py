@@ -0,0 +1,204 @@
+"""화면 갱신(rerun) 한 번 또는 특정 단계(학습, 내보내기)의 성능 프로파일링 (관리자 전용)
+
+- 샘플링 프로파일러: 별도 스레드가 대상 스레드의 호출 스택을 PROFILE_INTERVAL_MS마다 기록합니다.
+  app.py처럼 위에서 아래로 실행되는 스크립트의 모듈 수준 코드는 함수 대신 줄 번호 단위로 구분합니다.
+- tracemalloc: 프로파일 동안 할당되어 끝날 때까지 남아 있는 메모리 상위 항목과 최대 사용량을 기록합니다.
+  tracemalloc은 프로세스 전체를 추적하므로 동시에 실행 중인 다른 세션의 할당도 함께 잡힙니다.
+결과는 PROFILE_DIR에 zip 파일 하나로 저장합니다.
+- speedscope.json: https://www.speedscope.app 에서 열 수 있는 플레임그래프
+- flamegraph.txt: flamegraph.pl / inferno 형식(collapsed stack, 밀리초)
+- allocations.txt: 메모리 할당 상위 목록
+프로파일링은 PROFILING=1 환경 변수로 모두에게 켜거나, PROFILE_TOKEN을 설정하고 ?profile=<토큰> 주소로 접속한 관리자에게만 켭니다.
+"""
+import hmac
+import io
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, ".profiles"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_SECONDS = 300  # 중지되지 않은 프로파일러가 계속 도는 것을 막는 상한
+PROFILE_KEEP = 20  # PROFILE_DIR에 남겨 둘 최근 결과 수
+TOP_ALLOCATIONS = 30
+
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+def is_allowed(query_value=None, token=None):
+    """PROFILING 환경 변수가 켜져 있거나 ?profile= 값이 PROFILE_TOKEN과 같으면 True"""
+    if os.environ.get("PROFILING", "").lower() in ("1", "true", "yes"):
+        return True
+    token = token or os.environ.get("PROFILE_TOKEN")
+    return bool(token and query_value) and hmac.compare_digest(str(query_value), str(token))
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+def _stop_tracemalloc():
+    """스냅샷과 최대 사용량을 반환하고, 마지막 사용자면 추적을 끝냅니다."""
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        _tracemalloc_users = max(0, _tracemalloc_users - 1)
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+    return snapshot, peak
+
+def _frame_key(frame):
+    """(이름, 파일, 줄). 모듈 수준 코드는 현재 실행 중인 줄, 함수는 정의된 줄을 사용합니다."""
+    code = frame.f_code
+    if code.co_name == "<module>":
+        return (f"<module>:{frame.f_lineno}", code.co_filename, frame.f_lineno)
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+class Profiler:
+    """스레드 하나(기본: start를 호출한 스레드)를 샘플링하는 프로파일러"""
+
+    def __init__(self, stage, interval=PROFILE_INTERVAL, thread_id=None):
+        self.stage = stage
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = Counter()  # 호출 스택(바깥 → 안쪽 frame key 튜플) -> 누적 시간(초)
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._ended = None  # 대상 스레드가 끝나 샘플링이 먼저 멈춘 시각
+
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self.started_at = datetime.now()
+        _start_tracemalloc()
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name=f"profiler-{self.stage}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - self._start_time > PROFILE_MAX_SECONDS:
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                self._ended = now
+                break
+            stack = []
+            while frame is not None:
+                stack.append(_frame_key(frame))
+                frame = frame.f_back
+            self.samples[tuple(reversed(stack))] += now - last
+            last = now
+
+    def stop(self):
+        """샘플링을 멈추고 (tracemalloc 스냅샷, 최대 메모리)를 반환합니다."""
+        self._stop.set()
+        self._thread.join()
+        self.duration = (self._ended or time.perf_counter()) - self._start_time
+        return _stop_tracemalloc()
+
+    def speedscope(self):
+        """speedscope 파일 형식(sampled) 딕셔너리"""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, seconds in self.samples.items():
+            row = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                row.append(index[key])
+            samples.append(row)
+            weights.append(seconds)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": self.stage, "unit": "seconds", "startValue": 0,
+                          "endValue": sum(weights), "samples": samples, "weights": weights}],
+            "exporter": "document-helper profiling.py",
+        }
+
+    def collapsed(self):
+        """flamegraph.pl 입력 형식: '바깥;...;안쪽 밀리초' 줄 목록"""
+        lines = []
+        for stack, seconds in self.samples.most_common():
+            names = ";".join(f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack)
+            lines.append(f"{names} {max(1, round(seconds * 1000))}")
+        return "\n".join(lines) + "\n"
+
+def allocation_report(stage, snapshot, peak, duration, note=None):
+    lines = [f"단계: {stage}", f"소요 시간: {duration:.3f}초", f"최대 추적 메모리: {peak / 1024 / 1024:.1f} MB"]
+    if note:
+        lines.append(f"참고: {note}")
+    if snapshot is None:
+        return "\n".join(lines + ["(tracemalloc 스냅샷 없음)"]) + "\n"
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),  # 샘플러 자신의 할당 제외
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ])
+    stats = snapshot.statistics("lineno")
+    lines.append(f"프로파일 종료 시점까지 남아 있는 할당: {sum(s.size for s in stats) / 1024 / 1024:.1f} MB, {sum(s.count for s in stats):,}개")
+    lines.append("")
+    lines.append(f"상위 {TOP_ALLOCATIONS}개 (파일:줄)")
+    for rank, stat in enumerate(stats[:TOP_ALLOCATIONS], 1):
+        frame = stat.traceback[0]
+        lines.append(f"{rank:>3}. {stat.size / 1024:>10.1f} KB {stat.count:>8,}개  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+def _cleanup(directory):
+    files = sorted((f for f in os.listdir(directory) if f.endswith(".zip")), reverse=True)
+    for name in files[PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def finish(profiler, note=None, directory=None):
+    """프로파일러를 멈추고 결과 zip을 저장합니다. 결과 정보 딕셔너리(stage, path, seconds, peak_mb, created_at)를 반환합니다."""
+    snapshot, peak = profiler.stop()
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    safe_stage = "".join(c if c.isalnum() or c in "-_" else "_" for c in profiler.stage)
+    path = os.path.join(directory, f"{profiler.started_at:%Y%m%d-%H%M%S-%f}-{safe_stage}.zip")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("speedscope.json", json.dumps(profiler.speedscope(), ensure_ascii=False))
+        archive.writestr("flamegraph.txt", profiler.collapsed())
+        archive.writestr("allocations.txt", allocation_report(profiler.stage, snapshot, peak, profiler.duration, note))
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+    _cleanup(directory)
+    return {"stage": profiler.stage, "path": path, "seconds": profiler.duration, "peak_mb": peak / 1024 / 1024,
+            "created_at": profiler.started_at.strftime('%Y-%m-%d %H:%M:%S'), "note": note}
+
+@contextmanager
+def profile(stage, enabled=True, on_finish=None):
+    """with 블록을 프로파일링합니다. 끝나면 on_finish(결과 정보)를 호출합니다. (st.rerun 예외로 빠져나가도 저장)"""
+    if not enabled:
+        yield None
+        return
+    profiler = Profiler(stage).start()
+    try:
+        yield profiler
+    finally:
+        result = finish(profiler)
+        if on_finish:
+            on_finish(result)
@@ -0,0 +1,85 @@
+"""입력 중 미리 실행하는 백그라운드 작업(추가 질문 분석, 첨부 파일 추출) 캐시
+
+작업 결과는 입력 내용의 해시를 키로 프로세스 전체에서 공유되며,
+'AI 초안 생성 시작' 버튼을 누를 때 이미 끝난 결과가 있으면 그대로 재사용합니다.
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def input_hash(*parts):
+    """여러 입력 값을 묶어 캐시 키로 쓸 해시 문자열을 만듭니다. bytes는 그대로, 나머지는 str로 처리합니다."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+class SpeculativeCache:
+    """키별로 백그라운드 작업(Future)을 한 번만 실행하고 결과를 일정 시간 보관합니다."""
+
+    def __init__(self, max_workers=4, max_entries=256, ttl_seconds=600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self._entries = {}  # key -> (생성 시각, Future)
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        """만료된 항목과 상한을 넘는 오래된 항목을 정리합니다. (잠금 상태에서 호출)"""
+        for key in [k for k, (created, _) in self._entries.items() if now - created > self.ttl_seconds]:
+            del self._entries[key]
+        if len(self._entries) > self.max_entries:
+            oldest = sorted(self._entries.items(), key=lambda item: item[1][0])
+            for key, _ in oldest[:len(self._entries) - self.max_entries]:
+                del self._entries[key]
+
+    def submit(self, key, fn, *args, **kwargs):
+        """같은 키의 작업이 없거나 실패했으면 새로 실행하고, 있으면 기존 Future를 반환합니다."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                future = entry[1]
+                if not (future.done() and future.exception() is not None):
+                    return future
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._entries[key] = (now, future)
+            return future
+
+    def get(self, key):
+        """키에 해당하는 Future를 반환합니다. 없거나 만료되었으면 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                return None
+            return entry[1]
+
+    def result(self, key, timeout=None):
+        """작업 결과를 (찾음 여부, 결과)로 반환합니다. 실행 중이면 timeout초까지 기다립니다.
+
+        작업이 없거나, 시간 안에 끝나지 않거나, 예외로 끝났으면 (False, None)을 반환하므로
+        호출하는 쪽은 평소처럼 동기 방식으로 처리하면 됩니다.
+        """
+        future = self.get(key)
+        if future is None:
+            return False, None
+        try:
+            return True, future.result(timeout=timeout)
+        except Exception:
+            return False, None
+
+    def status(self, key):
+        """'missing' | 'running' | 'done' | 'failed'"""
+        future = self.get(key)
+        if future is None:
+            return "missing"
+        if not future.done():
+            return "running"
+        return "failed" if future.exception() is not None else "done"
+
+# 프로세스 전체에서 공유하는 캐시
+speculative_cache = SpeculativeCache()
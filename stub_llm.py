@@ -0,0 +1,249 @@
+"""오프라인 테스트용 결정적(deterministic) 가짜 LLM
+
+OpenAI 클라이언트와 같은 client.chat.completions.create(...) 인터페이스를 흉내 내며,
+프롬프트 종류(추가 질문 분석, 초안, 질문 또는 초안, 필드 재생성)를 보고 항상 같은 JSON을 돌려줍니다.
+응답 JSON 스키마(response_format의 json_schema 또는 시스템 프롬프트의 [응답 JSON 스키마])가 있으면
+개요(t/c 목록)와 표(columns/rows) 형식에 맞춰 돌려줍니다.
+네트워크 없이 API 서버나 부하 테스트를 돌릴 때 사용합니다.
+
+OpenAI 호환 HTTP 서버로도 띄울 수 있어 Streamlit 앱을 그대로 연결할 수 있습니다.
+    python stub_llm.py --port 8001 --latency 1.5
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 streamlit run app.py   # secrets의 OPENAI_API_KEY는 아무 값
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from doc_pipeline import DOC_TYPES
+
+SAMPLE_DRAFTS = {
+    "품의서": {
+        "title": "영업팀 업무용 태블릿 구매의 건",
+        "purpose": "영업팀 현장 업무 효율화를 위해 업무용 태블릿 구매를 요청함.",
+        "body": "1. 구매 배경\n  1) 현장 방문 시 실시간 재고 확인이 필요함.\n2. 구매 내역\n  1) 태블릿 5대를 구매함.",
+        "items": [
+            {"품목": "태블릿", "수량": "5", "단가": "800,000", "비고": "업무용"},
+        ],
+        "remarks": "총 예산 400만원이며 2025년 4분기 집행 예정임.",
+    },
+    "공지문": {
+        "title": "사내 정보보안 교육 실시 안내",
+        "target": "전 직원",
+        "summary": "정보보안 의식 제고를 위해 정기 교육을 실시합니다.",
+        "details": "1. 교육 일정\n  1) 11월 둘째 주 중 부서별 진행\n2. 참석 방법\n  1) 사내 교육 시스템에서 신청",
+        "contact": "총무팀 (내선 1234)",
+        "items": [],
+    },
+    "공문": {
+        "sender_org": "주식회사 몬쉘코리아",
+        "receiver": "협력사 대표이사",
+        "cc": "구매팀장",
+        "title": "2025년 하반기 납품 일정 협조 요청",
+        "body": "1. 귀사의 무궁한 발전을 기원합니다.\n2. 하반기 납품 일정을 아래와 같이 요청드립니다.",
+        "sender_name": "주식회사 몬쉘코리아 대표이사",
+        "items": [],
+    },
+    "비즈니스 이메일": {
+        "subject": "프로젝트 킥오프 미팅 일정 안내",
+        "body": "다음 주 프로젝트 킥오프 미팅 일정을 안내드립니다.\n참석 가능 여부를 회신 부탁드립니다.",
+        "closing": "감사합니다.",
+        "items": [],
+    },
+}
+
+STUB_QUESTIONS = ["예산 규모는 어느 정도인가요?", "언제까지 진행해야 하나요?"]
+
+def _detect_doc_type(text):
+    for doc_type in DOC_TYPES:
+        if f"'{doc_type}'" in text:
+            return doc_type
+    return "품의서"
+
+def stub_reply(messages):
+    """메시지 목록을 보고 가짜 LLM의 JSON 응답(딕셔너리)을 만듭니다."""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    first_user = next((m["content"] for m in messages if m["role"] == "user"), user)
+    doc_type = _detect_doc_type(first_user + system)
+    draft = SAMPLE_DRAFTS[doc_type]
+
+    # 필드 단위 재생성: 시스템 프롬프트에 `{"field": ...}` 형식이 지정됨
+    field_match = re.search(r'`\{"(\w+)": \.\.\.\}`', system)
+    if field_match:
+        field = field_match.group(1)
+        return {field: draft.get(field, "")}
+    # 키워드에 숫자(금액, 수량, 날짜)가 하나도 없으면 정보가 부족하다고 판단
+    keyword_match = re.search(r"\[핵심 키워드\]: (.*)", first_user) or re.search(r"다음 키워드를 입력했습니다: '(.*)'\. 6W3H", first_user)
+    keywords = keyword_match.group(1) if keyword_match else first_user
+    insufficient = not re.search(r"\d", keywords)
+    if "추가 정보를 질문하는 시스템" in system:
+        return {"status": "incomplete", "questions": STUB_QUESTIONS} if insufficient else {"status": "complete"}
+    if "[추가 정보]" in user:
+        return {"status": "complete", "draft": draft}
+    if "[응답 방식]" in user:
+        if insufficient:
+            return {"status": "incomplete", "questions": STUB_QUESTIONS}
+        return {"status": "complete", "draft": draft}
+    return draft
+
+def _outline_nodes(text):
+    """번호 붙은 본문 텍스트를 개요 형식(t/c 목록)으로 바꿉니다. 들여쓰기 두 칸이 한 단계입니다."""
+    nodes = []
+    for line in str(text or "").splitlines():
+        if not line.strip():
+            continue
+        level = min((len(line) - len(line.lstrip(" "))) // 2, 2)
+        sentence = re.sub(r"^(\d+\.|\d+\)|\(\d+\))\s*", "", line.strip())
+        siblings = nodes
+        for _ in range(level):
+            if not siblings:
+                break
+            siblings = siblings[-1].setdefault("c", [])
+        siblings.append({"t": sentence})
+    return nodes
+
+def _fit_schema(value, schema):
+    """value를 JSON 스키마 모양에 맞춥니다. (가짜 LLM이 구조화 출력을 흉내 내는 용도)"""
+    if "anyOf" in schema:
+        if value is None:
+            return None
+        branch = next((s for s in schema["anyOf"] if s.get("type") == "object"), schema["anyOf"][0])
+        return _fit_schema(value, branch)
+    kind = schema.get("type")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        if "columns" in properties and isinstance(value, list):
+            columns = list(dict.fromkeys(key for row in value if isinstance(row, dict) for key in row))
+            return {"columns": columns, "rows": [[str(row.get(column, "")) for column in columns] for row in value]}
+        value = value if isinstance(value, dict) else {}
+        return {key: _fit_schema(value.get(key), sub) for key, sub in properties.items()}
+    if kind == "array":
+        items = schema.get("items", {})
+        if isinstance(value, str) and items.get("type") == "object" and "t" in items.get("properties", {}):
+            value = _outline_nodes(value)
+        return [_fit_schema(item, items) for item in value or []]
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+def _response_schema(messages, response_format):
+    """요청에 지정된 응답 JSON 스키마. 없으면 None"""
+    if isinstance(response_format, dict) and response_format.get("type") == "json_schema":
+        return response_format["json_schema"]["schema"]
+    system = messages[0]["content"] if messages else ""
+    marker = "[응답 JSON 스키마]: "
+    if marker in system:
+        try:
+            return json.loads(system.split(marker, 1)[1].strip())
+        except ValueError:
+            return None
+    return None
+
+class StubLLMClient:
+    """OpenAI 클라이언트 대신 쓰는 가짜 클라이언트
+
+    latency(초)와 jitter(초)로 응답 지연을 흉내 내고, error_rate 비율만큼 예외를 발생시킵니다.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, max_tokens=None, response_format=None, **kwargs):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise RuntimeError("stub LLM: simulated server error")
+        reply = stub_reply(messages)
+        schema = _response_schema(messages, response_format)
+        if schema is not None:
+            reply = _fit_schema(reply, schema)
+        content = json.dumps(reply, ensure_ascii=False)
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        usage = SimpleNamespace(prompt_tokens=prompt_chars // 2, completion_tokens=len(content) // 2, total_tokens=(prompt_chars + len(content)) // 2)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+            usage=usage,
+        )
+
+def _completion_payload(response):
+    """StubLLMClient 응답을 OpenAI chat.completions JSON 형식으로 바꿉니다."""
+    return {
+        "id": f"chatcmpl-stub-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": response.model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": response.choices[0].message.content},
+                     "finish_reason": "stop"}],
+        "usage": vars(response.usage),
+    }
+
+def serve_openai_compatible(host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+    """POST /v1/chat/completions를 처리하는 가짜 LLM 서버를 백그라운드 스레드로 띄웁니다.
+
+    (서버, base_url)을 반환합니다. 종료는 server.shutdown(). port=0이면 빈 포트를 사용합니다.
+    요청은 스레드마다 따로 처리되므로 latency만큼 기다리는 동안에도 다른 요청을 받습니다.
+    """
+    client = StubLLMClient(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock:  # random.Random은 스레드 간 공유하므로 지연 값만 잠금 안에서 뽑음
+                delay = client.latency + (client._random.uniform(0, client.jitter) if client.jitter else 0.0)
+                failed = bool(client.error_rate) and client._random.random() < client.error_rate
+            time.sleep(delay)
+            if failed:
+                self._send_json(500, {"error": {"message": "stub LLM: simulated server error", "type": "server_error"}})
+                return
+            response = StubLLMClient()._create(request.get("model", "stub"), request.get("messages", []),
+                                               response_format=request.get("response_format"))
+            self._send_json(200, _completion_payload(response))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-llm-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 호환 가짜 LLM 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="추가 무작위 지연 최대값(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 오류를 돌려줄 비율 (0~1)")
+    args = parser.parse_args()
+    server, base_url = serve_openai_compatible(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"가짜 LLM 서버 실행 중: OPENAI_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
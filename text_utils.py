@@ -0,0 +1,67 @@
+"""문서 본문 텍스트 정리 및 HTML 변환 유틸리티"""
+import re
+
+def renumber_text(text):
+    lines = text.split('\n')
+    new_lines = []; counters = [0, 0, 0]
+    for line in lines:
+        stripped_line = line.lstrip()
+        indentation = len(line) - len(stripped_line)
+        match = re.match(r'^(\d+\.|\d+\)|\(\d+\)|\-|\*)\s+', stripped_line)
+        if match:
+            level = indentation // 2
+            if level > 2: level = 2
+            for i in range(level + 1, len(counters)): counters[i] = 0
+            counters[level] += 1
+            if level == 0: new_prefix = f"{counters[level]}. "
+            elif level == 1: new_prefix = f"{'  ' * level}{counters[level]}) "
+            else: new_prefix = f"{'  ' * level}({counters[level]}) "
+            content_part = stripped_line[len(match.group(1)):].lstrip()
+            new_lines.append("  " * level + new_prefix + content_part)
+        else:
+            new_lines.append(line)
+    return "\n".join(new_lines)
+
+def clean_text(text):
+    if not isinstance(text, str): return ""
+    # 마크다운 헤더 제거
+    processed_text = re.sub(r'^\s*#+\s*', '', text, flags=re.MULTILINE)
+    
+    # 마침표 뒤에 줄바꿈 추가 (번호 매기기 제외)
+    # 제외 조건:
+    # 1. 숫자.공백 패턴 (1. , 2. , 3. 등)
+    # 2. 공백+숫자) 패턴 (  1), (1) 등) 
+    # 3. 이미 줄바꿈이 있는 경우
+    # 4. 문자열 끝인 경우
+    # 문장 마침표만 감지하도록 개선된 패턴
+    processed_text = re.sub(r'(?<!\d)\.(?!\s*\n)(?!\s*$)(?!\s+[0-9])(?!\s*\))(?=\s*[가-힣A-Za-z])', '.\n', processed_text)
+    
+    # 번호 매기기 정리
+    processed_text = renumber_text(processed_text)
+    return processed_text
+
+def text_to_html(text, for_email=False): 
+    """텍스트를 HTML 형식으로 변환"""
+    if isinstance(text, dict):
+        # JSON 객체 형태로 된 경우 텍스트로 변환
+        formatted_text = ""
+        for key, value in text.items():
+            if key.strip() in ['1.', '2.', '3.', '4.', '5.']:
+                formatted_text += f"{key} {value}\n"
+            elif key.strip().endswith(')') and key.strip().replace(')', '').strip().isdigit():
+                formatted_text += f"  {key} {value}\n"
+            elif key.strip().startswith('(') and key.strip().endswith(')'):
+                formatted_text += f"    {key} {value}\n"
+            else:
+                formatted_text += f"{key} {value}\n"
+        text = formatted_text
+    
+    if for_email:
+        # 이메일의 경우 clean_text 처리를 하지 않고 기본 줄바꿈만 처리
+        if not isinstance(text, str): 
+            text = ""
+        # 마크다운 헤더만 제거하고 자동 줄바꿈은 추가하지 않음
+        processed_text = re.sub(r'^\s*#+\s*', '', text, flags=re.MULTILINE)
+        return processed_text.replace('\n', '<br>')
+    else:
+        return clean_text(text).replace('\n', '<br>')
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""LLM 호출별 토큰, 비용, 지연시간 기록 (SQLite)
+
+호출마다 문서 종류, 작업(analyze/draft/regenerate), 모델, API가 보고한 토큰 수(usage), 지연시간,
+예상 비용과 프롬프트 구성 요소(section)별 토큰 수를 남깁니다.
+구성 요소 토큰은 로컬 토크나이저(tiktoken, 없으면 글자 수 기반 추정)로 세며,
+비용과 지연시간은 구성 요소의 토큰 비율로 나누어 어느 부분(학습 가이드라인, 첨부 파일 등)이
+비용과 시간을 많이 쓰는지 집계합니다.
+
+보고서: python usage_ledger.py [--days 7]
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("USAGE_LEDGER_DB", os.path.join(BASE_DIR, "usage_ledger.db"))
+
+# 모델별 100만 토큰당 가격 (USD, 입력/출력). 목록에 없는 모델은 비용 0으로 기록합니다.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    doc_type TEXT NOT NULL DEFAULT '',
+    task TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    latency REAL NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    tokenizer TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS calls_created ON calls (created_at);
+CREATE TABLE IF NOT EXISTS call_sections (
+    call_id INTEGER NOT NULL REFERENCES calls (id) ON DELETE CASCADE,
+    section TEXT NOT NULL,
+    tokens INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS call_sections_call ON call_sections (call_id);
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+@contextmanager
+def _connect(path=None):
+    """연결을 열어 작업이 끝나면 커밋하고 닫습니다. (스레드마다 별도 연결 사용)"""
+    path = path or DB_PATH
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        if path not in _initialized:
+            with _init_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _initialized.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+# --- 토큰 수 세기 ---
+@lru_cache(maxsize=None)
+def _encoding(model):
+    """모델에 맞는 tiktoken 인코딩. tiktoken이 없으면 None"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def tokenizer_name(model):
+    encoding = _encoding(model or "gpt-4o-mini")
+    return f"tiktoken:{encoding.name}" if encoding else "estimate"
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """text의 토큰 수. tiktoken이 없으면 한글 1자 ≈ 1토큰, 그 밖의 글자 4자 ≈ 1토큰으로 추정합니다."""
+    if not text:
+        return 0
+    encoding = _encoding(model or "gpt-4o-mini")
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    wide = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return wide + (len(text) - wide + 3) // 4
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+# --- 기록 ---
+def record_call(doc_type, task, model, status, latency=0.0, sections=None, usage=None, output_text="", path=None):
+    """LLM 호출 한 건을 기록합니다. 기록에 실패해도 예외를 내지 않습니다.
+
+    status: ok(성공), error(API 오류), cached(응답 캐시 적중, 과금 없음)
+    sections: 프롬프트 구성 요소 이름 -> 텍스트. 각 텍스트의 토큰 수를 로컬 토크나이저로 셉니다.
+    usage: API 응답의 usage(prompt_tokens, completion_tokens). 없으면 로컬에서 센 값을 사용합니다.
+    """
+    try:
+        section_tokens = {name: count_tokens(text, model) for name, text in (sections or {}).items() if text}
+        prompt_tokens = completion_tokens = 0
+        if status == "ok":
+            prompt_tokens = getattr(usage, "prompt_tokens", None) or sum(section_tokens.values())
+            completion_tokens = getattr(usage, "completion_tokens", None) or count_tokens(output_text, model)
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        with _connect(path) as conn:
+            cursor = conn.execute(
+                "INSERT INTO calls (created_at, doc_type, task, model, status, latency, prompt_tokens, completion_tokens, cost, tokenizer) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), doc_type or "", task or "", model or "", status,
+                 latency, prompt_tokens, completion_tokens, cost, tokenizer_name(model)),
+            )
+            if status == "ok":
+                conn.executemany("INSERT INTO call_sections (call_id, section, tokens) VALUES (?, ?, ?)",
+                                 [(cursor.lastrowid, name, tokens) for name, tokens in section_tokens.items()])
+    except Exception:
+        pass
+
+# --- 집계 ---
+def _since(days):
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S') if days else ""
+
+def summary(days=None, path=None):
+    """문서 종류 x 작업 x 모델별 호출 수, 캐시 적중, 오류, 토큰, 비용, 평균/최대 지연시간"""
+    with _connect(path) as conn:
+        rows = conn.execute(
+            "SELECT doc_type, task, model, COUNT(*) AS calls, "
+            "SUM(status = 'cached') AS cached, SUM(status = 'error') AS errors, "
+            "SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens, SUM(cost) AS cost, "
+            "AVG(CASE WHEN status = 'ok' THEN latency END) AS avg_latency, MAX(CASE WHEN status = 'ok' THEN latency END) AS max_latency "
+            "FROM calls WHERE created_at >= ? GROUP BY doc_type, task, model ORDER BY cost DESC",
+            (_since(days),),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def section_report(days=None, path=None):
+    """프롬프트 구성 요소별 토큰, 비용, 지연시간 기여도
+
+    호출마다 API 입력 토큰과 비용, 지연시간을 그 호출의 구성 요소 토큰 비율로 나눕니다.
+    출력(completion)은 'output' 항목으로 따로 집계합니다. 지연시간은 입력+출력 토큰 비율로 나눈 근사값입니다.
+    """
+    with _connect(path) as conn:
+        calls = {row["id"]: dict(row) for row in conn.execute(
+            "SELECT id, model, latency, prompt_tokens, completion_tokens FROM calls WHERE status = 'ok' AND created_at >= ?",
+            (_since(days),),
+        )}
+        sections = conn.execute(
+            "SELECT s.call_id, s.section, s.tokens FROM call_sections s JOIN calls c ON c.id = s.call_id "
+            "WHERE c.status = 'ok' AND c.created_at >= ?",
+            (_since(days),),
+        ).fetchall()
+    local_totals = {}
+    for row in sections:
+        local_totals[row["call_id"]] = local_totals.get(row["call_id"], 0) + row["tokens"]
+
+    report = {}
+    def add(name, tokens, cost, latency):
+        entry = report.setdefault(name, {"section": name, "calls": 0, "tokens": 0, "cost": 0.0, "latency": 0.0})
+        entry["calls"] += 1
+        entry["tokens"] += tokens
+        entry["cost"] += cost
+        entry["latency"] += latency
+
+    for row in sections:
+        call = calls[row["call_id"]]
+        share = row["tokens"] / local_totals[row["call_id"]] if local_totals[row["call_id"]] else 0.0
+        tokens = round(call["prompt_tokens"] * share)
+        total = call["prompt_tokens"] + call["completion_tokens"]
+        add(row["section"], tokens, estimate_cost(call["model"], tokens, 0), call["latency"] * tokens / total if total else 0.0)
+    for call in calls.values():
+        total = call["prompt_tokens"] + call["completion_tokens"]
+        add("output", call["completion_tokens"], estimate_cost(call["model"], 0, call["completion_tokens"]),
+            call["latency"] * call["completion_tokens"] / total if total else 0.0)
+
+    total_cost = sum(entry["cost"] for entry in report.values()) or 1.0
+    for entry in report.values():
+        entry["cost_share"] = entry["cost"] / total_cost
+    return sorted(report.values(), key=lambda entry: entry["cost"], reverse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 토큰/비용 사용량 보고서")
+    parser.add_argument("--days", type=int, default=None, help="최근 N일만 집계 (기본: 전체)")
+    parser.add_argument("--db", default=None, help=f"기록 DB 경로 (기본: {DB_PATH})")
+    args = parser.parse_args()
+
+    rows = summary(args.days, args.db)
+    if not rows:
+        print("기록된 호출이 없습니다.")
+        return
+    print(f"{'문서 종류':<10} {'작업':<10} {'모델':<14} {'호출':>5} {'캐시':>5} {'오류':>5} {'입력 토큰':>10} {'출력 토큰':>10} {'비용($)':>9} {'평균 지연':>8}")
+    for row in rows:
+        print(f"{row['doc_type']:<10} {row['task']:<10} {row['model']:<14} {row['calls']:>5} {row['cached']:>5} {row['errors']:>5} "
+              f"{row['prompt_tokens']:>10,} {row['completion_tokens']:>10,} {row['cost']:>9.4f} {row['avg_latency'] or 0:>7.2f}s")
+    print()
+    print(f"{'프롬프트 구성 요소':<20} {'토큰':>10} {'비용($)':>9} {'비용 비중':>8} {'지연(초, 근사)':>14}")
+    for entry in section_report(args.days, args.db):
+        print(f"{entry['section']:<20} {entry['tokens']:>10,} {entry['cost']:>9.4f} {entry['cost_share']:>8.1%} {entry['latency']:>14.1f}")
+
+if __name__ == "__main__":
+    main()